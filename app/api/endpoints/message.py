@@ -1,16 +1,31 @@
-from fastapi import APIRouter, HTTPException, Query, Depends, Request
-from app.schemas.message import MessageIn, MessageResponse, MessageListResponse
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Query, Depends
+from fastapi.responses import StreamingResponse
+from app.schemas.message import (
+    MessageIn,
+    MessageBatchIn,
+    MessageResponse,
+    MessageBatchResponse,
+    MessageListResponse,
+    MessagePageResponse,
+    SessionStatsResponse,
+)
+from app.services.broadcaster import broadcaster
 from app.services.message import message_repository
 from app.core.security import api_key_auth
 from app.core.limiter import limiter
+from app.core.responses import FastJSONResponse
 
 router = APIRouter()
 
 
-@router.post("", response_model=MessageResponse, status_code=201)
-@limiter.limit("5/minute")
+@router.post(
+    "",
+    response_model=MessageResponse,
+    status_code=201,
+    dependencies=[Depends(limiter.limit("messages:create", default="5/minute"))],
+)
 async def receive_message(
-    request: Request,
     payload: MessageIn,
     current_user: str = Depends(api_key_auth),
 ):
@@ -20,6 +35,8 @@ async def receive_message(
     - **Input**: MessageIn (content, sender, session_id, timestamp)
     - **Output**: MessageOut with metadata
     - **Status Code**: 201 Created
+    - **Idempotency**: resending an already stored message_id returns the
+      stored message instead of an error
     - **Errors**:
         - 422: validation error
         - 403: if the message contains forbidden content
@@ -34,17 +51,55 @@ async def receive_message(
             status_code=500, detail="Error interno del servidor")
 
 
+@router.post(
+    "/batch",
+    response_model=MessageBatchResponse,
+    status_code=200,
+    dependencies=[Depends(limiter.limit("messages:batch", default="60/minute"))],
+)
+async def receive_message_batch(
+    payload: MessageBatchIn,
+    current_user: str = Depends(api_key_auth),
+):
+    """
+    Creates and stores a batch of messages in a single transaction.
+
+    - **Input**: MessageBatchIn (messages: list of MessageIn)
+    - **Output**: One result per message, in input order, with status
+      "stored", "duplicate" (message_id already exists) or "rejected"
+      (forbidden content)
+    - **Status Code**: 200 OK
+    - **Errors**:
+        - 422: validation error or batch size out of range
+        - 400: if the batch could not be stored
+    """
+    try:
+        result = await message_repository.process_and_store_batch(payload.messages)
+        return {"status": "success", "data": result}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception:
+        raise HTTPException(
+            status_code=500, detail="Error interno del servidor")
+
+
 @router.get("/search", response_model=MessageListResponse)
 async def search_messages(
     query: str,
-    limit: int = 10,
+    limit: int = Query(10, ge=1, le=100),
+    session_id: str = Query(None),
+    sender: str = Query(None, pattern="^(user|system)?$"),
     current_user: str = Depends(api_key_auth),
 ):
     """
-    Searches messages containing a specific keyword in their content.
+    Searches messages by content using the full-text index, best matches first.
 
     - **Query Parameters**:
-        - query: The keyword or phrase to search for
+        - query: Terms to search for. Use "quotes" for phrases and a
+          trailing * for prefixes (e.g. `"buenos dias" mund*`)
+        - limit: Max number of results to return (default: 10)
+        - session_id: Optional filter by session
+        - sender: Optional filter by sender type ("user" or "system")
 
     - **Response**: List of matching messages
 
@@ -54,40 +109,150 @@ async def search_messages(
         - 422: if the query parameter is missing or invalid
     """
     try:
-        result = await message_repository.search_messages(query=query, limit=limit)
-        return {"status": "success", "data": result}
+        result = await message_repository.search_messages(
+            query=query, limit=limit, session_id=session_id, sender=sender
+        )
+        return FastJSONResponse({"status": "success", "data": result})
     except Exception:
         raise HTTPException(
             status_code=500, detail="Error when searching for messages")
 
 
-@router.get("/session/{session_id}", response_model=MessageListResponse)
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+@router.get("/export")
+async def export_messages(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    session_id: str = Query(None),
+    sender: str = Query(None, pattern="^(user|system)?$"),
+    since: datetime = Query(None),
+    until: datetime = Query(None),
+    query: str = Query(None),
+    current_user: str = Depends(api_key_auth),
+):
+    """
+    Streams every matching message as NDJSON or CSV.
+
+    - **Query Parameters**:
+        - format: "ndjson" (default) or "csv"
+        - session_id: Optional filter by session
+        - sender: Optional filter by sender type ("user" or "system")
+        - since: Optional lower bound (inclusive) for the message timestamp
+        - until: Optional upper bound (exclusive) for the message timestamp
+        - query: Optional full-text search terms, same syntax as /search
+
+    - **Response**: Rows are streamed as they are read, so exports of any
+      size use constant server memory
+
+    - **Status Code**: 200 OK
+
+    - **Errors**:
+        - 422: if query parameters are invalid
+    """
+    chunks = message_repository.export_messages(
+        format, session_id, sender, since, until, query
+    )
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="messages.{format}"'},
+    )
+
+
+@router.get("/cache/stats")
+async def get_cache_stats(
+    current_user: str = Depends(api_key_auth),
+):
+    """
+    Returns the counters of the session history cache.
+
+    - **Response**: enabled flag, entries, bytes, max_bytes, hits, misses,
+      hit_ratio, evictions and invalidations
+
+    - **Status Code**: 200 OK
+    """
+    return {"status": "success", "data": message_repository.cache_stats()}
+
+
+@router.get("/connections/stats")
+async def get_connection_stats(
+    current_user: str = Depends(api_key_auth),
+):
+    """
+    Returns the WebSocket connections held by this worker.
+
+    - **Response**: connections, sessions, max_connections, max_per_session,
+      bytes_per_connection (estimated) and bytes
+
+    - **Status Code**: 200 OK
+    """
+    return {"status": "success", "data": broadcaster.registry.stats()}
+
+
+@router.get("/session/{session_id}/stats", response_model=SessionStatsResponse)
+async def get_session_stats(
+    session_id: str,
+    current_user: str = Depends(api_key_auth),
+):
+    """
+    Returns the aggregates of a session, kept up to date on every write.
+
+    - **Response**: message_count, user_count, system_count, word_count,
+      character_count, first_activity and last_activity
+
+    - **Status Code**: 200 OK
+
+    - **Errors**:
+        - 404: if the session has no stored messages
+    """
+    stats = await message_repository.get_session_stats(session_id)
+    if stats is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"status": "success", "data": stats}
+
+
+@router.get("/session/{session_id}", response_model=MessagePageResponse)
 async def get_messages(
     session_id: str,
     limit: int = Query(10, ge=1, le=100),
     offset: int = Query(0, ge=0),
     sender: str = Query(None, pattern="^(user|system)?$"),
+    after: str = Query(None),
+    before: str = Query(None),
     current_user: str = Depends(api_key_auth),
 ):
     """
-    Retrieves a list of messages associated with a given session.
+    Retrieves a page of messages of a given session in chronological order.
 
     - **Query Parameters**:
         - session_id: Required session identifier to filter messages
         - limit: Max number of results to return (default: 10)
-        - offset: Number of records to skip (default: 0)
+        - offset: Number of records to skip (default: 0). Prefer cursors
+          for deep pages
         - sender: Optional filter by sender type ("user" or "system")
+        - after: Cursor returned as `next_cursor`, to get the following page
+        - before: Cursor returned as `prev_cursor`, to get the previous page
 
-    - **Response**: List of messages with metadata
+    - **Response**: List of messages with metadata, plus `next_cursor` and
+      `prev_cursor` (null when there are no more pages in that direction)
 
     - **Status Code**: 200 OK
 
     - **Errors**:
+        - 400: if a cursor is invalid or both cursors are given
         - 422: if query parameters are invalid
     """
     try:
-        result = await message_repository.get_messages(session_id, limit, offset, sender)
-        return {"status": "success", "data": result}
+        page = await message_repository.get_messages(
+            session_id, limit, offset, sender, after, before
+        )
+        return FastJSONResponse({"status": "success", **page})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception:
         raise HTTPException(
             status_code=500, detail="Error when searching for messages")
@@ -1,31 +1,105 @@
-from fastapi import WebSocket, WebSocketDisconnect, APIRouter
-from typing import Dict, List
-from app.core.logging import get_logging
+import time
+from typing import Optional
+
+from fastapi import WebSocket, APIRouter, Query
+from starlette.websockets import WebSocketState
+from starlette.status import WS_1008_POLICY_VIOLATION, WS_1013_TRY_AGAIN_LATER
+from app.core.config import settings
+from app.core.limiter import key_identity, limiter
+from app.core.logging import LogRateLimiter, get_logging
+from app.core.security import is_valid_api_key
+from app.services.broadcaster import broadcaster, is_pong
+from app.services.connections import ConnectionLimitExceeded
+from app.services.message import message_repository
+from app.services.ws_ingest import IngestChannel
 
 router = APIRouter()
-active_connections: Dict[str, List[WebSocket]] = {}
 
 log = get_logging(__name__)
+frame_log_limiter = LogRateLimiter(settings.LOG_WS_FRAMES_PER_SECOND)
 
 @router.websocket("/ws/{session_id}")
-async def websocket_endpoint(websocket: WebSocket, session_id: str):
-    await websocket.accept()
-    log.info(f"Client connected to session '{session_id}'")
+async def websocket_endpoint(
+    websocket: WebSocket,
+    session_id: str,
+    last_seq: Optional[int] = Query(None, ge=0),
+):
+    """
+    Streams the events of a session and ingests the messages the client sends.
 
-    if session_id not in active_connections:
-        active_connections[session_id] = []
+    - **Auth**: API key in the `X-API-Key` header or the `api_key` query
+      parameter, checked once at connect; invalid keys are closed with 1008
+    - **Resume**: `last_seq` is the highest `seq` the client received; the
+      events after it are sent first, from memory or the database. A
+      "resync" event means the client must reload the session over REST
+    - **Client frames**: one MessageIn JSON object per frame, for this
+      session, or `{"event": "pong"}` in answer to a ping
+    - **Server frames**: session events, and `{"event": "ack", "data": [...]}`
+      after every micro-batch with message_id, status ("stored", "duplicate",
+      "rejected" or "failed") and detail for each frame received
+    - **Rate limit**: every micro-batch is charged its number of messages
+      against the "ws:ingest" limit of the API key; batches over it are
+      acked as "rejected" with detail "rate_limited"
+    - **Heartbeat**: only when `WS_IDLE_TIMEOUT_SECONDS` is set. Clients that
+      have been silent for `WS_HEARTBEAT_INTERVAL_SECONDS` get
+      `{"event": "ping"}` and must answer `{"event": "pong"}` (or send any
+      frame); connections silent for `WS_IDLE_TIMEOUT_SECONDS` are closed
+      with 1001. Half-open connections are otherwise detected by the
+      server's protocol-level pings, which browsers answer on their own
+    - **Limits**: connections over the worker or session cap are closed with 1013
+    """
+    api_key = websocket.headers.get("x-api-key") or websocket.query_params.get("api_key")
+    if not is_valid_api_key(api_key):
+        log.warning(f"Rejected WebSocket connection to session '{session_id}': invalid API key")
+        await websocket.close(code=WS_1008_POLICY_VIOLATION)
+        return
 
-    active_connections[session_id].append(websocket)
-    log.debug(f"Active connections for session '{session_id}': {len(active_connections[session_id])}")
+    await websocket.accept()
+    log.info(f"Client connected to session '{session_id}'")
 
     try:
+        subscriber = broadcaster.connect(session_id, websocket, hold=last_seq is not None)
+    except ConnectionLimitExceeded as e:
+        log.warning(f"Rejected WebSocket connection to session '{session_id}': {e}")
+        await websocket.close(code=WS_1013_TRY_AGAIN_LATER, reason=str(e))
+        return
+    log.debug(f"Active connections for session '{session_id}': {len(broadcaster.connections[session_id])}")
+
+    async def receive() -> str:
         while True:
             message = await websocket.receive_text()
+            subscriber.last_seen = time.monotonic()
+            if not is_pong(message):
+                break
+        if frame_log_limiter.allow():
             log.info(f"Message received from WebSocket in session '{session_id}': {message}")
-    except WebSocketDisconnect:
-        active_connections[session_id].remove(websocket)
+        return message
+
+    identity = key_identity(api_key)
+    channel = IngestChannel(
+        message_repository,
+        session_id,
+        batch_size=settings.WS_INGEST_BATCH_SIZE,
+        flush_interval=settings.WS_INGEST_FLUSH_INTERVAL_MS / 1000,
+        quota=lambda count: limiter.charge("ws:ingest", identity, count, default="600/minute"),
+    )
+    subscriber.stop = channel.close
+    try:
+        if last_seq is not None:
+            missed = broadcaster.replay.since(session_id, last_seq)
+            if missed is None:
+                missed = await message_repository.missed_events(session_id, last_seq)
+            await broadcaster.resume(subscriber, missed)
+            log.info(f"Replayed {len(missed)} events to session '{session_id}' after seq {last_seq}")
+        await channel.run(receive, websocket.send_text)
         log.warning(f"Client disconnected from session '{session_id}'")
+    finally:
+        broadcaster.disconnect(subscriber)
+        if (
+            websocket.client_state == WebSocketState.CONNECTED
+            and websocket.application_state == WebSocketState.CONNECTED
+        ):
+            await websocket.close()
 
-        if not active_connections[session_id]:
-            del active_connections[session_id]
+        if session_id not in broadcaster.connections:
             log.info(f"Session '{session_id}' removed (no active connections)")
@@ -1,9 +1,16 @@
+from typing import Literal, Optional
+
 from pydantic_settings import BaseSettings
 
 
 class Settings(BaseSettings):
     ENV: str = "dev"
     DATABASE_URL: str = "sqlite://db.sqlite3"
+    SQLITE_SYNCHRONOUS: Literal["OFF", "NORMAL", "FULL", "EXTRA"] = "NORMAL"
+    SQLITE_CACHE_SIZE: int = -64000
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_READER_POOL_SIZE: int = 4
 
     API_KEY: str = "mysecret123"
 
@@ -13,6 +20,95 @@ class Settings(BaseSettings):
 
     DEBUGGER: bool = False
 
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: Literal["text", "json"] = "text"
+    LOG_QUEUE_ENABLED: bool = False
+    LOG_WS_FRAMES_PER_SECOND: int = 10
+
+    METRICS_ENABLED: bool = True
+
+    PROFILING_ENABLED: bool = False
+    PROFILING_SAMPLE_RATE: float = 0.0
+    PROFILING_HEADER: str = "X-Profile"
+    PROFILING_MODE: Literal["sampling", "cprofile"] = "sampling"
+    PROFILING_INTERVAL_MS: float = 1.0
+    PROFILING_OUTPUT_DIR: str = "profiles"
+
+    BATCH_MAX_SIZE: int = 1000
+
+    WRITE_BEHIND_ENABLED: bool = False
+    WRITE_BEHIND_ACK: Literal["enqueue", "commit"] = "commit"
+    WRITE_BEHIND_QUEUE_SIZE: int = 10000
+    WRITE_BEHIND_BATCH_SIZE: int = 500
+    WRITE_BEHIND_FLUSH_INTERVAL_MS: int = 50
+
+    WS_SEND_QUEUE_SIZE: int = 256
+    WS_SLOW_CONSUMER_POLICY: Literal["drop_oldest", "drop_newest", "disconnect"] = "drop_oldest"
+    WS_INGEST_BATCH_SIZE: int = 100
+    WS_INGEST_FLUSH_INTERVAL_MS: int = 20
+    WS_REPLAY_BUFFER_SIZE: int = 256
+    WS_REPLAY_MAX_SESSIONS: int = 10000
+    WS_REPLAY_DB_LIMIT: int = 1000
+    WS_MAX_CONNECTIONS: int = 100000
+    WS_MAX_CONNECTIONS_PER_SESSION: int = 1000
+    # Half-open connections are detected by uvicorn's protocol pings
+    # (--ws-ping-interval/--ws-ping-timeout). Closing connections whose client
+    # sent nothing for WS_IDLE_TIMEOUT_SECONDS is opt-in: clients must then
+    # answer the ping events sent every WS_HEARTBEAT_INTERVAL_SECONDS.
+    WS_HEARTBEAT_INTERVAL_SECONDS: float = 20.0
+    WS_IDLE_TIMEOUT_SECONDS: float = 0.0
+
+    BROADCAST_BACKEND: Literal["memory", "redis"] = "memory"
+    BROADCAST_REDIS_URL: str = "redis://localhost:6379/0"
+    BROADCAST_CHANNEL_PREFIX: str = "chat:session:"
+
+    IDEMPOTENCY_FILTER_ENABLED: bool = True
+    IDEMPOTENCY_FILTER_CAPACITY: int = 1_000_000
+    IDEMPOTENCY_FILTER_ERROR_RATE: float = 0.01
+
+    # The session page cache is invalidated only in the worker that stores a
+    # message. Unset, it is enabled with the in-process broadcast backend
+    # and disabled with BROADCAST_BACKEND=redis, where other workers would
+    # serve pages up to SESSION_CACHE_TTL_SECONDS stale. Set it to true to
+    # accept that staleness.
+    SESSION_CACHE_ENABLED: Optional[bool] = None
+    SESSION_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    SESSION_CACHE_TTL_SECONDS: float = 30.0
+
+    MODERATION_TERMS_PATH: Optional[str] = None
+    MODERATION_RELOAD_INTERVAL_SECONDS: float = 5.0
+
+    EXPORT_CHUNK_SIZE: int = 1000
+
+    CONTENT_COMPRESSION_ENABLED: bool = True
+    CONTENT_COMPRESSION_THRESHOLD_BYTES: int = 4096
+    CONTENT_COMPRESSION_LEVEL: int = 6
+
+    RETENTION_ENABLED: bool = False
+    RETENTION_DAYS: int = 90
+    RETENTION_ARCHIVE_DIR: str = "archive"
+    RETENTION_BATCH_SIZE: int = 500
+    RETENTION_BATCH_PAUSE_MS: int = 50
+    RETENTION_INTERVAL_SECONDS: float = 3600.0
+
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: Literal["memory", "shared_memory", "redis"] = "memory"
+    RATE_LIMITS: dict[str, str] = {
+        "messages:create": "5/minute",
+        "messages:batch": "60/minute",
+        # Counts messages, not frames: each WebSocket micro-batch costs its
+        # size, so keep it at least WS_INGEST_BATCH_SIZE
+        "ws:ingest": "600/minute",
+    }
+    RATE_LIMIT_TRUST_FORWARDED_FOR: bool = False
+    # Let requests through (True) or answer 503 (False) when the backend fails
+    RATE_LIMIT_FAIL_OPEN: bool = True
+    RATE_LIMIT_MEMORY_MAX_KEYS: int = 100000
+    RATE_LIMIT_SHM_NAME: str = "chat-api-rate-limit"
+    RATE_LIMIT_SHM_SLOTS: int = 65536
+    RATE_LIMIT_REDIS_URL: str = "redis://localhost:6379/0"
+    RATE_LIMIT_REDIS_PREFIX: str = "chat:rate:"
+
     class Config:
         env_file = ".env"
 
@@ -1,11 +1,16 @@
+import math
+
 from fastapi import Request
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 from tortoise.exceptions import IntegrityError
 
+from app.core.limiter import RateLimitExceeded
+
 from starlette.status import (
     HTTP_400_BAD_REQUEST,
     HTTP_422_UNPROCESSABLE_ENTITY,
+    HTTP_429_TOO_MANY_REQUESTS,
     HTTP_500_INTERNAL_SERVER_ERROR
 )
 
@@ -48,3 +53,11 @@ async def integrity_exception_handler(request: Request, exc: IntegrityError):
             },
         },
     )
+
+
+async def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded):
+    return JSONResponse(
+        status_code=HTTP_429_TOO_MANY_REQUESTS,
+        content={"detail": "Rate limit exceeded"},
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+    )
@@ -1,4 +1,147 @@
-from slowapi import Limiter
-from slowapi.util import get_remote_address
+import hashlib
+import re
+from typing import Callable, Optional
 
-limiter = Limiter(key_func=get_remote_address)
+from fastapi import HTTPException, Request
+from starlette.status import HTTP_503_SERVICE_UNAVAILABLE
+
+from app.core.config import settings
+from app.core.logging import get_logging
+from app.core.metrics import rate_limit_backend_errors, rate_limit_rejections
+from app.core.rate_limit_backends import RateLimitBackend, create_rate_limit_backend
+from app.core.security import is_valid_api_key
+
+log = get_logging(__name__)
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+LIMIT_PATTERN = re.compile(r"^\s*(\d+)\s*/\s*(\d+)?\s*(second|minute|hour|day)s?\s*$")
+
+
+class RateLimitExceeded(Exception):
+    def __init__(self, route: str, retry_after: float):
+        super().__init__(f"Rate limit exceeded for '{route}'")
+        self.route = route
+        self.retry_after = retry_after
+
+
+def parse_limit(limit: str) -> tuple[float, float]:
+    """
+    Parses a limit such as "5/minute" or "100/10 seconds".
+
+    Args:
+        limit (str): Number of requests per period.
+
+    Returns:
+        tuple[float, float]: Refill rate in tokens per second and bucket
+        capacity. The capacity equals the request count, so a full bucket
+        allows that many requests in a burst.
+
+    Raises:
+        ValueError: If the limit cannot be parsed.
+    """
+    match = LIMIT_PATTERN.match(limit)
+    if not match:
+        raise ValueError(f"Invalid rate limit '{limit}'")
+    count, multiplier, period = match.groups()
+    seconds = PERIODS[period] * int(multiplier or 1)
+    return int(count) / seconds, float(count)
+
+
+def key_identity(api_key: str) -> str:
+    """Rate limit identity of a valid API key, hashed so keys never reach the shared store."""
+    return "key:" + hashlib.blake2b(api_key.encode(), digest_size=12).hexdigest()
+
+
+def client_identity(request: Request) -> str:
+    """
+    Returns the rate limit identity of a request: the API key when a valid
+    one is sent, otherwise the client IP, so rotating invalid keys does not
+    get fresh buckets.
+    """
+    api_key = request.headers.get("x-api-key")
+    if api_key and is_valid_api_key(api_key):
+        return key_identity(api_key)
+    if settings.RATE_LIMIT_TRUST_FORWARDED_FOR:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return "ip:" + forwarded.split(",", 1)[0].strip()
+    return "ip:" + (request.client.host if request.client else "unknown")
+
+
+class RateLimiter:
+    """
+    Token-bucket rate limiter applied per route through FastAPI dependencies.
+
+    Limits come from `settings.RATE_LIMITS`, keyed by route name, and are
+    enforced per client identity on the configured backend. When the backend
+    fails, requests are let through with `fail_open`, otherwise answered
+    with 503.
+    """
+
+    def __init__(
+        self,
+        backend: RateLimitBackend,
+        limits: dict[str, str],
+        enabled: bool = True,
+        fail_open: bool = True,
+    ):
+        self.backend = backend
+        self.enabled = enabled
+        self.fail_open = fail_open
+        self.limits = {route: parse_limit(limit) for route, limit in limits.items()}
+
+    def limit(self, route: str, default: Optional[str] = None) -> Callable:
+        self._configure(route, default)
+
+        async def dependency(request: Request) -> None:
+            retry_after = await self.charge(route, client_identity(request))
+            if retry_after:
+                raise RateLimitExceeded(route, retry_after)
+
+        return dependency
+
+    async def charge(self, route: str, identity: str, cost: float = 1.0, default: Optional[str] = None) -> float:
+        """
+        Takes `cost` tokens from the bucket of `identity` on `route`.
+
+        Returns:
+            float: 0.0 when allowed, otherwise the seconds to wait before
+            retrying
+
+        Raises:
+            HTTPException: 503 when the backend fails and `fail_open` is off.
+        """
+        if not self.enabled:
+            return 0.0
+        self._configure(route, default)
+        rate, capacity = self.limits[route]
+        try:
+            retry_after = await self.backend.acquire(f"{route}:{identity}", rate, capacity, cost)
+        except Exception as e:
+            rate_limit_backend_errors.inc(route)
+            log.error(f"Rate limit backend failed for '{route}': {e}")
+            if self.fail_open:
+                return 0.0
+            raise HTTPException(
+                status_code=HTTP_503_SERVICE_UNAVAILABLE, detail="Rate limiter unavailable"
+            )
+        if retry_after:
+            rate_limit_rejections.inc(route)
+        return retry_after
+
+    def _configure(self, route: str, default: Optional[str]) -> None:
+        if route not in self.limits:
+            if default is None:
+                raise ValueError(f"No rate limit configured for '{route}'")
+            self.limits[route] = parse_limit(default)
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+
+limiter = RateLimiter(
+    create_rate_limit_backend(),
+    settings.RATE_LIMITS,
+    enabled=settings.RATE_LIMIT_ENABLED,
+    fail_open=settings.RATE_LIMIT_FAIL_OPEN,
+)
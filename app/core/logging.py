@@ -1,4 +1,14 @@
+import atexit
 import logging
+import queue
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional, TextIO
+
+import orjson
+
+from app.core.config import settings
 
 
 class MyFormat(logging.Formatter):
@@ -21,15 +31,128 @@ class MyFormat(logging.Formatter):
         logging.CRITICAL: f"{asctime} {bold_red} {name} {levelname} {message} {reset}",
     }
 
+    def __init__(self):
+        super().__init__()
+        self._formatters = {
+            level: logging.Formatter(log_fmt) for level, log_fmt in self.FORMATS.items()
+        }
+
     def format(self, record):
-        log_fmt = self.FORMATS.get(record.levelno)
-        formatter = logging.Formatter(log_fmt)
+        formatter = self._formatters.get(record.levelno, self._formatters[logging.INFO])
         return formatter.format(record)
 
 
+RESERVED_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+
+class JSONFormatter(logging.Formatter):
+    """Formats records as one JSON object per line, including `extra` fields."""
+
+    def format(self, record):
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        for key, value in record.__dict__.items():
+            if key not in RESERVED_ATTRS:
+                entry[key] = value
+        return orjson.dumps(entry, option=orjson.OPT_UTC_Z, default=str).decode()
+
+
+class LogRateLimiter:
+    """
+    Lets at most `per_second` records of a chatty log line through per
+    second and counts the ones it suppresses.
+
+    Check it before building the message so suppressed records cost nothing:
+
+        if frame_log_limiter.allow():
+            log.info(f"...")
+    """
+
+    __slots__ = ("per_second", "suppressed", "_window", "_count")
+
+    def __init__(self, per_second: int):
+        self.per_second = per_second
+        self.suppressed = 0
+        self._window = 0
+        self._count = 0
+
+    def allow(self) -> bool:
+        window = int(time.monotonic())
+        if window != self._window:
+            self._window = window
+            self._count = 0
+        if self._count < self.per_second:
+            self._count += 1
+            return True
+        self.suppressed += 1
+        return False
+
+
+def create_handler(stream: Optional[TextIO] = None) -> tuple[logging.Handler, Optional[QueueListener]]:
+    """
+    Builds the handler shared by every logger of the application.
+
+    Args:
+        stream (TextIO, optional): Output stream, stderr by default.
+
+    Returns:
+        tuple: The handler to attach to loggers and, when LOG_QUEUE_ENABLED is
+        set, the started QueueListener that writes records from a background
+        thread so the event loop only pays for an enqueue.
+    """
+    output = logging.StreamHandler(stream)
+    output.setFormatter(JSONFormatter() if settings.LOG_FORMAT == "json" else MyFormat())
+    if not settings.LOG_QUEUE_ENABLED:
+        return output, None
+
+    records = queue.SimpleQueue()
+    listener = QueueListener(records, output, respect_handler_level=True)
+    listener.start()
+    return QueueHandler(records), listener
+
+
+_handler: Optional[logging.Handler] = None
+_listener: Optional[QueueListener] = None
+
+
+def _shared_handler() -> logging.Handler:
+    global _handler, _listener
+    if _handler is None:
+        _handler, _listener = create_handler()
+        if _listener is not None:
+            atexit.register(stop_logging)
+    return _handler
+
+
+def stop_logging() -> None:
+    """
+    Flushes queued records and stops the background logging thread. Loggers
+    then write directly to the output handler, so records logged later,
+    e.g. by tasks cancelled during shutdown, are not lost.
+    """
+    global _handler, _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    output = _listener.handlers[0]
+    for log in [logging.getLogger(), *logging.Logger.manager.loggerDict.values()]:
+        if isinstance(log, logging.Logger) and _handler in log.handlers:
+            log.removeHandler(_handler)
+            log.addHandler(output)
+    _handler, _listener = output, None
+
+
 def get_logging(mod_name: str) -> logging.Logger:
     """
-    Returns a logger instance with colored output per level.
+    Returns a logger that writes through the application's shared handler.
+
+    Calling it repeatedly for the same module does not add handlers.
 
     Args:
         mod_name (str): Name of the module to associate with the logger
@@ -38,8 +161,8 @@ def get_logging(mod_name: str) -> logging.Logger:
         logging.Logger: Configured logger
     """
     log = logging.getLogger(mod_name)
-    handler = logging.StreamHandler()
-    handler.setFormatter(MyFormat())
-    log.addHandler(handler)
-    log.setLevel(logging.INFO)
+    handler = _shared_handler()
+    if handler not in log.handlers:
+        log.addHandler(handler)
+    log.setLevel(settings.LOG_LEVEL)
     return log
@@ -0,0 +1,178 @@
+import asyncio
+import cProfile
+import os
+import random
+import re
+import sys
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Literal
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.logging import get_logging
+
+log = get_logging(__name__)
+
+ProfilingMode = Literal["sampling", "cprofile"]
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def task_stack(task: asyncio.Task, thread_id: int) -> list:
+    """
+    Returns the frames of `task` from its outermost coroutine to the code
+    currently running or awaited.
+
+    The coroutine chain is followed through `cr_await`, so a task suspended
+    on I/O still reports where it waits. When the task is running, the live
+    frames of the event loop thread below its innermost coroutine are added.
+    """
+    frames = []
+    awaitable = task.get_coro()
+    innermost = None
+    while awaitable is not None:
+        frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "gi_frame", None) \
+            or getattr(awaitable, "ag_frame", None)
+        if frame is None:
+            break
+        frames.append(frame)
+        innermost = awaitable
+        awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "gi_yieldfrom", None) \
+            or getattr(awaitable, "ag_await", None)
+
+    if innermost is not None and getattr(innermost, "cr_running", False) and frames:
+        live = []
+        frame = sys._current_frames().get(thread_id)
+        while frame is not None and frame is not frames[-1]:
+            live.append(frame)
+            frame = frame.f_back
+        if frame is not None:
+            frames.extend(reversed(live))
+    return frames
+
+
+class TaskSampler(threading.Thread):
+    """
+    Background thread that samples the stack of one asyncio task at a fixed
+    interval and aggregates the samples as collapsed stacks.
+    """
+
+    def __init__(self, task: asyncio.Task, interval: float):
+        super().__init__(name="request-profiler", daemon=True)
+        self.task = task
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.samples: Counter = Counter()
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            frames = task_stack(self.task, self.thread_id)
+            if frames:
+                self.samples[";".join(_frame_label(frame) for frame in frames)] += 1
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self.join()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that profiles a fraction of HTTP requests, or any request
+    sending `header` together with a valid API key, and writes the result to
+    `output_dir`.
+
+    In "sampling" mode a thread samples the request task every `interval`
+    seconds and writes a `.collapsed` file ready for flamegraph tools; time
+    spent awaiting the database is attributed to the awaiting code. In
+    "cprofile" mode the request runs under cProfile and a `.prof` stats
+    file is written; other tasks interleaved on the event loop are included.
+    The file name is returned in the `X-Profile-Path` response header.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        api_key: str,
+        output_dir: str = "profiles",
+        sample_rate: float = 0.0,
+        header: str = "X-Profile",
+        mode: ProfilingMode = "sampling",
+        interval: float = 0.001,
+    ):
+        self.app = app
+        self.api_key = api_key.encode()
+        self.output_dir = output_dir
+        self.sample_rate = sample_rate
+        self.header = header.lower().encode()
+        self.mode = mode
+        self.interval = interval
+        self._cprofile_active = False
+
+    def _should_profile(self, scope: Scope) -> bool:
+        if self.sample_rate and random.random() < self.sample_rate:
+            return True
+        headers = dict(scope["headers"])
+        return self.header in headers and headers.get(b"x-api-key") == self.api_key
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        path = self._output_path(scope)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-profile-path", path.encode())]
+            await send(message)
+
+        if self.mode == "cprofile":
+            # The interpreter supports one active profiler; concurrent
+            # requests are served unprofiled until it is released.
+            if self._cprofile_active:
+                await self.app(scope, receive, send)
+                return
+            self._cprofile_active = True
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                profiler.disable()
+                self._cprofile_active = False
+                await asyncio.to_thread(self._write_stats, profiler, path)
+            return
+
+        sampler = TaskSampler(asyncio.current_task(), self.interval)
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            await asyncio.to_thread(sampler.stop)
+            await asyncio.to_thread(self._write_text, sampler.collapsed(), path)
+
+    def _output_path(self, scope: Scope) -> str:
+        timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        route = re.sub(r"[^A-Za-z0-9]+", "_", scope["path"]).strip("_") or "root"
+        extension = "prof" if self.mode == "cprofile" else "collapsed"
+        return os.path.join(self.output_dir, f"{timestamp}-{scope['method']}-{route}.{extension}")
+
+    def _write_stats(self, profiler: cProfile.Profile, path: str) -> None:
+        os.makedirs(self.output_dir, exist_ok=True)
+        profiler.dump_stats(path)
+        log.info(f"Request profile written to {path}")
+
+    def _write_text(self, content: str, path: str) -> None:
+        os.makedirs(self.output_dir, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as output:
+            output.write(content)
+        log.info(f"Request profile written to {path}")
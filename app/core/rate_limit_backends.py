@@ -0,0 +1,217 @@
+import hashlib
+import os
+import struct
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+
+from app.core.config import settings
+from app.core.logging import get_logging
+
+log = get_logging(__name__)
+
+
+class RateLimitBackend(ABC):
+    """
+    Storage for token buckets.
+
+    `acquire` refills the bucket for `key` at `rate` tokens per second up to
+    `capacity`, then tries to take `cost` tokens from it. It returns 0.0 when
+    the request is allowed, otherwise the seconds until enough tokens are
+    available again.
+    """
+
+    @abstractmethod
+    async def acquire(self, key: str, rate: float, capacity: float, cost: float = 1.0) -> float:
+        ...
+
+    async def close(self) -> None:
+        pass
+
+
+def _take(tokens: float, updated: float, now: float, rate: float, capacity: float, cost: float):
+    tokens = min(capacity, tokens + (now - updated) * rate)
+    if tokens >= cost:
+        return tokens - cost, 0.0
+    return tokens, (cost - tokens) / rate
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """
+    Buckets held in a dict; limits are enforced per process only.
+
+    Buckets are kept in least recently used order. The least recently used
+    ones are dropped once they have refilled, since a full bucket is the
+    same as no bucket, and beyond `max_keys` regardless.
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        # key -> (tokens, last refill, time the bucket is full again)
+        self._buckets: OrderedDict[str, tuple[float, float, float]] = OrderedDict()
+
+    async def acquire(self, key: str, rate: float, capacity: float, cost: float = 1.0) -> float:
+        now = time.monotonic()
+        tokens, updated, _ = self._buckets.pop(key, (capacity, now, now))
+        tokens, retry_after = _take(tokens, updated, now, rate, capacity, cost)
+        self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+        self._evict(now)
+        return retry_after
+
+    def _evict(self, now: float) -> None:
+        buckets = self._buckets
+        while len(buckets) > self.max_keys:
+            buckets.popitem(last=False)
+        while buckets:
+            full_at = next(iter(buckets.values()))[2]
+            if full_at > now:
+                break
+            buckets.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def reset(self) -> None:
+        self._buckets.clear()
+
+
+class SharedMemoryRateLimitBackend(RateLimitBackend):
+    """
+    Buckets shared by every worker on the host through a POSIX shared memory
+    segment, guarded by an `flock` on a companion lock file.
+
+    The segment is a fixed table of `slots` records (key hash, tokens, last
+    refill). A key probes a few neighbouring slots; when all of them belong
+    to other keys the least recently refilled one is recycled, which at
+    worst hands that key a full bucket again.
+    """
+
+    SLOT = struct.Struct("<Qdd")
+    PROBES = 8
+
+    def __init__(self, name: str, slots: int = 65536, lock_path: Optional[str] = None):
+        import fcntl
+        from multiprocessing import resource_tracker, shared_memory
+
+        self._fcntl = fcntl
+        self._resource_tracker = resource_tracker
+        self.slots = slots
+        size = slots * self.SLOT.size
+        try:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            self._shm = shared_memory.SharedMemory(name=name)
+        # Workers come and go independently; the segment must outlive any
+        # single one of them, so it is not left to the resource tracker.
+        resource_tracker.unregister(self._shm._name, "shared_memory")
+
+        self._buffer = self._shm.buf
+        lock_path = lock_path or os.path.join(tempfile.gettempdir(), f"{name}.lock")
+        self._lock_fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+
+    async def acquire(self, key: str, rate: float, capacity: float, cost: float = 1.0) -> float:
+        key_hash = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+        start = key_hash % self.slots
+        record_size = self.SLOT.size
+
+        self._fcntl.flock(self._lock_fd, self._fcntl.LOCK_EX)
+        try:
+            now = time.monotonic()
+            offset = None
+            oldest_offset, oldest_updated = None, None
+            tokens, updated = capacity, now
+            for probe in range(self.PROBES):
+                candidate = ((start + probe) % self.slots) * record_size
+                slot_hash, slot_tokens, slot_updated = self.SLOT.unpack_from(self._buffer, candidate)
+                if slot_hash == key_hash:
+                    offset, tokens, updated = candidate, slot_tokens, slot_updated
+                    break
+                if slot_hash == 0:
+                    offset = candidate
+                    break
+                if oldest_updated is None or slot_updated < oldest_updated:
+                    oldest_offset, oldest_updated = candidate, slot_updated
+            if offset is None:
+                offset = oldest_offset
+
+            tokens, retry_after = _take(tokens, updated, now, rate, capacity, cost)
+            self.SLOT.pack_into(self._buffer, offset, key_hash, tokens, now)
+        finally:
+            self._fcntl.flock(self._lock_fd, self._fcntl.LOCK_UN)
+        return retry_after
+
+    async def close(self, unlink: bool = False) -> None:
+        self._buffer = None
+        self._shm.close()
+        if unlink:
+            # SharedMemory.unlink() unregisters from the tracker as well.
+            self._resource_tracker.register(self._shm._name, "shared_memory")
+            self._shm.unlink()
+        os.close(self._lock_fd)
+
+
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    retry_after = (cost - tokens) / rate
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return tostring(retry_after)
+"""
+
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """
+    Buckets stored in Redis hashes and updated atomically by a Lua script,
+    shared by every worker and host. The script reads the Redis clock so
+    skew between application hosts does not affect refills.
+    """
+
+    def __init__(self, url: str, prefix: str = "chat:rate:", client=None):
+        self.url = url
+        self.prefix = prefix
+        self._client = client
+        self._script = None
+
+    async def acquire(self, key: str, rate: float, capacity: float, cost: float = 1.0) -> float:
+        if self._script is None:
+            if self._client is None:
+                import redis.asyncio as redis
+
+                self._client = redis.from_url(self.url)
+            self._script = self._client.register_script(TOKEN_BUCKET_SCRIPT)
+
+        retry_after = await self._script(keys=[f"{self.prefix}{key}"], args=[rate, capacity, cost])
+        return float(retry_after)
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._script = None
+
+
+def create_rate_limit_backend() -> RateLimitBackend:
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        return RedisRateLimitBackend(settings.RATE_LIMIT_REDIS_URL, settings.RATE_LIMIT_REDIS_PREFIX)
+    if settings.RATE_LIMIT_BACKEND == "shared_memory":
+        log.info(f"Using shared memory rate limit segment '{settings.RATE_LIMIT_SHM_NAME}'")
+        return SharedMemoryRateLimitBackend(settings.RATE_LIMIT_SHM_NAME, settings.RATE_LIMIT_SHM_SLOTS)
+    return MemoryRateLimitBackend(settings.RATE_LIMIT_MEMORY_MAX_KEYS)
@@ -0,0 +1,18 @@
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response encoded with orjson.
+
+    Returning it from an endpoint skips FastAPI's response_model validation
+    and jsonable_encoder pass, so the content must already be JSON-ready
+    (dicts, lists, str, numbers, datetimes, enums). UTC datetimes are
+    rendered with a `Z` suffix, like pydantic does.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
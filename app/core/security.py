@@ -5,8 +5,13 @@ from app.core.config import settings
 
 api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
 
+
+def is_valid_api_key(api_key: str | None) -> bool:
+    return api_key == settings.API_KEY
+
+
 async def api_key_auth(api_key: str = Security(api_key_header)):
-    if api_key != settings.API_KEY:
+    if not is_valid_api_key(api_key):
         raise HTTPException(
             status_code=HTTP_403_FORBIDDEN, detail="Could not validate API Key"
         )
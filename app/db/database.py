@@ -1,10 +1,158 @@
-from tortoise import Tortoise
+from itertools import count
+from typing import Optional
+
+from tortoise import Tortoise, connections
+from tortoise.backends.base.client import BaseDBAsyncClient
 from fastapi import FastAPI
 from app.core.config import settings
+from app.db.fulltext import setup_fulltext_index
+
+MODELS = ["app.models.message", "app.models.archive"]
+READER_CONNECTION_PREFIX = "reader_"
+
+# Columns added to tables after their first release. `generate_schemas` only
+# creates missing tables, so `add_missing_columns` adds these on SQLite.
+ADDED_COLUMNS = {
+    "messages": {"content_zlib": "BLOB", "seq": "BIGINT"},
+    "session_stats": {"last_seq": "BIGINT NOT NULL DEFAULT 0"},
+}
+
+SEQ_INDEX = "uidx_messages_session_seq"
+# Plain (session_id, seq) index of earlier releases, replaced by SEQ_INDEX
+LEGACY_SEQ_INDEX = "idx_messages_session_4350d2"
+
+
+class ReaderPool:
+    """
+    Read-only connections opened next to the writer, handed out round-robin.
+
+    With WAL journaling, readers see the last committed state without
+    waiting for the writer, so each connection (one aiosqlite thread) adds
+    read concurrency. Empty when the database is not a SQLite file.
+    """
+
+    def __init__(self):
+        self._readers: list[BaseDBAsyncClient] = []
+        self._turn = count()
+
+    def configure(self, readers: list[BaseDBAsyncClient]) -> None:
+        self._readers = readers
+
+    def get(self) -> Optional[BaseDBAsyncClient]:
+        if not self._readers:
+            return None
+        return self._readers[next(self._turn) % len(self._readers)]
+
+    def __len__(self) -> int:
+        return len(self._readers)
+
+
+reader_pool = ReaderPool()
+
 
-async def init_db(app: FastAPI) -> None:
-    await Tortoise.init(
-        db_url=settings.DATABASE_URL,
-        modules={"models": ["app.models.message"]},
+def sqlite_file_path(db_url: str) -> Optional[str]:
+    """
+    Returns the file path of a SQLite database URL, or None for in-memory
+    and non-SQLite databases.
+    """
+    if not db_url.startswith("sqlite://"):
+        return None
+    path = db_url[len("sqlite://"):].split("?", 1)[0]
+    return None if path in ("", ":memory:") else path
+
+
+def build_tortoise_config(db_url: str, reader_pool_size: int = 0) -> dict:
+    """
+    Builds the Tortoise configuration for `db_url`.
+
+    SQLite files get the tuned pragmas on a single writer connection
+    ("default") plus `reader_pool_size` connections opened with
+    `query_only`, named `reader_<n>`.
+
+    Args:
+        db_url (str): Database URL.
+        reader_pool_size (int): Number of read-only connections.
+
+    Returns:
+        dict: Configuration accepted by `Tortoise.init(config=...)`.
+    """
+    apps = {"models": {"models": MODELS, "default_connection": "default"}}
+    path = sqlite_file_path(db_url)
+    if path is None:
+        return {"connections": {"default": db_url}, "apps": apps}
+
+    pragmas = {
+        "journal_mode": "WAL",
+        "synchronous": settings.SQLITE_SYNCHRONOUS,
+        "cache_size": settings.SQLITE_CACHE_SIZE,
+        "mmap_size": settings.SQLITE_MMAP_SIZE,
+        "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,
+    }
+    db_connections = {
+        "default": {"engine": "tortoise.backends.sqlite", "credentials": {"file_path": path, **pragmas}},
+    }
+    for index in range(reader_pool_size):
+        db_connections[f"{READER_CONNECTION_PREFIX}{index}"] = {
+            "engine": "tortoise.backends.sqlite",
+            "credentials": {"file_path": path, **pragmas, "query_only": "ON"},
+        }
+    return {"connections": db_connections, "apps": apps}
+
+
+async def add_missing_columns() -> None:
+    """
+    Adds the columns in `ADDED_COLUMNS` that an existing SQLite database
+    lacks. Runs before `generate_schemas`, whose indexes may use them.
+    """
+    connection = Tortoise.get_connection("default")
+    if connection.capabilities.dialect != "sqlite":
+        return
+    for table, columns in ADDED_COLUMNS.items():
+        existing = {
+            row["name"] for row in await connection.execute_query_dict(f"PRAGMA table_info({table})")
+        }
+        if not existing:
+            continue
+        for column, column_type in columns.items():
+            if column not in existing:
+                await connection.execute_script(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+
+async def prepare_seq_index() -> None:
+    """
+    Readies an existing SQLite database for the unique (session_id, seq)
+    index created by `generate_schemas`. Before seqs were allocated in the
+    database, workers could hand out the same seq twice; the later copies
+    are cleared, so clients resuming past them reload the session over REST.
+    """
+    connection = Tortoise.get_connection("default")
+    if connection.capabilities.dialect != "sqlite":
+        return
+    existing = await connection.execute_query_dict(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND name = ?", [SEQ_INDEX]
     )
-    await Tortoise.generate_schemas() 
+    tables = await connection.execute_query_dict(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'messages'"
+    )
+    if existing or not tables:
+        return
+    await connection.execute_script(f"""
+        UPDATE messages SET seq = NULL
+        WHERE seq IS NOT NULL AND rowid NOT IN (
+            SELECT min(rowid) FROM messages WHERE seq IS NOT NULL GROUP BY session_id, seq
+        );
+        DROP INDEX IF EXISTS {LEGACY_SEQ_INDEX};
+    """)
+
+
+async def init_db(app: Optional[FastAPI] = None) -> None:
+    config = build_tortoise_config(settings.DATABASE_URL, settings.SQLITE_READER_POOL_SIZE)
+    await Tortoise.init(config=config)
+    await add_missing_columns()
+    await prepare_seq_index()
+    await Tortoise.generate_schemas()
+    await setup_fulltext_index()
+    reader_pool.configure([
+        connections.get(name) for name in config["connections"]
+        if name.startswith(READER_CONNECTION_PREFIX)
+    ])
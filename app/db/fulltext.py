@@ -0,0 +1,110 @@
+import re
+from typing import Optional
+
+from tortoise import Tortoise
+from tortoise.backends.base.client import BaseDBAsyncClient
+
+from app.utils.compression import decompress_content
+
+# Contentless FTS5 index over messages.content, keyed by the implicit rowid
+# of the messages table and kept in sync by triggers. VACUUM may renumber
+# those rowids, so run `rebuild_fulltext_index` after vacuuming the database.
+# Compressed contents are indexed as plain text through `zlib_decompress`,
+# which `setup_fulltext_index` registers on the writer connection. The
+# triggers are recreated on every start so their definition stays current.
+FULLTEXT_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    content,
+    content='',
+    tokenize='unicode61 remove_diacritics 2'
+);
+DROP TRIGGER IF EXISTS messages_fts_insert;
+DROP TRIGGER IF EXISTS messages_fts_delete;
+DROP TRIGGER IF EXISTS messages_fts_update;
+CREATE TRIGGER messages_fts_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts(rowid, content)
+    VALUES (new.rowid, coalesce(zlib_decompress(new.content_zlib), new.content));
+END;
+CREATE TRIGGER messages_fts_delete AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts(messages_fts, rowid, content)
+    VALUES ('delete', old.rowid, coalesce(zlib_decompress(old.content_zlib), old.content));
+END;
+CREATE TRIGGER messages_fts_update AFTER UPDATE OF content, content_zlib ON messages BEGIN
+    INSERT INTO messages_fts(messages_fts, rowid, content)
+    VALUES ('delete', old.rowid, coalesce(zlib_decompress(old.content_zlib), old.content));
+    INSERT INTO messages_fts(rowid, content)
+    VALUES (new.rowid, coalesce(zlib_decompress(new.content_zlib), new.content));
+END;
+"""
+
+_QUERY_TOKEN = re.compile(r'"([^"]*)"(\*?)|(\S+)')
+
+
+def supports_fulltext(connection: BaseDBAsyncClient) -> bool:
+    return connection.capabilities.dialect == "sqlite"
+
+
+async def setup_fulltext_index() -> None:
+    """
+    Creates the full-text index and its sync triggers, indexing the rows that
+    already exist the first time it runs.
+    """
+    connection = Tortoise.get_connection("default")
+    if not supports_fulltext(connection):
+        return
+
+    existing = await connection.execute_query_dict(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'messages_fts'"
+    )
+    await register_sql_functions(connection)
+    await connection.execute_script(FULLTEXT_SCHEMA)
+    if not existing:
+        await rebuild_fulltext_index()
+
+
+async def register_sql_functions(connection: BaseDBAsyncClient) -> None:
+    """
+    Registers `zlib_decompress` on an open SQLite connection; the FTS
+    triggers call it whenever messages are written.
+    """
+    await connection._connection.create_function(
+        "zlib_decompress", 1, decompress_content, deterministic=True
+    )
+
+
+async def rebuild_fulltext_index() -> None:
+    connection = Tortoise.get_connection("default")
+    await connection.execute_script(
+        "INSERT INTO messages_fts(messages_fts) VALUES ('delete-all');"
+        "INSERT INTO messages_fts(rowid, content) "
+        "SELECT rowid, coalesce(zlib_decompress(content_zlib), content) FROM messages;"
+    )
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """
+    Translates a user search string into a safe FTS5 MATCH expression.
+
+    Quoted text is kept as a phrase and a trailing `*` turns a term or phrase
+    into a prefix query. Every other character is quoted, so FTS5 operators
+    in user input are matched literally. Terms are combined with AND.
+
+    Args:
+        query (str): Raw search string, e.g. `"buenos dias" mund*`
+
+    Returns:
+        Optional[str]: MATCH expression, or None if the query has no terms
+    """
+    terms = []
+    for phrase, phrase_prefix, word in _QUERY_TOKEN.findall(query):
+        if word:
+            prefix = word.endswith("*")
+            text = word.rstrip("*")
+        else:
+            prefix = bool(phrase_prefix)
+            text = phrase
+        if not text.strip():
+            continue
+        terms.append('"' + text.replace('"', '""') + '"' + ("*" if prefix else ""))
+
+    return " ".join(terms) or None
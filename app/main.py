@@ -1,23 +1,29 @@
+import asyncio
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import Response
 from contextlib import asynccontextmanager
 from fastapi.exceptions import RequestValidationError
 from tortoise.exceptions import IntegrityError
 
-from slowapi.errors import RateLimitExceeded
-from slowapi.middleware import SlowAPIMiddleware
-from app.core.limiter import limiter
+from app.core.limiter import RateLimitExceeded, limiter
 
 from app.core.config import settings
-from app.core.logging import get_logging
+from app.core.logging import get_logging, stop_logging
+from app.core.metrics import CONTENT_TYPE, MetricsMiddleware, metrics
+from app.core.profiling import ProfilingMiddleware
 from app.db.database import init_db
 from app.core.error_handlers import (
     validation_exception_handler,
     integrity_exception_handler,
     generic_exception_handler,
+    rate_limit_exceeded_handler,
 )
 from app.api.router import api_router
+from app.services.broadcaster import broadcaster
+from app.services.message import message_repository, retention_worker, write_behind_writer
+from app.utils.moderation import moderation_engine
 from .debugger import initialize_fastapi_server_debugger_if_needed
 
 log = get_logging(__name__)
@@ -27,8 +33,29 @@ log = get_logging(__name__)
 async def lifespan(app: FastAPI):
     log.info("Starting app...")
     await init_db(app)
+    loaded = await message_repository.warm_seen_ids()
+    log.info(f"Idempotency filter warmed with {loaded} message ids")
+    await broadcaster.start()
+    if settings.WRITE_BEHIND_ENABLED:
+        await write_behind_writer.start()
+    if settings.RETENTION_ENABLED:
+        await retention_worker.start()
+
+    moderation_watcher = None
+    if settings.MODERATION_TERMS_PATH:
+        await moderation_engine.load_file(settings.MODERATION_TERMS_PATH)
+        moderation_watcher = asyncio.create_task(moderation_engine.watch(
+            settings.MODERATION_TERMS_PATH, settings.MODERATION_RELOAD_INTERVAL_SECONDS
+        ))
     yield
     log.info("Shutting down...")
+    if moderation_watcher is not None:
+        moderation_watcher.cancel()
+    await retention_worker.stop()
+    await write_behind_writer.stop()
+    await broadcaster.close()
+    await limiter.close()
+    stop_logging()
 
 
 def create_application() -> FastAPI:
@@ -51,29 +78,36 @@ def create_application() -> FastAPI:
         allow_headers=["*"],
     )
 
+    if settings.PROFILING_ENABLED:
+        app.add_middleware(
+            ProfilingMiddleware,
+            api_key=settings.API_KEY,
+            output_dir=settings.PROFILING_OUTPUT_DIR,
+            sample_rate=settings.PROFILING_SAMPLE_RATE,
+            header=settings.PROFILING_HEADER,
+            mode=settings.PROFILING_MODE,
+            interval=settings.PROFILING_INTERVAL_MS / 1000,
+        )
+
+    if settings.METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware)
+
+        @app.get("/metrics", include_in_schema=False)
+        async def metrics_endpoint():
+            return Response(metrics.render(), media_type=CONTENT_TYPE)
+
     app.add_exception_handler(RequestValidationError,
                               validation_exception_handler)
     app.add_exception_handler(IntegrityError, integrity_exception_handler)
+    app.add_exception_handler(RateLimitExceeded, rate_limit_exceeded_handler)
     app.add_exception_handler(Exception, generic_exception_handler)
 
     return app
 
 
-def rate_limit_exceeded_handler(request, exc):
-    return JSONResponse(
-        status_code=429,
-        content={"detail": "Rate limit exceeded"},
-    )
-
-
 app = create_application()
 
 
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, rate_limit_exceeded_handler)
-app.add_middleware(SlowAPIMiddleware)
-
-
 @app.get("/")
 async def root():
     return {"message": "API de procesamiento de mensajes activa"}
@@ -0,0 +1,16 @@
+from tortoise import fields
+from tortoise.models import Model
+
+
+class ArchivedPartition(Model):
+    """Records that a session has messages in a daily archive partition."""
+
+    id = fields.IntField(pk=True)
+    session_id = fields.CharField(max_length=100)
+    partition = fields.CharField(max_length=10)
+    message_count = fields.IntField(default=0)
+
+    class Meta:
+        table = "archived_partitions"
+        app_label = "models"
+        unique_together = (("session_id", "partition"),)
@@ -1,18 +1,63 @@
 from tortoise import fields
+from tortoise.indexes import Index
 from tortoise.models import Model
 from app.schemas.enums import SenderEnum
 
 
+class UniqueIndex(Index):
+    INDEX_TYPE = "UNIQUE"
+    # The base template ignores `exists`, so `generate_schemas` could not
+    # run again on a database that already has the index
+    INDEX_CREATE_TEMPLATE = "CREATE{index_type}INDEX {exists}{index_name} ON {table_name} ({fields}){extra};"
+
+
 class Message(Model):
     message_id = fields.CharField(max_length=100, pk=True)
     session_id = fields.CharField(max_length=100)
     content = fields.TextField()
+    # zlib-compressed content of large messages, whose `content` is then
+    # empty; NULL for messages stored as plain text
+    content_zlib = fields.BinaryField(null=True)
     timestamp = fields.DatetimeField()
     sender = fields.CharEnumField(enum_type=SenderEnum)
     word_count = fields.IntField(null=True)
     character_count = fields.IntField(null=True)
     processed_at = fields.DatetimeField(null=True)
+    # Increasing number of the message within its session, allocated from
+    # `SessionStats.last_seq` in the transaction that stores the message and
+    # used to resume WebSocket streams; NULL for messages stored before it
+    # existed
+    seq = fields.BigIntField(null=True)
 
     class Meta:
         table = "messages"
         app_label = "models"
+        indexes = (
+            ("session_id", "timestamp", "message_id"),
+            ("session_id", "sender", "timestamp", "message_id"),
+            ("timestamp", "message_id"),
+            UniqueIndex(fields=("session_id", "seq"), name="uidx_messages_session_seq"),
+        )
+
+
+class SessionStats(Model):
+    """
+    Aggregates of the messages stored for a session, updated in the
+    transaction that stores them. Messages later moved to the archive stay
+    counted.
+    """
+
+    session_id = fields.CharField(max_length=100, pk=True)
+    message_count = fields.IntField(default=0)
+    user_count = fields.IntField(default=0)
+    system_count = fields.IntField(default=0)
+    word_count = fields.BigIntField(default=0)
+    character_count = fields.BigIntField(default=0)
+    first_activity = fields.DatetimeField()
+    last_activity = fields.DatetimeField()
+    # Highest seq allocated to a message of the session
+    last_seq = fields.BigIntField(default=0)
+
+    class Meta:
+        table = "session_stats"
+        app_label = "models"
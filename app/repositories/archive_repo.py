@@ -0,0 +1,35 @@
+from tortoise.expressions import F
+from tortoise.transactions import in_transaction
+from app.models.archive import ArchivedPartition
+from app.models.message import Message
+
+
+class ArchiveRepository:
+    async def partitions_for_session(self, session_id: str) -> list[str]:
+        return await ArchivedPartition.filter(session_id=session_id).order_by(
+            "partition"
+        ).values_list("partition", flat=True)
+
+    async def commit_archived(
+        self, message_ids: list[str], partition_counts: dict[tuple[str, str], int]
+    ) -> None:
+        """
+        Records the partitions archived messages were written to and deletes
+        those messages from the hot table, in one transaction.
+        """
+        try:
+            async with in_transaction(Message._meta.default_connection) as connection:
+                for (session_id, partition), count in partition_counts.items():
+                    entry, created = await ArchivedPartition.get_or_create(
+                        session_id=session_id,
+                        partition=partition,
+                        defaults={"message_count": count},
+                        using_db=connection,
+                    )
+                    if not created:
+                        await ArchivedPartition.filter(id=entry.id).using_db(connection).update(
+                            message_count=F("message_count") + count
+                        )
+                await Message.filter(message_id__in=message_ids).using_db(connection).delete()
+        except Exception as e:
+            raise ValueError(f"Error archiving messages: {str(e)}")
@@ -1,26 +1,451 @@
+from tortoise.backends.base.client import BaseDBAsyncClient
+from tortoise.exceptions import IntegrityError
+from tortoise.expressions import Q
+from tortoise.transactions import in_transaction
+from app.core.config import settings
+from app.core.metrics import db_query_duration, timed
+from app.db.database import reader_pool
+from app.db.fulltext import build_match_query, supports_fulltext
 from app.models.message import Message
+from app.repositories.session_stats_repo import SessionStatsRepository
+from app.utils.compression import compress_content, decompress_content
+from app.utils.pagination import Cursor
 from datetime import datetime
+from typing import AsyncIterator
+
+# Columns needed to build a message response, fetched as plain dicts on
+# read paths to skip model instantiation. `_inflate` restores the content of
+# compressed rows and drops `content_zlib` before rows leave the repository.
+MESSAGE_COLUMNS = (
+    "message_id",
+    "session_id",
+    "content",
+    "timestamp",
+    "sender",
+    "word_count",
+    "character_count",
+    "processed_at",
+    "seq",
+    "content_zlib",
+)
+
+# Size in bytes from which contents are stored compressed; None stores every
+# content as plain text.
+COMPRESSION_THRESHOLD = (
+    settings.CONTENT_COMPRESSION_THRESHOLD_BYTES if settings.CONTENT_COMPRESSION_ENABLED else None
+)
+
+
+class DuplicateMessageError(ValueError):
+    """Raised when a message_id is already stored."""
+
+
+def _reader():
+    """Connection for read queries: a pooled read-only one when available."""
+    return reader_pool.get() or Message._meta.db
+
+
+def _is_duplicate_id(error: IntegrityError) -> bool:
+    """Whether an insert failed on the message_id key rather than another constraint."""
+    return f"{Message._meta.db_table}.{Message._meta.pk_attr}" in str(error)
+
+
+def _inflate(rows: list[dict]) -> list[dict]:
+    """Decompresses the content of compressed rows, in place."""
+    for row in rows:
+        compressed = row.pop("content_zlib", None)
+        if compressed is not None:
+            row["content"] = decompress_content(compressed)
+    return rows
 
 
 class MessageRepository:
+    def __init__(
+        self,
+        compression_threshold: int | None = COMPRESSION_THRESHOLD,
+        compression_level: int = settings.CONTENT_COMPRESSION_LEVEL,
+        session_stats: SessionStatsRepository | None = None,
+    ):
+        self.compression_threshold = compression_threshold
+        self.compression_level = compression_level
+        self.session_stats = session_stats or SessionStatsRepository()
+
+    def _compress(self, data: dict) -> dict:
+        """
+        Returns the row to store for `data`: the same dict, or a copy with
+        the content moved to `content_zlib` when it is large enough.
+        """
+        content = data.get("content")
+        if self.compression_threshold is None or not content:
+            return data
+        compressed = compress_content(content, self.compression_threshold, self.compression_level)
+        if compressed is None:
+            return data
+        return {**data, "content": "", "content_zlib": compressed}
+
+    async def _allocate_seqs(self, items: list[dict], connection: BaseDBAsyncClient) -> None:
+        """
+        Records `items` in the session aggregates and sets the seq they get,
+        in order, on each of them. Seqs come from the database inside the
+        storing transaction, so they are unique across workers. Callers run
+        `session_stats.prepare` before opening that transaction.
+        """
+        next_seqs = await self.session_stats.record(items, connection)
+        for data in items:
+            data["seq"] = next_seqs[data["session_id"]]
+            next_seqs[data["session_id"]] += 1
+
+    @timed(db_query_duration, "save_message")
     async def save_message(self, data: dict) -> Message:
+        """Stores a message, setting its allocated seq on `data` as well."""
+        stored = self._compress(data)
         try:
-            message = await Message.create(**data)
+            await self.session_stats.prepare([data])
+            async with in_transaction(Message._meta.default_connection) as connection:
+                await self._allocate_seqs([data], connection)
+                message = await Message.create(**{**stored, "seq": data["seq"]}, using_db=connection)
+            if stored is not data:
+                message.content = data["content"]
             return message
+        except IntegrityError as e:
+            if _is_duplicate_id(e):
+                raise DuplicateMessageError(f"Error saving message: {str(e)}")
+            raise ValueError(f"Error saving message: {str(e)}")
         except Exception as e:
             raise ValueError(f"Error saving message: {str(e)}")
 
+    @timed(db_query_duration, "save_messages")
+    async def save_messages(self, items: list[dict]) -> list[Message]:
+        """Stores messages in one transaction, setting their allocated seqs on `items` as well."""
+        stored = [self._compress(data) for data in items]
+        try:
+            await self.session_stats.prepare(items)
+            async with in_transaction(Message._meta.default_connection) as connection:
+                await self._allocate_seqs(items, connection)
+                messages = [Message(**{**row, "seq": data["seq"]}) for row, data in zip(stored, items)]
+                await Message.bulk_create(messages, using_db=connection)
+            return messages
+        except IntegrityError as e:
+            if _is_duplicate_id(e):
+                raise DuplicateMessageError(f"Error saving messages: {str(e)}")
+            raise ValueError(f"Error saving messages: {str(e)}")
+        except Exception as e:
+            raise ValueError(f"Error saving messages: {str(e)}")
+
+    @timed(db_query_duration, "get_message")
+    async def get_message(self, message_id: str) -> dict | None:
+        rows = await Message.filter(message_id=message_id).using_db(_reader()).limit(1).values(
+            *MESSAGE_COLUMNS
+        )
+        return _inflate(rows)[0] if rows else None
+
+    async def iter_recent_message_ids(
+        self, limit: int, chunk_size: int = 10000
+    ) -> AsyncIterator[list[str]]:
+        """
+        Yields the ids of the `limit` most recently stored messages, newest
+        first, `chunk_size` ids at a time. On SQLite insertion order is
+        followed through the rowid, which needs no extra index.
+        """
+        connection = _reader()
+        remaining = limit
+        if supports_fulltext(connection):
+            last_rowid = None
+            while remaining > 0:
+                sql = "SELECT rowid, message_id FROM messages"
+                values: list = []
+                if last_rowid is not None:
+                    sql += " WHERE rowid < ?"
+                    values.append(last_rowid)
+                sql += " ORDER BY rowid DESC LIMIT ?"
+                values.append(min(chunk_size, remaining))
+                rows = await connection.execute_query_dict(sql, values)
+                if not rows:
+                    return
+                yield [row["message_id"] for row in rows]
+                remaining -= len(rows)
+                last_rowid = rows[-1]["rowid"]
+            return
+
+        before: Cursor | None = None
+        while remaining > 0:
+            query = Message.all().using_db(connection)
+            if before is not None:
+                timestamp, message_id = before
+                query = query.filter(timestamp__lte=timestamp).filter(
+                    Q(timestamp__lt=timestamp) | Q(message_id__lt=message_id)
+                )
+            rows = await query.order_by("-timestamp", "-message_id").limit(
+                min(chunk_size, remaining)
+            ).values_list("timestamp", "message_id")
+            if not rows:
+                return
+            yield [message_id for _, message_id in rows]
+            remaining -= len(rows)
+            before = rows[-1]
+
+    @timed(db_query_duration, "get_messages_older_than")
+    async def get_messages_older_than(self, cutoff: datetime, limit: int) -> list[dict]:
+        """Returns the oldest messages with a timestamp before `cutoff`."""
+        return _inflate(await Message.filter(timestamp__lt=cutoff).order_by(
+            "timestamp", "message_id"
+        ).limit(limit).values(*MESSAGE_COLUMNS))
+
+    @timed(db_query_duration, "get_last_seq")
+    async def get_last_seq(self, session_id: str) -> int:
+        """Returns the highest sequence number stored for a session, 0 if none."""
+        rows = await Message.filter(session_id=session_id, seq__isnull=False).order_by(
+            "-seq"
+        ).limit(1).values_list("seq", flat=True)
+        return rows[0] if rows else 0
+
+    @timed(db_query_duration, "get_messages_after_seq")
+    async def get_messages_after_seq(self, session_id: str, after_seq: int, limit: int) -> list[dict]:
+        """Returns up to `limit` messages of a session with seq above `after_seq`, in seq order."""
+        rows = await Message.filter(session_id=session_id, seq__gt=after_seq).using_db(
+            _reader()
+        ).order_by("seq").limit(limit).values(*MESSAGE_COLUMNS)
+        return _inflate(rows)
+
+    @timed(db_query_duration, "get_session_stats")
+    async def get_session_stats(self, session_id: str) -> dict | None:
+        return await self.session_stats.get(session_id, _reader())
+
+    @timed(db_query_duration, "get_existing_ids")
+    async def get_existing_ids(self, message_ids: list[str], writer: bool = False) -> set[str]:
+        """
+        Returns the given ids that are stored. Reads from the reader pool
+        unless `writer` asks for the writer connection, which also sees
+        rows committed an instant ago.
+        """
+        connection = Message._meta.db if writer else _reader()
+        existing = await Message.filter(message_id__in=message_ids).using_db(connection).values_list(
+            "message_id", flat=True
+        )
+        return set(existing)
+
+    @timed(db_query_duration, "get_messages_by_session")
     async def get_messages_by_session(
         self,
         session_id: str,
         limit: int = 10,
         offset: int = 0,
-        sender: str | None = None
-    ):
-        query = Message.filter(session_id=session_id)
+        sender: str | None = None,
+        after: Cursor | None = None,
+        before: Cursor | None = None,
+    ) -> list[dict]:
+        """
+        Returns a page of a session in chronological order, as row dicts.
+
+        `after`/`before` are (timestamp, message_id) keyset cursors, so the
+        composite indexes serve any page as cheaply as the first one.
+        """
+        query = Message.filter(session_id=session_id).using_db(_reader())
         if sender:
             query = query.filter(sender=sender)
-        return await query.offset(offset).limit(limit).all()
 
-    async def search_messages(self, query: str, limit: int = 10) -> list[Message]:
-        return await Message.filter(content__icontains=query).limit(limit).all()
+        if after is not None:
+            timestamp, message_id = after
+            query = query.filter(timestamp__gte=timestamp).filter(
+                Q(timestamp__gt=timestamp) | Q(message_id__gt=message_id)
+            )
+        if before is not None:
+            timestamp, message_id = before
+            query = query.filter(timestamp__lte=timestamp).filter(
+                Q(timestamp__lt=timestamp) | Q(message_id__lt=message_id)
+            )
+            query = query.order_by("-timestamp", "-message_id").offset(offset).limit(limit)
+            return _inflate(await query.values(*MESSAGE_COLUMNS))[::-1]
+
+        query = query.order_by("timestamp", "message_id").offset(offset).limit(limit)
+        return _inflate(await query.values(*MESSAGE_COLUMNS))
+
+    @timed(db_query_duration, "search_messages")
+    async def search_messages(
+        self,
+        query: str,
+        limit: int = 10,
+        session_id: str | None = None,
+        sender: str | None = None
+    ) -> list[dict]:
+        connection = _reader()
+        if not supports_fulltext(connection):
+            messages = Message.filter(content__icontains=query).using_db(connection)
+            if session_id:
+                messages = messages.filter(session_id=session_id)
+            if sender:
+                messages = messages.filter(sender=sender)
+            return _inflate(await messages.limit(limit).values(*MESSAGE_COLUMNS))
+
+        match = build_match_query(query)
+        if match is None:
+            return []
+
+        sql = (
+            "SELECT m.message_id FROM messages_fts "
+            "JOIN messages m ON m.rowid = messages_fts.rowid "
+            "WHERE messages_fts MATCH ?"
+        )
+        values: list = [match]
+        if session_id:
+            sql += " AND m.session_id = ?"
+            values.append(session_id)
+        if sender:
+            sql += " AND m.sender = ?"
+            values.append(sender)
+        sql += " ORDER BY messages_fts.rank LIMIT ?"
+        values.append(limit)
+
+        rows = await connection.execute_query_dict(sql, values)
+        ranked_ids = [row["message_id"] for row in rows]
+        if not ranked_ids:
+            return []
+
+        found = {
+            row["message_id"]: row
+            for row in await Message.filter(message_id__in=ranked_ids).using_db(connection).values(
+                *MESSAGE_COLUMNS
+            )
+        }
+        return _inflate([found[message_id] for message_id in ranked_ids if message_id in found])
+
+    async def iter_messages(
+        self,
+        session_id: str | None = None,
+        sender: str | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        query: str | None = None,
+        chunk_size: int = 1000,
+    ) -> AsyncIterator[list[dict]]:
+        """
+        Yields every matching message as row dicts, `chunk_size` rows at a time.
+
+        Each chunk is a keyset query that resumes after the last row of the
+        previous one, so memory stays flat and no chunk costs more than the
+        first. Messages come in (timestamp, message_id) order, or in index
+        order when filtering by a full-text `query`.
+        """
+        connection = _reader()
+        if query is not None and supports_fulltext(connection):
+            async for chunk in self._iter_search(
+                connection, query, session_id, sender, since, until, chunk_size
+            ):
+                yield chunk
+            return
+
+        filters = Message.all().using_db(connection)
+        if session_id:
+            filters = filters.filter(session_id=session_id)
+        if sender:
+            filters = filters.filter(sender=sender)
+        if since:
+            filters = filters.filter(timestamp__gte=since)
+        if until:
+            filters = filters.filter(timestamp__lt=until)
+        if query is not None:
+            filters = filters.filter(content__icontains=query)
+
+        after: Cursor | None = None
+        while True:
+            chunk_query = filters
+            if after is not None:
+                timestamp, message_id = after
+                chunk_query = chunk_query.filter(timestamp__gte=timestamp).filter(
+                    Q(timestamp__gt=timestamp) | Q(message_id__gt=message_id)
+                )
+            rows = await chunk_query.order_by("timestamp", "message_id").limit(chunk_size).values(
+                *MESSAGE_COLUMNS
+            )
+            if rows:
+                yield _inflate(rows)
+            if len(rows) < chunk_size:
+                return
+            after = (rows[-1]["timestamp"], rows[-1]["message_id"])
+
+    async def _iter_search(
+        self,
+        connection,
+        query: str,
+        session_id: str | None,
+        sender: str | None,
+        since: datetime | None,
+        until: datetime | None,
+        chunk_size: int,
+    ) -> AsyncIterator[list[dict]]:
+        match = build_match_query(query)
+        if match is None:
+            return
+
+        sql = (
+            "SELECT messages_fts.rowid AS fts_rowid, m.message_id FROM messages_fts "
+            "JOIN messages m ON m.rowid = messages_fts.rowid "
+            "WHERE messages_fts MATCH ? AND messages_fts.rowid > ?"
+        )
+        filter_values: list = []
+        if session_id:
+            sql += " AND m.session_id = ?"
+            filter_values.append(session_id)
+        if sender:
+            sql += " AND m.sender = ?"
+            filter_values.append(sender)
+        sql += " ORDER BY messages_fts.rowid LIMIT ?"
+
+        last_rowid = 0
+        while True:
+            matches = await connection.execute_query_dict(
+                sql, [match, last_rowid, *filter_values, chunk_size]
+            )
+            if not matches:
+                return
+            last_rowid = matches[-1]["fts_rowid"]
+
+            ids = [row["message_id"] for row in matches]
+            rows = Message.filter(message_id__in=ids).using_db(connection)
+            if since:
+                rows = rows.filter(timestamp__gte=since)
+            if until:
+                rows = rows.filter(timestamp__lt=until)
+            found = {row["message_id"]: row for row in await rows.values(*MESSAGE_COLUMNS)}
+            chunk = [found[message_id] for message_id in ids if message_id in found]
+            if chunk:
+                yield _inflate(chunk)
+            if len(matches) < chunk_size:
+                return
+
+    @timed(db_query_duration, "compress_stored_contents")
+    async def compress_stored_contents(
+        self, after: str | None, limit: int
+    ) -> tuple[str | None, int, int]:
+        """
+        Compresses the stored plain-text contents above the threshold among
+        the next `limit` messages in message_id order.
+
+        Args:
+            after (str | None): message_id to resume after, None to start
+            limit (int): Number of messages to scan
+
+        Returns:
+            tuple[str | None, int, int]: message_id to resume after (None
+            once every message was scanned), number of scanned messages and
+            number of compressed contents
+        """
+        query = Message.filter(content_zlib__isnull=True)
+        if after is not None:
+            query = query.filter(message_id__gt=after)
+        rows = await query.order_by("message_id").limit(limit).values("message_id", "content")
+
+        updates = []
+        for row in rows:
+            stored = self._compress(row)
+            if stored is not row:
+                updates.append(stored)
+        if updates:
+            async with in_transaction(Message._meta.default_connection) as connection:
+                for stored in updates:
+                    await Message.filter(message_id=stored["message_id"]).using_db(connection).update(
+                        content="", content_zlib=stored["content_zlib"]
+                    )
+
+        last = rows[-1]["message_id"] if len(rows) == limit else None
+        return last, len(rows), len(updates)
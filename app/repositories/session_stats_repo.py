@@ -0,0 +1,224 @@
+from datetime import datetime, timezone
+
+from tortoise.backends.base.client import BaseDBAsyncClient
+from tortoise.exceptions import IntegrityError
+from tortoise.expressions import Q
+from tortoise.functions import Count, Max, Min, Sum
+from tortoise.transactions import in_transaction
+from app.models.message import Message, SessionStats
+from app.schemas.enums import SenderEnum
+
+STATS_COLUMNS = (
+    "session_id",
+    "message_count",
+    "user_count",
+    "system_count",
+    "word_count",
+    "character_count",
+    "first_activity",
+    "last_activity",
+)
+
+
+# SQLite path: one statement per session, so concurrent writers creating the first row
+# of a session cannot conflict. Activity times are stored as UTC ISO
+# strings, which SQLite's min/max order chronologically. The statement also
+# allocates the seqs of the new messages: `last_seq` moves past them and is
+# returned, and it never falls behind the highest seq already stored, so
+# sessions older than the aggregates, or rebuilt, continue from there.
+UPSERT_STATS = f"""
+INSERT INTO {SessionStats._meta.db_table} ({", ".join(STATS_COLUMNS)}, last_seq)
+VALUES (
+    {", ".join("?" for _ in STATS_COLUMNS)},
+    coalesce(
+        (SELECT max(seq) FROM {Message._meta.db_table} WHERE {Message._meta.db_table}.session_id = ?), 0
+    ) + ?
+)
+ON CONFLICT(session_id) DO UPDATE SET
+    message_count = message_count + excluded.message_count,
+    user_count = user_count + excluded.user_count,
+    system_count = system_count + excluded.system_count,
+    word_count = word_count + excluded.word_count,
+    character_count = character_count + excluded.character_count,
+    first_activity = min(first_activity, excluded.first_activity),
+    last_activity = max(last_activity, excluded.last_activity),
+    last_seq = max(last_seq + excluded.message_count, excluded.last_seq)
+RETURNING last_seq
+"""
+
+
+def supports_upsert(connection: BaseDBAsyncClient) -> bool:
+    """Whether `UPSERT_STATS` runs on the connection; other databases use the ORM path."""
+    return connection.capabilities.dialect == "sqlite"
+
+
+def _utc(value: datetime) -> datetime:
+    # Naive timestamps are stored as UTC
+    return value.astimezone(timezone.utc) if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+
+def _db_datetime(value: datetime) -> str:
+    return _utc(value).isoformat(" ")
+
+
+def summarize(items: list[dict]) -> dict[str, dict]:
+    """Aggregates of a list of message rows, by session."""
+    summaries: dict[str, dict] = {}
+    for data in items:
+        timestamp = _utc(data["timestamp"])
+        summary = summaries.get(data["session_id"])
+        if summary is None:
+            summary = summaries[data["session_id"]] = {
+                "message_count": 0,
+                "user_count": 0,
+                "system_count": 0,
+                "word_count": 0,
+                "character_count": 0,
+                "first_activity": timestamp,
+                "last_activity": timestamp,
+            }
+        summary["message_count"] += 1
+        if data["sender"] == SenderEnum.user:
+            summary["user_count"] += 1
+        else:
+            summary["system_count"] += 1
+        summary["word_count"] += data.get("word_count") or 0
+        summary["character_count"] += data.get("character_count") or 0
+        summary["first_activity"] = min(summary["first_activity"], timestamp)
+        summary["last_activity"] = max(summary["last_activity"], timestamp)
+    return summaries
+
+
+class SessionStatsRepository:
+    async def prepare(self, items: list[dict]) -> None:
+        """
+        Creates the missing aggregate rows of the sessions of `items`, in
+        their own commits, on databases without `UPSERT_STATS`. `record` can
+        then lock an existing row, so writers racing on the first message of
+        a session do not abort each other's transactions. Runs before the
+        transaction that stores the messages.
+        """
+        connection = SessionStats._meta.db
+        if supports_upsert(connection):
+            return
+        for session_id, summary in summarize(items).items():
+            if await SessionStats.exists(session_id=session_id):
+                continue
+            last_seq = await Message.filter(session_id=session_id).annotate(
+                last_seq=Max("seq")
+            ).first().values_list("last_seq", flat=True)
+            try:
+                await SessionStats.create(
+                    session_id=session_id,
+                    first_activity=summary["first_activity"],
+                    last_activity=summary["last_activity"],
+                    last_seq=last_seq or 0,
+                )
+            except IntegrityError:
+                pass
+
+    async def record(self, items: list[dict], connection: BaseDBAsyncClient) -> dict[str, int]:
+        """
+        Adds messages about to be stored to the aggregates of their sessions
+        and allocates their seqs. Runs on the connection of the transaction
+        that stores them, so both are committed or rolled back with the
+        messages, and the row lock it takes orders concurrent writers.
+
+        Returns:
+            dict[str, int]: First allocated seq, by session
+        """
+        summaries = summarize(items)
+        if not supports_upsert(connection):
+            return await self._record_locked(summaries, connection)
+
+        first_seqs = {}
+        for session_id, summary in summaries.items():
+            count = summary["message_count"]
+            _, rows = await connection.execute_query(UPSERT_STATS, [
+                session_id,
+                count,
+                summary["user_count"],
+                summary["system_count"],
+                summary["word_count"],
+                summary["character_count"],
+                _db_datetime(summary["first_activity"]),
+                _db_datetime(summary["last_activity"]),
+                session_id,
+                count,
+            ])
+            first_seqs[session_id] = rows[0][0] - count + 1
+        return first_seqs
+
+    async def _record_locked(self, summaries: dict[str, dict], connection: BaseDBAsyncClient) -> dict[str, int]:
+        # Rows come from `prepare`; sessions are locked in a fixed order so
+        # two batches spanning the same sessions cannot deadlock.
+        first_seqs = {}
+        for session_id in sorted(summaries):
+            summary = summaries[session_id]
+            stats = await SessionStats.select_for_update().using_db(connection).get(session_id=session_id)
+            if stats.message_count:
+                stats.first_activity = min(_utc(stats.first_activity), summary["first_activity"])
+                stats.last_activity = max(_utc(stats.last_activity), summary["last_activity"])
+            else:
+                stats.first_activity = summary["first_activity"]
+                stats.last_activity = summary["last_activity"]
+            for key in ("message_count", "user_count", "system_count", "word_count", "character_count"):
+                setattr(stats, key, getattr(stats, key) + summary[key])
+            stats.last_seq += summary["message_count"]
+            await stats.save(using_db=connection)
+            first_seqs[session_id] = stats.last_seq - summary["message_count"] + 1
+        return first_seqs
+
+    async def get(self, session_id: str, connection: BaseDBAsyncClient | None = None) -> dict | None:
+        query = SessionStats.filter(session_id=session_id)
+        if connection is not None:
+            query = query.using_db(connection)
+        # Rows `prepare` created for messages that were not stored count nothing
+        rows = await query.filter(message_count__gt=0).limit(1).values(*STATS_COLUMNS)
+        return rows[0] if rows else None
+
+    async def rebuild(self, batch_size: int = 1000) -> int:
+        """
+        Recomputes every aggregate from the `messages` table, in one
+        transaction. Archived messages are no longer counted afterwards,
+        but the seqs allocated to them are not handed out again unless the
+        whole session was archived.
+
+        Returns:
+            int: Number of sessions
+        """
+        try:
+            async with in_transaction(Message._meta.default_connection) as connection:
+                rows = await Message.annotate(
+                    message_count=Count("message_id"),
+                    user_count=Count("message_id", _filter=Q(sender=SenderEnum.user)),
+                    system_count=Count("message_id", _filter=Q(sender=SenderEnum.system)),
+                    word_count=Sum("word_count"),
+                    character_count=Sum("character_count"),
+                    first_activity=Min("timestamp"),
+                    last_activity=Max("timestamp"),
+                    last_seq=Max("seq"),
+                ).group_by("session_id").using_db(connection).values(*STATS_COLUMNS, "last_seq")
+                allocated = dict(
+                    await SessionStats.all().using_db(connection).values_list("session_id", "last_seq")
+                )
+
+                await SessionStats.all().using_db(connection).delete()
+                for start in range(0, len(rows), batch_size):
+                    await SessionStats.bulk_create(
+                        [
+                            SessionStats(**{
+                                **row,
+                                "word_count": row["word_count"] or 0,
+                                "character_count": row["character_count"] or 0,
+                                "first_activity": _utc(row["first_activity"]),
+                                "last_activity": _utc(row["last_activity"]),
+                                "last_seq": max(row["last_seq"] or 0, allocated.get(row["session_id"], 0)),
+                            })
+                            for row in rows[start:start + batch_size]
+                        ],
+                        using_db=connection,
+                    )
+            return len(rows)
+        except Exception as e:
+            raise ValueError(f"Error rebuilding session stats: {str(e)}")
@@ -3,3 +3,10 @@ from enum import Enum
 class SenderEnum(str, Enum):
     user = "user"
     system = "system"
+
+
+class BatchItemStatus(str, Enum):
+    stored = "stored"
+    duplicate = "duplicate"
+    rejected = "rejected"
+    failed = "failed"
@@ -2,7 +2,8 @@ from pydantic import BaseModel, Field
 from typing import Literal, Optional
 from datetime import datetime
 
-from app.schemas.enums import SenderEnum
+from app.core.config import settings
+from app.schemas.enums import SenderEnum, BatchItemStatus
 
 
 class MessageIn(BaseModel):
@@ -26,6 +27,7 @@ class MessageOut(BaseModel):
     timestamp: datetime
     sender: Literal["user", "system"]
     metadata: Metadata
+    seq: Optional[int] = None
 
 
 class MessageResponse(BaseModel):
@@ -37,6 +39,46 @@ class MessageListResponse(BaseModel):
     data: list[MessageOut]
 
 
+class MessagePageResponse(BaseModel):
+    status: Literal["success"]
+    data: list[MessageOut]
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+
+class MessageBatchIn(BaseModel):
+    messages: list[MessageIn] = Field(
+        ..., min_length=1, max_length=settings.BATCH_MAX_SIZE
+    )
+
+
+class BatchItemResult(BaseModel):
+    message_id: str
+    status: BatchItemStatus
+    detail: Optional[str] = None
+    data: Optional[MessageOut] = None
+
+
+class MessageBatchResponse(BaseModel):
+    status: Literal["success"]
+    data: list[BatchItemResult]
+
+
+class SessionStatsOut(BaseModel):
+    session_id: str
+    message_count: int
+    user_count: int
+    system_count: int
+    word_count: int
+    character_count: int
+    first_activity: datetime
+    last_activity: datetime
+
+
+class SessionStatsResponse(BaseModel):
+    status: Literal["success"]
+    data: SessionStatsOut
+
 
 class ErrorResponse(BaseModel):
     status: Literal["error"]
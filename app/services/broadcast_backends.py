@@ -0,0 +1,114 @@
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Callable, Optional
+
+from app.core.config import settings
+from app.core.logging import get_logging
+
+log = get_logging(__name__)
+
+DeliveryHandler = Callable[[str, str], object]
+
+
+class BroadcastBackend(ABC):
+    """
+    Transport that carries encoded session events between workers.
+
+    Every published event is handed to the attached delivery handler of each
+    worker, which fans it out to the WebSocket connections it holds locally.
+    """
+
+    def __init__(self):
+        self._handler: Optional[DeliveryHandler] = None
+
+    def attach(self, handler: DeliveryHandler) -> None:
+        self._handler = handler
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    @abstractmethod
+    async def publish(self, session_id: str, message: str) -> None:
+        ...
+
+
+class MemoryBroadcastBackend(BroadcastBackend):
+    """Delivers events within the current process only."""
+
+    async def publish(self, session_id: str, message: str) -> None:
+        if self._handler is not None:
+            self._handler(session_id, message)
+
+
+class RedisBroadcastBackend(BroadcastBackend):
+    """
+    Shares events between workers and hosts through Redis pub/sub.
+
+    Each session maps to the channel `<prefix><session_id>` and every worker
+    pattern-subscribes to `<prefix>*`, delivering to its own sockets.
+    """
+
+    def __init__(self, url: str, channel_prefix: str = "chat:session:", client=None):
+        super().__init__()
+        self.url = url
+        self.channel_prefix = channel_prefix
+        self._client = client
+        self._pubsub = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._client is None:
+            import redis.asyncio as redis
+
+            self._client = redis.from_url(self.url)
+
+        self._pubsub = self._client.pubsub()
+        await self._pubsub.psubscribe(f"{self.channel_prefix}*")
+        self._task = asyncio.create_task(self._listen())
+        log.info(f"Redis broadcast backend subscribed to '{self.channel_prefix}*'")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._pubsub is not None:
+            await self._pubsub.punsubscribe()
+            await self._pubsub.aclose()
+            self._pubsub = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def publish(self, session_id: str, message: str) -> None:
+        await self._client.publish(f"{self.channel_prefix}{session_id}", message)
+
+    async def _listen(self) -> None:
+        prefix_length = len(self.channel_prefix)
+        while True:
+            try:
+                async for message in self._pubsub.listen():
+                    if message["type"] != "pmessage" or self._handler is None:
+                        continue
+                    channel = _to_str(message["channel"])
+                    self._handler(channel[prefix_length:], _to_str(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.error(f"Redis broadcast listener failed, retrying: {e}")
+                await asyncio.sleep(1)
+
+
+def _to_str(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def create_broadcast_backend() -> BroadcastBackend:
+    if settings.BROADCAST_BACKEND == "redis":
+        return RedisBroadcastBackend(
+            settings.BROADCAST_REDIS_URL, settings.BROADCAST_CHANNEL_PREFIX
+        )
+    return MemoryBroadcastBackend()
@@ -0,0 +1,337 @@
+import asyncio
+import json
+import re
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Literal, Optional, Set
+
+from fastapi import WebSocket
+
+from app.core.config import settings
+from app.core.logging import get_logging
+from app.core.metrics import metrics, ws_fanout_duration
+from app.services.broadcast_backends import (
+    BroadcastBackend,
+    MemoryBroadcastBackend,
+    create_broadcast_backend,
+)
+from app.services.connections import ConnectionRegistry, Subscriber
+
+log = get_logging(__name__)
+
+SlowConsumerPolicy = Literal["drop_oldest", "drop_newest", "disconnect"]
+
+SLOW_CONSUMER_CLOSE_CODE = 1013
+IDLE_CLOSE_CODE = 1001
+
+# ASGI does not expose protocol-level pings, so heartbeats are JSON frames
+PING_EVENT = '{"event":"ping"}'
+_PONG_EVENT = '{"event":"pong"}'
+
+# Connections visited by the heartbeat between yields to the event loop
+HEARTBEAT_YIELD_EVERY = 1000
+
+# Events published with a sequence number are encoded with it as first key,
+# so workers can read it without decoding the whole event.
+_SEQ_PREFIX = re.compile(r'^\{"seq":(\d+),')
+
+
+def event_seq(text: str) -> Optional[int]:
+    match = _SEQ_PREFIX.match(text)
+    return int(match.group(1)) if match else None
+
+
+def is_pong(text: str) -> bool:
+    return len(text) <= 32 and text.replace(" ", "") == _PONG_EVENT
+
+
+class ReplayBuffer:
+    """
+    Ring buffers with the most recent sequenced events of each session.
+
+    Each session keeps up to `size` events; only the `max_sessions` sessions
+    with the most recent events are kept, so memory stays bounded.
+    """
+
+    def __init__(self, size: int = 256, max_sessions: int = 10_000):
+        self.size = size
+        self.max_sessions = max_sessions
+        self._sessions: OrderedDict[str, deque] = OrderedDict()
+
+    def append(self, session_id: str, seq: int, text: str) -> None:
+        events = self._sessions.get(session_id)
+        if events is None:
+            events = self._sessions[session_id] = deque(maxlen=self.size)
+            if len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(session_id)
+        events.append((seq, text))
+
+    def since(self, session_id: str, last_seq: int) -> Optional[list[tuple[int, str]]]:
+        """
+        Returns the buffered events after `last_seq`, or None when the
+        buffer does not reach back to `last_seq` and events may be missing.
+        """
+        events = self._sessions.get(session_id)
+        if not events:
+            return None
+        if events[0][0] > last_seq:
+            return None
+        return [(seq, text) for seq, text in events if seq > last_seq]
+
+    def __len__(self) -> int:
+        return sum(len(events) for events in self._sessions.values())
+
+
+class Broadcaster:
+    """
+    Fans out session events to WebSocket subscribers.
+
+    Each event is JSON-encoded once and published through the backend, which
+    hands it to every worker. Each worker then pushes it without waiting into
+    the send queue of its local subscribers of the session; a per-connection
+    writer task delivers it. When a queue is full the slow consumer is handled
+    according to `policy`, so publishers never wait on slow clients.
+
+    Events with a sequence number are also kept in the replay buffer, from
+    which reconnecting clients get the events they missed.
+
+    With an `idle_timeout`, every `heartbeat_interval` seconds connections
+    the client has sent nothing on for that long get a ping event, and those
+    silent for `idle_timeout` seconds are closed. Clients must then answer
+    pings with `{"event": "pong"}`; listen-only clients that do not would be
+    closed, so it is off by default and half-open connections are left to
+    the server's protocol-level pings.
+    """
+
+    def __init__(
+        self,
+        queue_size: int = 256,
+        policy: SlowConsumerPolicy = "drop_oldest",
+        backend: Optional[BroadcastBackend] = None,
+        replay: Optional[ReplayBuffer] = None,
+        registry: Optional[ConnectionRegistry] = None,
+        heartbeat_interval: float = 20.0,
+        idle_timeout: float = 0.0,
+    ):
+        self.queue_size = queue_size
+        self.policy = policy
+        self.registry = registry if registry is not None else ConnectionRegistry()
+        self.backend = backend or MemoryBroadcastBackend()
+        self.backend.attach(self.deliver)
+        self.replay = replay if replay is not None else ReplayBuffer()
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = idle_timeout
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._closing: Set[asyncio.Task] = set()
+
+    @property
+    def connections(self) -> Dict[str, Set[Subscriber]]:
+        return self.registry.sessions
+
+    async def start(self) -> None:
+        await self.backend.start()
+        if self.idle_timeout > 0 and self.heartbeat_interval > 0:
+            self._heartbeat_task = asyncio.create_task(self._heartbeat())
+
+    def connect(self, session_id: str, websocket: WebSocket, hold: bool = False) -> Subscriber:
+        """
+        Subscribes a connection to a session.
+
+        With `hold`, events are kept aside and nothing is sent until
+        `resume` has replayed the missed events.
+
+        Raises:
+            ConnectionLimitExceeded: If the worker or the session already
+            has the maximum number of connections
+        """
+        subscriber = Subscriber(session_id, websocket, self.queue_size)
+        self.registry.add(subscriber)
+        if hold:
+            subscriber.held = []
+        else:
+            subscriber.task = asyncio.create_task(self._writer(subscriber))
+        return subscriber
+
+    async def resume(self, subscriber: Subscriber, missed: list[tuple[int, str]]) -> None:
+        """
+        Sends the missed events of a held subscriber, then the events held
+        meanwhile that were not part of them, and starts its writer.
+        """
+        last_sent = None
+        for seq, text in missed:
+            await subscriber.websocket.send_text(text)
+            last_sent = seq
+
+        held, subscriber.held = subscriber.held or [], None
+        for seq, text in held:
+            if last_sent is None or seq is None or seq > last_sent:
+                self._offer(subscriber, text)
+        subscriber.task = asyncio.create_task(self._writer(subscriber))
+
+    def disconnect(self, subscriber: Subscriber) -> None:
+        self._remove(subscriber)
+        if subscriber.task is not None and subscriber.task is not asyncio.current_task():
+            subscriber.task.cancel()
+
+    async def publish(self, session_id: str, event: dict, seq: Optional[int] = None) -> None:
+        """
+        Publishes an event to the subscribers of a session on every worker.
+
+        `seq` is the highest sequence number of the messages in the event.
+        """
+        if seq is not None:
+            event = {"seq": seq, **event}
+        await self.backend.publish(session_id, json.dumps(event, separators=(",", ":")))
+
+    def deliver(self, session_id: str, text: str) -> int:
+        """
+        Queues an already encoded event for the local subscribers of a session.
+
+        Returns:
+            int: Number of subscribers the event was queued for
+        """
+        seq = event_seq(text)
+        if seq is not None:
+            self.replay.append(session_id, seq, text)
+
+        subscribers = self.connections.get(session_id)
+        if not subscribers:
+            return 0
+
+        start = time.perf_counter()
+        delivered = 0
+        for subscriber in list(subscribers):
+            if subscriber.held is not None:
+                subscriber.held.append((seq, text))
+                delivered += 1
+            elif self._offer(subscriber, text):
+                delivered += 1
+        ws_fanout_duration.observe(time.perf_counter() - start)
+        return delivered
+
+    async def sweep(self, now: Optional[float] = None) -> int:
+        """
+        Pings the connections that have been silent for a heartbeat interval
+        and closes the ones silent for longer than the idle timeout.
+
+        Returns:
+            int: Number of connections closed
+        """
+        now = time.monotonic() if now is None else now
+        reaped = 0
+        for i, subscriber in enumerate(list(self.registry)):
+            if i and i % HEARTBEAT_YIELD_EVERY == 0:
+                await asyncio.sleep(0)
+            idle = now - subscriber.last_seen
+            if self.idle_timeout > 0 and idle >= self.idle_timeout:
+                log.info(f"Closing idle connection from session '{subscriber.session_id}'")
+                self._close(subscriber, IDLE_CLOSE_CODE)
+                reaped += 1
+            elif idle >= self.heartbeat_interval and subscriber.held is None:
+                self._offer(subscriber, PING_EVENT)
+        return reaped
+
+    async def close(self) -> None:
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            await asyncio.gather(self._heartbeat_task, return_exceptions=True)
+            self._heartbeat_task = None
+
+        tasks = [subscriber.task for subscriber in self.registry if subscriber.task is not None]
+        self.registry.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, *self._closing, return_exceptions=True)
+        await self.backend.stop()
+
+    def _offer(self, subscriber: Subscriber, text: str) -> bool:
+        try:
+            subscriber.queue.put_nowait(text)
+            return True
+        except asyncio.QueueFull:
+            pass
+
+        subscriber.dropped += 1
+        if self.policy == "drop_oldest":
+            subscriber.queue.get_nowait()
+            subscriber.queue.put_nowait(text)
+            return True
+        if self.policy == "disconnect":
+            log.warning(f"Disconnecting slow consumer from session '{subscriber.session_id}'")
+            self._close(subscriber, SLOW_CONSUMER_CLOSE_CODE)
+        return False
+
+    def _close(self, subscriber: Subscriber, code: int) -> None:
+        """Disconnects a subscriber, ends its handler and closes its socket."""
+        self.disconnect(subscriber)
+        if subscriber.stop is not None:
+            subscriber.stop()
+        task = asyncio.create_task(_close_socket(subscriber.websocket, code))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                reaped = await self.sweep()
+                if reaped:
+                    log.info(f"Closed {reaped} idle WebSocket connections")
+            except Exception as e:
+                log.error(f"WebSocket heartbeat failed: {e}")
+
+    async def _writer(self, subscriber: Subscriber) -> None:
+        try:
+            while True:
+                text = await subscriber.queue.get()
+                await subscriber.websocket.send_text(text)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.warning(f"Dropping connection from session '{subscriber.session_id}': {e}")
+            self._remove(subscriber)
+
+    def _remove(self, subscriber: Subscriber) -> None:
+        self.registry.remove(subscriber)
+
+
+async def _close_socket(websocket: WebSocket, code: int) -> None:
+    try:
+        await websocket.close(code=code)
+    except Exception:
+        # The handler may have closed it already
+        pass
+
+
+broadcaster = Broadcaster(
+    queue_size=settings.WS_SEND_QUEUE_SIZE,
+    policy=settings.WS_SLOW_CONSUMER_POLICY,
+    backend=create_broadcast_backend(),
+    replay=ReplayBuffer(settings.WS_REPLAY_BUFFER_SIZE, settings.WS_REPLAY_MAX_SESSIONS),
+    registry=ConnectionRegistry(settings.WS_MAX_CONNECTIONS, settings.WS_MAX_CONNECTIONS_PER_SESSION),
+    heartbeat_interval=settings.WS_HEARTBEAT_INTERVAL_SECONDS,
+    idle_timeout=settings.WS_IDLE_TIMEOUT_SECONDS,
+)
+
+metrics.gauge(
+    "ws_active_sessions", "Sessions with at least one WebSocket connection.",
+    lambda: len(broadcaster.registry.sessions),
+)
+metrics.gauge(
+    "ws_active_connections", "Open WebSocket connections.",
+    lambda: len(broadcaster.registry),
+)
+metrics.gauge(
+    "ws_max_session_connections", "Connections of the busiest session.",
+    lambda: max((len(subscribers) for subscribers in broadcaster.connections.values()), default=0),
+)
+metrics.gauge(
+    "ws_connection_bytes", "Estimated memory held per WebSocket connection.",
+    lambda: broadcaster.registry.memory_per_connection(),
+)
+metrics.gauge(
+    "ws_replay_buffered_events", "Events kept in the WebSocket replay buffer.",
+    lambda: len(broadcaster.replay),
+)
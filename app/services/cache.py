@@ -0,0 +1,122 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Iterable, Optional
+
+# How long an invalidation is remembered to reject late writes from reads
+# that started before it. Reads slower than this may cache a stale page
+# until its TTL expires.
+INVALIDATION_HORIZON_SECONDS = 60.0
+
+
+def session_cache_enabled(enabled: Optional[bool], broadcast_backend: str) -> bool:
+    """
+    Resolves `SESSION_CACHE_ENABLED`: when unset, the cache is only enabled
+    for a single process, since invalidations do not reach other workers.
+    """
+    if enabled is not None:
+        return enabled
+    return broadcast_backend == "memory"
+
+
+class SessionPageCache:
+    """
+    In-process LRU cache of session pages bounded by an estimated byte size.
+
+    Keys are tuples whose first element is the session_id. Entries expire
+    after `ttl` seconds and `invalidate_sessions` drops every page of a
+    session. Reads take a `snapshot()` before querying the database and pass
+    it to `set`, which refuses pages of sessions written in the meantime.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries: OrderedDict[Hashable, tuple[float, int, Any]] = OrderedDict()
+        self._keys_by_session: dict[str, set] = {}
+        self._invalidated: OrderedDict[str, tuple[int, float]] = OrderedDict()
+        self._version = 0
+
+    def get(self, key: tuple) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, _, value = entry
+        if expires_at <= time.monotonic():
+            self._discard(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def snapshot(self) -> int:
+        return self._version
+
+    def set(self, key: tuple, value: Any, size: int, snapshot: int) -> None:
+        session_id = key[0]
+        invalidated = self._invalidated.get(session_id)
+        if invalidated is not None and invalidated[0] > snapshot:
+            return
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._discard(key)
+        self._entries[key] = (time.monotonic() + self.ttl, size, value)
+        self._keys_by_session.setdefault(session_id, set()).add(key)
+        self.current_bytes += size
+
+        while self.current_bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._discard(oldest)
+            self.evictions += 1
+
+    def invalidate_sessions(self, session_ids: Iterable[str]) -> None:
+        now = time.monotonic()
+        for session_id in set(session_ids):
+            self._version += 1
+            self._invalidated[session_id] = (self._version, now)
+            self._invalidated.move_to_end(session_id)
+            for key in self._keys_by_session.pop(session_id, ()):
+                self._discard(key, forget_session=False)
+            self.invalidations += 1
+
+        horizon = now - INVALIDATION_HORIZON_SECONDS
+        while self._invalidated:
+            session_id, (_, invalidated_at) = next(iter(self._invalidated.items()))
+            if invalidated_at > horizon:
+                break
+            del self._invalidated[session_id]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def _discard(self, key: tuple, forget_session: bool = True) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.current_bytes -= entry[1]
+        if forget_session:
+            keys = self._keys_by_session.get(key[0])
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_session[key[0]]
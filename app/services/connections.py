@@ -0,0 +1,123 @@
+import asyncio
+import sys
+import time
+from itertools import islice
+from typing import Callable, Dict, Iterator, Optional, Set
+
+from fastapi import WebSocket
+
+# Connections sampled to estimate the memory of a connection record
+MEMORY_SAMPLE_SIZE = 100
+
+
+class Subscriber:
+    """A WebSocket connection with its own bounded send queue and writer task."""
+
+    __slots__ = ("session_id", "websocket", "queue", "task", "dropped", "held", "last_seen", "stop")
+
+    def __init__(self, session_id: str, websocket: WebSocket, queue_size: int):
+        self.session_id = session_id
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.task: Optional[asyncio.Task] = None
+        self.dropped = 0
+        # Events delivered while missed events are being replayed
+        self.held: Optional[list[tuple[Optional[int], str]]] = None
+        # Monotonic time of the last frame received from the client
+        self.last_seen = time.monotonic()
+        # Ends the handler serving the connection when it is reaped
+        self.stop: Optional[Callable[[], None]] = None
+
+
+class ConnectionLimitExceeded(Exception):
+    def __init__(self, scope: str, limit: int):
+        super().__init__(f"Too many connections ({scope} limit is {limit})")
+        self.scope = scope
+        self.limit = limit
+
+
+class ConnectionRegistry:
+    """
+    WebSocket connections of this worker, grouped by session.
+
+    Sessions map to sets of connection records, so adding and removing a
+    connection are O(1) and a session without connections takes no space.
+    `add` enforces a global cap and a per-session cap.
+    """
+
+    def __init__(self, max_connections: int = 100_000, max_per_session: int = 1000):
+        self.max_connections = max_connections
+        self.max_per_session = max_per_session
+        self.sessions: Dict[str, Set[Subscriber]] = {}
+        self._count = 0
+
+    def add(self, subscriber: Subscriber) -> None:
+        """
+        Raises:
+            ConnectionLimitExceeded: If a cap would be exceeded
+        """
+        if self._count >= self.max_connections:
+            raise ConnectionLimitExceeded("global", self.max_connections)
+        subscribers = self.sessions.get(subscriber.session_id)
+        if subscribers is None:
+            subscribers = self.sessions[subscriber.session_id] = set()
+        elif len(subscribers) >= self.max_per_session:
+            raise ConnectionLimitExceeded("session", self.max_per_session)
+        subscribers.add(subscriber)
+        self._count += 1
+
+    def remove(self, subscriber: Subscriber) -> bool:
+        subscribers = self.sessions.get(subscriber.session_id)
+        if subscribers is None or subscriber not in subscribers:
+            return False
+        subscribers.remove(subscriber)
+        self._count -= 1
+        if not subscribers:
+            del self.sessions[subscriber.session_id]
+        return True
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[Subscriber]:
+        for subscribers in self.sessions.values():
+            yield from subscribers
+
+    def clear(self) -> None:
+        self.sessions.clear()
+        self._count = 0
+
+    def memory_per_connection(self) -> int:
+        """
+        Estimated bytes held by the record of one connection: the record,
+        its send queue with the queued events, its writer task and its held
+        events, without the server's own socket buffers. Averaged
+        over a sample of the connections; 0 when there are none.
+        """
+        sample = list(islice(iter(self), MEMORY_SAMPLE_SIZE))
+        if not sample:
+            return 0
+        return sum(_record_size(subscriber) for subscriber in sample) // len(sample)
+
+    def stats(self) -> dict:
+        per_connection = self.memory_per_connection()
+        return {
+            "connections": self._count,
+            "sessions": len(self.sessions),
+            "max_connections": self.max_connections,
+            "max_per_session": self.max_per_session,
+            "bytes_per_connection": per_connection,
+            "bytes": per_connection * self._count,
+        }
+
+
+def _record_size(subscriber: Subscriber) -> int:
+    queue = subscriber.queue
+    size = sys.getsizeof(subscriber) + sys.getsizeof(queue) + sys.getsizeof(queue.__dict__)
+    pending = getattr(queue, "_queue", ())
+    size += sys.getsizeof(pending) + sum(sys.getsizeof(text) for text in pending)
+    if subscriber.task is not None:
+        size += sys.getsizeof(subscriber.task) + sys.getsizeof(subscriber.task.get_coro())
+    if subscriber.held is not None:
+        size += sys.getsizeof(subscriber.held) + sum(sys.getsizeof(text) for _, text in subscriber.held)
+    return size
@@ -1,8 +1,40 @@
+import csv
+import io
+import json
 from datetime import datetime, timezone
+from typing import AsyncIterator, Literal
+
+import orjson
+
+from app.core.config import settings
+from app.core.logging import get_logging
+from app.core.metrics import broadcast_publish_failures
+from app.schemas.enums import BatchItemStatus
 from app.schemas.message import MessageIn, MessageOut, Metadata
-from app.repositories.message_repo import MessageRepository
-from app.utils.message_utils import contains_prohibited_words, generate_metadata
-from app.api.ws.message_ws import active_connections
+from app.repositories.message_repo import DuplicateMessageError, MessageRepository
+from app.services.cache import SessionPageCache, session_cache_enabled
+from app.services.retention import MessageArchive, RetentionWorker
+from app.services.write_behind import WriteBehindWriter
+from app.utils.bloom import RotatingBloomFilter
+from app.utils.message_utils import analyze_content, analyze_contents
+from app.utils.pagination import Cursor, decode_cursor, encode_cursor
+from app.services.broadcaster import broadcaster
+
+log = get_logging(__name__)
+
+# Rough per-message footprint of a cached message dict besides its strings
+MESSAGE_OVERHEAD_BYTES = 600
+
+EXPORT_CSV_COLUMNS = (
+    "message_id",
+    "session_id",
+    "sender",
+    "timestamp",
+    "content",
+    "word_count",
+    "character_count",
+    "processed_at",
+)
 
 
 class MessageService:
@@ -13,19 +45,76 @@ class MessageService:
     - Interacts with the repository layer
     """
 
-    def __init__(self, repository: MessageRepository):
+    def __init__(
+        self,
+        repository: MessageRepository,
+        writer: WriteBehindWriter | None = None,
+        cache: SessionPageCache | None = None,
+        seen_ids: RotatingBloomFilter | None = None,
+        archive: MessageArchive | None = None,
+    ):
         self.repository = repository
+        self.writer = writer
+        self.cache = cache
+        self.seen_ids = seen_ids
+        self.archive = archive
+
+    async def warm_seen_ids(self) -> int:
+        """
+        Loads the ids of the most recent messages into the idempotency filter.
+
+        Returns:
+            int: Number of ids loaded
+        """
+        if self.seen_ids is None:
+            return 0
+        loaded = 0
+        async for message_ids in self.repository.iter_recent_message_ids(self.seen_ids.capacity):
+            for message_id in message_ids:
+                self.seen_ids.add(message_id)
+            loaded += len(message_ids)
+        return loaded
 
     async def process_and_store_message(self, payload: MessageIn) -> MessageOut:
-        if contains_prohibited_words(payload.content):
+        """
+        Moderates, enriches and stores a message.
+
+        Storing is idempotent on message_id: a retry of an already stored
+        message returns the stored message without doing any work again.
+        Ids seen recently are kept in a Bloom filter, so only its positives
+        cost a lookup; a duplicate it does not know about is caught by the
+        unique key on insert and resolved the same way.
+        """
+        if self.seen_ids is not None and payload.message_id in self.seen_ids:
+            stored = await self.repository.get_message(payload.message_id)
+            if stored is not None:
+                return MessageOut.model_validate(_to_output(stored))
+
+        analysis = analyze_content(payload.content)
+        if analysis["prohibited"]:
             raise ValueError("Message contains inappropriate language")
 
-        metadata = generate_metadata(payload.content)
+        metadata = analysis["metadata"]
 
         data: dict = payload.model_dump()
         data.update(metadata)
 
-        saved = await self.repository.save_message(data)
+        try:
+            if self.writer is not None and self.writer.running:
+                await self.writer.submit(
+                    data, wait_for_commit=settings.WRITE_BEHIND_ACK == "commit"
+                )
+                saved = payload
+            else:
+                saved = await self.repository.save_message(data)
+                self.invalidate_sessions([payload.session_id])
+        except DuplicateMessageError:
+            stored = await self.repository.get_message(payload.message_id)
+            if stored is None:
+                raise
+            self._remember([payload.message_id])
+            return MessageOut.model_validate(_to_output(stored))
+        self._remember([payload.message_id])
 
         result = MessageOut(
             message_id=saved.message_id,
@@ -33,62 +122,403 @@ class MessageService:
             content=saved.content,
             timestamp=saved.timestamp,
             sender=saved.sender,
-            metadata=Metadata(**metadata)
+            metadata=Metadata(**metadata),
+            # Set by the repository once stored; unknown when the write-behind
+            # writer acknowledges on enqueue
+            seq=data.get("seq"),
         )
 
-        if payload.session_id in active_connections:
-            for ws in active_connections[payload.session_id]:
-                await ws.send_json({
-                    "event": "new_message",
-                    "data": result.model_dump()
-                })
+        await self._notify(payload.session_id, {
+            "event": "new_message",
+            "data": result.model_dump(mode="json")
+        }, result.seq)
 
         return result
 
-    async def get_messages(
-        self, session_id: str, limit: int = 10, offset: int = 0, sender: str | None = None
-    ) -> list[MessageOut]:
-        messages = await self.repository.get_messages_by_session(
-            session_id, limit, offset, sender
+    async def process_and_store_batch(self, payloads: list[MessageIn]) -> list[dict]:
+        """
+        Validates, moderates and stores a list of messages in a single transaction.
+
+        Returns one result per input item, in the same order, flagging each
+        message as stored, duplicate or rejected. Subscribers of every affected
+        session receive a single notification with all of its new messages.
+        """
+        existing_ids = await self.repository.get_existing_ids(
+            [payload.message_id for payload in payloads]
         )
 
-        result = []
-        for msg in messages:
-            result.append(
-                MessageOut(
-                    message_id=msg.message_id,
-                    session_id=msg.session_id,
-                    content=msg.content,
-                    timestamp=msg.timestamp,
-                    sender=msg.sender,
-                    metadata={
-                        "word_count": msg.word_count,
-                        "character_count": msg.character_count,
-                        "processed_at": msg.processed_at,
-                    },
-                )
+        results: list[dict | None] = []
+        candidates: list[tuple[int, MessageIn]] = []
+        for payload in payloads:
+            if payload.message_id in existing_ids:
+                results.append(_duplicate(payload.message_id))
+                continue
+            existing_ids.add(payload.message_id)
+            candidates.append((len(results), payload))
+            results.append(None)
+
+        analyses = analyze_contents([payload.content for _, payload in candidates])
+
+        accepted: list[tuple[int, dict, MessageOut]] = []
+
+        for (position, payload), analysis in zip(candidates, analyses):
+            if analysis["prohibited"]:
+                results[position] = {
+                    "message_id": payload.message_id,
+                    "status": BatchItemStatus.rejected,
+                    "detail": "Message contains inappropriate language",
+                }
+                continue
+
+            metadata = analysis["metadata"]
+
+            data: dict = payload.model_dump()
+            data.update(metadata)
+
+            result = MessageOut(
+                message_id=payload.message_id,
+                session_id=payload.session_id,
+                content=payload.content,
+                timestamp=payload.timestamp,
+                sender=payload.sender,
+                metadata=Metadata(**metadata)
             )
-        return result
+            accepted.append((position, data, result))
+            results[position] = {
+                "message_id": payload.message_id,
+                "status": BatchItemStatus.stored,
+                "data": result,
+            }
 
-    async def search_messages(self, query: str, limit: int = 10) -> list[MessageOut]:
-        messages = await self.repository.search_messages(query, limit)
-        result = []
-        for msg in messages:
-            result.append(
-                MessageOut(
-                    message_id=msg.message_id,
-                    session_id=msg.session_id,
-                    content=msg.content,
-                    timestamp=msg.timestamp,
-                    sender=msg.sender,
-                    metadata={
-                        "word_count": msg.word_count,
-                        "character_count": msg.character_count,
-                        "processed_at": msg.processed_at,
-                    },
-                )
+        if accepted:
+            accepted = await self._store_accepted(accepted, results)
+
+        stored: dict[str, list[MessageOut]] = {}
+        for _, _, result in accepted:
+            stored.setdefault(result.session_id, []).append(result)
+        if stored:
+            self.invalidate_sessions(stored)
+            self._remember(data["message_id"] for _, data, _ in accepted)
+
+        for session_id, messages in stored.items():
+            await self._notify(session_id, {
+                "event": "new_messages",
+                "data": [message.model_dump(mode="json") for message in messages]
+            }, messages[-1].seq)
+
+        return results
+
+    async def _store_accepted(
+        self, accepted: list[tuple[int, dict, MessageOut]], results: list[dict | None]
+    ) -> list[tuple[int, dict, MessageOut]]:
+        """
+        Stores the accepted messages of a batch and returns the ones stored.
+
+        The duplicate check reads from the reader pool, so an id stored
+        concurrently can still fail the transaction. The ids are then looked
+        up on the writer, their items marked as duplicates in `results`, and
+        the rest stored in one more attempt.
+        """
+        try:
+            await self.repository.save_messages([data for _, data, _ in accepted])
+        except DuplicateMessageError:
+            taken = await self.repository.get_existing_ids(
+                [data["message_id"] for _, data, _ in accepted], writer=True
             )
-        return result
+            if not taken:
+                raise
+            for position, data, _ in accepted:
+                if data["message_id"] in taken:
+                    results[position] = _duplicate(data["message_id"])
+            self._remember(taken)
+            accepted = [entry for entry in accepted if entry[1]["message_id"] not in taken]
+            if accepted:
+                await self.repository.save_messages([data for _, data, _ in accepted])
+
+        for _, data, result in accepted:
+            result.seq = data.get("seq")
+        return accepted
+
+    def _remember(self, message_ids) -> None:
+        if self.seen_ids is not None:
+            for message_id in message_ids:
+                self.seen_ids.add(message_id)
+
+    async def _notify(self, session_id: str, event: dict, seq: int | None = None) -> None:
+        # Runs after the messages are committed: a failed publish must not
+        # report them as failed. Clients recover the event by resuming
+        # from their last seq.
+        try:
+            await broadcaster.publish(session_id, event, seq)
+        except Exception as e:
+            broadcast_publish_failures.inc()
+            log.error(f"Could not publish event of session '{session_id}': {e}")
+
+    async def missed_events(self, session_id: str, last_seq: int) -> list[tuple[int, str]]:
+        """
+        Rebuilds from the database the events of a session after `last_seq`,
+        for reconnecting clients whose gap is older than the replay buffer.
+
+        Returns one "new_message" event per message, at most
+        `WS_REPLAY_DB_LIMIT`. When more messages were missed, or `last_seq`
+        is ahead of the session, a final "resync" event asks the client to
+        reload the session over REST.
+        """
+        limit = settings.WS_REPLAY_DB_LIMIT
+        rows = await self.repository.get_messages_after_seq(session_id, last_seq, limit + 1)
+        events = [
+            (row["seq"], _encode_event({
+                "seq": row["seq"],
+                "event": "new_message",
+                "data": MessageOut.model_validate(_to_output(row)).model_dump(mode="json"),
+            }))
+            for row in rows[:limit]
+        ]
+        if len(rows) > limit or not rows:
+            current = await self.repository.get_last_seq(session_id)
+            if len(rows) > limit or last_seq > current:
+                sent = events[-1][0] if events else last_seq
+                events.append((sent, _encode_event({"event": "resync", "data": {"last_seq": current}})))
+        return events
+
+    def invalidate_sessions(self, session_ids) -> None:
+        if self.cache is not None:
+            self.cache.invalidate_sessions(session_ids)
+
+    async def get_session_stats(self, session_id: str) -> dict | None:
+        """Aggregates of a session, or None if it has no stored messages."""
+        return await self.repository.get_session_stats(session_id)
+
+    def cache_stats(self) -> dict:
+        if self.cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.cache.stats()}
+
+    async def get_messages(
+        self,
+        session_id: str,
+        limit: int = 10,
+        offset: int = 0,
+        sender: str | None = None,
+        after: str | None = None,
+        before: str | None = None,
+    ) -> dict:
+        """
+        Returns a page of a session with cursors to the neighbouring pages.
+
+        `next_cursor` is meant to be sent back as `after` and `prev_cursor`
+        as `before`; each is None when there is nothing more that way.
+        Pages are served from the session cache when it is enabled, and
+        include archived messages of sessions that have any.
+        """
+        if self.cache is None:
+            return await self._load_page(session_id, limit, offset, sender, after, before)
+
+        key = (session_id, sender, limit, offset, after, before)
+        page = self.cache.get(key)
+        if page is None:
+            snapshot = self.cache.snapshot()
+            page = await self._load_page(session_id, limit, offset, sender, after, before)
+            self.cache.set(key, page, _page_size(page), snapshot)
+        return page
+
+    async def _load_page(
+        self,
+        session_id: str,
+        limit: int,
+        offset: int,
+        sender: str | None,
+        after: str | None,
+        before: str | None,
+    ) -> dict:
+        if after and before:
+            raise ValueError("Use either 'after' or 'before', not both")
+        after_cursor = decode_cursor(after) if after else None
+        before_cursor = decode_cursor(before) if before else None
+
+        archived = await self.archive.read_session(session_id) if self.archive is not None else []
+        if archived:
+            messages = await self._merge_archived(
+                archived, session_id, limit + 1, offset, sender, after_cursor, before_cursor
+            )
+        else:
+            messages = await self.repository.get_messages_by_session(
+                session_id, limit + 1, offset, sender, after_cursor, before_cursor
+            )
+        has_more = len(messages) > limit
+        if has_more:
+            messages = messages[1:] if before_cursor else messages[:limit]
+
+        result = [_to_output(row) for row in messages]
+
+        first = encode_cursor(messages[0]["timestamp"], messages[0]["message_id"]) if messages else None
+        last = encode_cursor(messages[-1]["timestamp"], messages[-1]["message_id"]) if messages else None
+        if before_cursor:
+            next_cursor = last
+            prev_cursor = first if has_more else None
+        else:
+            next_cursor = last if has_more else None
+            prev_cursor = first if after_cursor or offset else None
+
+        return {"data": result, "next_cursor": next_cursor, "prev_cursor": prev_cursor}
+
+    async def _merge_archived(
+        self,
+        archived: list[dict],
+        session_id: str,
+        limit: int,
+        offset: int,
+        sender: str | None,
+        after: Cursor | None,
+        before: Cursor | None,
+    ) -> list[dict]:
+        """
+        Slow path of `_load_page` for sessions with archived messages: the
+        page is cut from the archived rows merged with enough hot rows to
+        cover it, with the same semantics as the repository query.
+        """
+        hot = await self.repository.get_messages_by_session(
+            session_id, limit + offset, 0, sender, after, before
+        )
+        if sender:
+            archived = [row for row in archived if row["sender"] == sender]
+        if after is not None:
+            archived = [row for row in archived if (row["timestamp"], row["message_id"]) > after]
+        if before is not None:
+            archived = [row for row in archived if (row["timestamp"], row["message_id"]) < before]
+
+        merged = sorted(archived + hot, key=lambda row: (row["timestamp"], row["message_id"]))
+        if before is not None:
+            end = max(0, len(merged) - offset)
+            return merged[max(0, end - limit):end]
+        return merged[offset:offset + limit]
+
+    async def search_messages(
+        self,
+        query: str,
+        limit: int = 10,
+        session_id: str | None = None,
+        sender: str | None = None,
+    ) -> list[dict]:
+        messages = await self.repository.search_messages(query, limit, session_id, sender)
+        return [_to_output(row) for row in messages]
+
+    async def export_messages(
+        self,
+        export_format: Literal["ndjson", "csv"] = "ndjson",
+        session_id: str | None = None,
+        sender: str | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        query: str | None = None,
+    ) -> AsyncIterator[bytes]:
+        """
+        Streams the matching messages encoded as NDJSON or CSV, one encoded
+        chunk of rows at a time as they are read from the repository.
+        """
+        chunks = self.repository.iter_messages(
+            session_id, sender, since, until, query, settings.EXPORT_CHUNK_SIZE
+        )
+        if export_format == "csv":
+            yield _encode_csv([EXPORT_CSV_COLUMNS])
+            async for chunk in chunks:
+                yield _encode_csv(_csv_row(row) for row in chunk)
+        else:
+            async for chunk in chunks:
+                yield b"".join(
+                    orjson.dumps(_to_output(row), option=orjson.OPT_UTC_Z) + b"\n"
+                    for row in chunk
+                )
+
+
+def _csv_row(row: dict) -> tuple:
+    return (
+        row["message_id"],
+        row["session_id"],
+        getattr(row["sender"], "value", row["sender"]),
+        row["timestamp"].isoformat(),
+        row["content"],
+        row["word_count"],
+        row["character_count"],
+        row["processed_at"].isoformat() if row["processed_at"] else "",
+    )
+
+
+def _encode_csv(rows) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode()
+
+
+def _to_output(row: dict) -> dict:
+    """
+    Maps a message row to the MessageOut shape as a plain dict, ready to be
+    encoded without another validation pass.
+    """
+    return {
+        "message_id": row["message_id"],
+        "session_id": row["session_id"],
+        "content": row["content"],
+        "timestamp": row["timestamp"],
+        "sender": row["sender"],
+        "metadata": {
+            "word_count": row["word_count"],
+            "character_count": row["character_count"],
+            "processed_at": row["processed_at"],
+        },
+        "seq": row.get("seq"),
+    }
+
+
+def _duplicate(message_id: str) -> dict:
+    return {
+        "message_id": message_id,
+        "status": BatchItemStatus.duplicate,
+        "detail": "The message_id already exists",
+    }
+
+
+def _encode_event(event: dict) -> str:
+    return json.dumps(event, separators=(",", ":"))
+
+
+def _page_size(page: dict) -> int:
+    return sum(
+        MESSAGE_OVERHEAD_BYTES + len(msg["content"]) + len(msg["message_id"]) + len(msg["session_id"])
+        for msg in page["data"]
+    )
 
 
-message_repository = MessageService(MessageRepository())
+repository = MessageRepository()
+session_cache = (
+    SessionPageCache(settings.SESSION_CACHE_MAX_BYTES, settings.SESSION_CACHE_TTL_SECONDS)
+    if session_cache_enabled(settings.SESSION_CACHE_ENABLED, settings.BROADCAST_BACKEND)
+    else None
+)
+write_behind_writer = WriteBehindWriter(
+    repository,
+    max_queue_size=settings.WRITE_BEHIND_QUEUE_SIZE,
+    batch_size=settings.WRITE_BEHIND_BATCH_SIZE,
+    flush_interval=settings.WRITE_BEHIND_FLUSH_INTERVAL_MS / 1000,
+    on_commit=lambda items: message_repository.invalidate_sessions(
+        item["session_id"] for item in items
+    ),
+)
+seen_message_ids = (
+    RotatingBloomFilter(settings.IDEMPOTENCY_FILTER_CAPACITY, settings.IDEMPOTENCY_FILTER_ERROR_RATE)
+    if settings.IDEMPOTENCY_FILTER_ENABLED
+    else None
+)
+message_archive = MessageArchive(settings.RETENTION_ARCHIVE_DIR)
+message_repository = MessageService(
+    repository, write_behind_writer, session_cache, seen_message_ids, message_archive
+)
+retention_worker = RetentionWorker(
+    repository,
+    message_archive,
+    retention_days=settings.RETENTION_DAYS,
+    batch_size=settings.RETENTION_BATCH_SIZE,
+    pause=settings.RETENTION_BATCH_PAUSE_MS / 1000,
+    interval=settings.RETENTION_INTERVAL_SECONDS,
+    on_archive=lambda session_ids: message_repository.invalidate_sessions(session_ids),
+)
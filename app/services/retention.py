@@ -0,0 +1,169 @@
+import asyncio
+import gzip
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+import orjson
+
+from app.core.logging import get_logging
+from app.repositories.archive_repo import ArchiveRepository
+from app.repositories.message_repo import MessageRepository
+
+log = get_logging(__name__)
+
+DATETIME_COLUMNS = ("timestamp", "processed_at")
+
+
+class MessageArchive:
+    """
+    Cold storage for messages moved out of the hot table.
+
+    Messages are stored as gzip-compressed JSONL in one file per UTC day of
+    their timestamp. Each archived batch is appended as a new gzip member, so
+    files are never rewritten. The `archived_partitions` table records which
+    days hold messages of each session, so reading a session only opens
+    its own partitions.
+    """
+
+    def __init__(self, directory: str, repository: Optional[ArchiveRepository] = None):
+        self.directory = directory
+        self.repository = repository or ArchiveRepository()
+
+    def partition_path(self, partition: str) -> str:
+        year, month, _ = partition.split("-")
+        return os.path.join(self.directory, year, month, f"{partition}.jsonl.gz")
+
+    def write(self, rows: list[dict]) -> dict[tuple[str, str], int]:
+        """
+        Appends rows to their daily partitions and syncs the files to disk.
+
+        Returns:
+            dict: Number of rows written per (session_id, partition)
+        """
+        by_partition: dict[str, list[bytes]] = defaultdict(list)
+        counts: dict[tuple[str, str], int] = defaultdict(int)
+        for row in rows:
+            partition = row["timestamp"].astimezone(timezone.utc).strftime("%Y-%m-%d")
+            by_partition[partition].append(orjson.dumps(row, option=orjson.OPT_UTC_Z) + b"\n")
+            counts[(row["session_id"], partition)] += 1
+
+        for partition, lines in by_partition.items():
+            path = self.partition_path(partition)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "ab") as output:
+                output.write(gzip.compress(b"".join(lines)))
+                output.flush()
+                os.fsync(output.fileno())
+        return counts
+
+    def read(self, session_id: str, partitions: list[str]) -> list[dict]:
+        """Reads the archived messages of a session in (timestamp, message_id) order."""
+        found: dict[str, dict] = {}
+        for partition in partitions:
+            try:
+                with gzip.open(self.partition_path(partition), "rb") as archive_file:
+                    for line in archive_file:
+                        row = orjson.loads(line)
+                        if row["session_id"] == session_id:
+                            found[row["message_id"]] = row
+            except FileNotFoundError:
+                log.warning(f"Archive partition {partition} is missing")
+
+        rows = list(found.values())
+        for row in rows:
+            for column in DATETIME_COLUMNS:
+                if row[column] is not None:
+                    row[column] = datetime.fromisoformat(row[column])
+        rows.sort(key=lambda row: (row["timestamp"], row["message_id"]))
+        return rows
+
+    async def read_session(self, session_id: str) -> list[dict]:
+        partitions = await self.repository.partitions_for_session(session_id)
+        if not partitions:
+            return []
+        return await asyncio.to_thread(self.read, session_id, partitions)
+
+
+class RetentionWorker:
+    """
+    Background task that moves messages older than `retention_days` from the
+    hot table into the archive.
+
+    Each batch is written and synced to the archive before it is deleted
+    from the database, so a crash can at worst archive a batch twice (reads
+    de-duplicate by message_id). Batches are small and separated by `pause`
+    seconds, so ingest never waits long on the writer.
+    """
+
+    def __init__(
+        self,
+        repository: MessageRepository,
+        archive: MessageArchive,
+        retention_days: int = 90,
+        batch_size: int = 500,
+        pause: float = 0.05,
+        interval: float = 3600.0,
+        on_archive: Optional[Callable[[set[str]], None]] = None,
+    ):
+        self.repository = repository
+        self.archive = archive
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.pause = pause
+        self.interval = interval
+        self.on_archive = on_archive
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            log.info(f"Retention worker started ({self.retention_days} days)")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        log.info("Retention worker stopped")
+
+    async def run_once(self, now: Optional[datetime] = None) -> int:
+        """
+        Archives every message older than the retention period.
+
+        Returns:
+            int: Number of archived messages
+        """
+        cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=self.retention_days)
+        archived = 0
+        while True:
+            rows = await self.repository.get_messages_older_than(cutoff, self.batch_size)
+            if not rows:
+                break
+
+            counts = await asyncio.to_thread(self.archive.write, rows)
+            await self.archive.repository.commit_archived(
+                [row["message_id"] for row in rows], counts
+            )
+            archived += len(rows)
+            if self.on_archive is not None:
+                self.on_archive({session_id for session_id, _ in counts})
+
+            if len(rows) < self.batch_size:
+                break
+            await asyncio.sleep(self.pause)
+        return archived
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                archived = await self.run_once()
+                if archived:
+                    log.info(f"Retention archived {archived} messages")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.error(f"Retention run failed: {e}")
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,145 @@
+import asyncio
+from typing import Callable, Optional
+
+from app.core.logging import get_logging
+from app.repositories.message_repo import MessageRepository
+
+log = get_logging(__name__)
+
+_STOP = object()
+
+
+class WriteBehindWriter:
+    """
+    Buffers validated messages in a bounded queue and persists them in group
+    commits from a single background task.
+
+    A group is flushed as soon as `batch_size` messages are pending or
+    `flush_interval` seconds have passed since its first message arrived.
+    Stopping the writer drains everything that was enqueued before the call.
+    `on_commit` is called with the committed messages before their
+    submitters are released.
+    """
+
+    def __init__(
+        self,
+        repository: MessageRepository,
+        max_queue_size: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 0.05,
+        on_commit: Optional[Callable[[list[dict]], None]] = None,
+    ):
+        self.repository = repository
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_commit = on_commit
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._task = asyncio.create_task(self._run())
+        log.info("Write-behind writer started")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+        log.info("Write-behind writer stopped")
+
+    async def submit(self, data: dict, wait_for_commit: bool = True) -> None:
+        """
+        Enqueues a message for the next group commit.
+
+        Waits for free space when the queue is full. With `wait_for_commit`
+        the call only returns once the message is committed and re-raises the
+        error that prevented storing it.
+        """
+        if self._task is None:
+            raise RuntimeError("Write-behind writer is not running")
+
+        future = asyncio.get_running_loop().create_future() if wait_for_commit else None
+        await self._queue.put((data, future))
+        if future is not None:
+            await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                if self._queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    item = self._queue.get_nowait()
+
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+
+    async def _flush(self, batch: list[tuple]) -> None:
+        items = [data for data, _ in batch]
+        try:
+            try:
+                await self.repository.save_messages(items)
+                self._committed(items)
+                for _, future in batch:
+                    _resolve(future)
+            except ValueError:
+                # A single bad row (e.g. a duplicated message_id) must not
+                # discard the rest of the group, so retry one by one.
+                for data, future in batch:
+                    try:
+                        await self.repository.save_message(data)
+                    except ValueError as e:
+                        log.error(f"Write-behind dropped message '{data.get('message_id')}': {e}")
+                        _resolve(future, e)
+                    else:
+                        self._committed([data])
+                        _resolve(future)
+        except Exception as e:
+            log.error(f"Write-behind flush failed: {e}")
+            for _, future in batch:
+                _resolve(future, e)
+
+    def _committed(self, items: list[dict]) -> None:
+        if self.on_commit is None:
+            return
+        try:
+            self.on_commit(items)
+        except Exception as e:
+            log.error(f"Write-behind on_commit callback failed: {e}")
+
+
+def _resolve(future: Optional[asyncio.Future], error: Optional[Exception] = None) -> None:
+    if future is None or future.done():
+        return
+    if error is None:
+        future.set_result(None)
+    else:
+        future.set_exception(error)
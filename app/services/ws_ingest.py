@@ -0,0 +1,180 @@
+import asyncio
+from typing import Awaitable, Callable, Optional
+
+import orjson
+from pydantic import ValidationError
+
+from app.core.logging import get_logging
+from app.schemas.enums import BatchItemStatus
+from app.schemas.message import MessageIn
+
+log = get_logging(__name__)
+
+_CLOSED = object()
+
+RATE_LIMITED = "rate_limited"
+
+
+class IngestChannel:
+    """
+    Stores the `MessageIn` frames a WebSocket client sends to its session.
+
+    A reader task moves frames into a bounded queue, so the client is slowed
+    down instead of buffered without limit while a batch is committed.
+    Frames are grouped into micro-batches of up to `batch_size`, flushed
+    `flush_interval` seconds after the first frame of the batch, and go
+    through `MessageService.process_and_store_batch`. Each batch is answered
+    with one ack frame holding the status of every message, in frame order.
+    `quota`, when given, is charged the number of messages of every batch
+    and returns the seconds to wait when they are over the limit; such
+    batches are rejected with a "rate_limited" detail.
+    """
+
+    def __init__(
+        self,
+        service,
+        session_id: str,
+        batch_size: int = 100,
+        flush_interval: float = 0.02,
+        quota: Optional[Callable[[int], Awaitable[float]]] = None,
+    ):
+        self.service = service
+        self.session_id = session_id
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.quota = quota
+        self._frames: Optional[asyncio.Queue] = None
+        self._reader: Optional[asyncio.Task] = None
+
+    async def run(
+        self,
+        receive: Callable[[], Awaitable[str]],
+        send: Callable[[str], Awaitable[None]],
+    ) -> None:
+        """Serves the connection until `receive` fails, e.g. on disconnect."""
+        frames: asyncio.Queue = asyncio.Queue(maxsize=self.batch_size * 2)
+        reader = asyncio.create_task(self._read(receive, frames))
+        self._frames, self._reader = frames, reader
+        try:
+            closed = False
+            while not closed:
+                batch, closed = await self._next_batch(frames)
+                if not batch:
+                    continue
+                acks = await self.process(batch)
+                if not closed:
+                    await send(orjson.dumps({"event": "ack", "data": acks}).decode())
+        finally:
+            reader.cancel()
+            await asyncio.gather(reader, return_exceptions=True)
+
+    def close(self) -> None:
+        """
+        Stops reading frames, e.g. when the connection is reaped; `run`
+        returns after the batch in progress. Frames not batched yet are dropped.
+        """
+        if self._reader is None or self._reader.done():
+            return
+        self._reader.cancel()
+        if self._frames.full():
+            self._frames.get_nowait()
+        self._frames.put_nowait(_CLOSED)
+
+    async def process(self, frames: list[str]) -> list[dict]:
+        """
+        Validates and stores a batch of raw frames.
+
+        Returns:
+            list[dict]: One ack per frame with message_id, status and detail.
+            Frames that cannot be parsed, that target another session, or
+            that are over the rate limit are rejected; "failed" marks
+            messages that could not be stored and may be sent again.
+        """
+        acks: list[Optional[dict]] = []
+        positions: list[int] = []
+        payloads: list[MessageIn] = []
+        for frame in frames:
+            try:
+                payload = MessageIn.model_validate_json(frame)
+            except ValidationError as e:
+                acks.append(_ack(_frame_message_id(frame), BatchItemStatus.rejected,
+                                 f"Invalid message: {e.errors()[0]['msg']}"))
+                continue
+            if payload.session_id != self.session_id:
+                acks.append(_ack(payload.message_id, BatchItemStatus.rejected,
+                                 "session_id does not match the connection"))
+                continue
+            positions.append(len(acks))
+            acks.append(None)
+            payloads.append(payload)
+
+        if payloads:
+            try:
+                if self.quota is not None and await self.quota(len(payloads)):
+                    results = [
+                        _ack(payload.message_id, BatchItemStatus.rejected, RATE_LIMITED)
+                        for payload in payloads
+                    ]
+                else:
+                    results = await self.service.process_and_store_batch(payloads)
+            except Exception as e:
+                log.error(f"WebSocket batch for session '{self.session_id}' failed: {e}")
+                results = [
+                    _ack(payload.message_id, BatchItemStatus.failed, "The message could not be stored")
+                    for payload in payloads
+                ]
+            for position, result in zip(positions, results):
+                acks[position] = _ack(result["message_id"], result["status"], result.get("detail"))
+        return acks
+
+    async def _read(self, receive: Callable[[], Awaitable[str]], frames: asyncio.Queue) -> None:
+        try:
+            while True:
+                await frames.put(await receive())
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            await frames.put(_CLOSED)
+
+    async def _next_batch(self, frames: asyncio.Queue) -> tuple[list[str], bool]:
+        """
+        Returns:
+            tuple[list[str], bool]: Next batch of frames, and whether the
+            connection closed after it
+        """
+        loop = asyncio.get_running_loop()
+        frame = await frames.get()
+        if frame is _CLOSED:
+            return [], True
+
+        batch = [frame]
+        deadline = loop.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            if frames.empty():
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    frame = await asyncio.wait_for(frames.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                frame = frames.get_nowait()
+
+            if frame is _CLOSED:
+                return batch, True
+            batch.append(frame)
+        return batch, False
+
+
+def _ack(message_id: Optional[str], status: BatchItemStatus, detail: Optional[str] = None) -> dict:
+    return {"message_id": message_id, "status": status, "detail": detail}
+
+
+def _frame_message_id(frame: str) -> Optional[str]:
+    """Best-effort message_id of an invalid frame, so the client can match the ack."""
+    try:
+        message_id = orjson.loads(frame).get("message_id")
+    except (orjson.JSONDecodeError, AttributeError):
+        return None
+    return message_id if isinstance(message_id, str) else None
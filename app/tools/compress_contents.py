@@ -0,0 +1,74 @@
+"""
+Compresses the contents of stored messages that exceed the compression
+threshold, for messages saved before compression was enabled.
+
+Starting the tool applies the schema migration (the `content_zlib` column)
+like the API does on start. Messages are scanned in message_id order in
+small transactions, so the tool can run next to the API and be re-run
+at any time. SQLite only releases the freed pages with `--vacuum`, which
+also rebuilds the full-text index because VACUUM may renumber rowids.
+
+Usage:
+    python -m app.tools.compress_contents [--threshold 4096] [--batch-size 1000] [--vacuum]
+"""
+import argparse
+import asyncio
+import time
+from typing import Optional
+
+from tortoise import Tortoise
+
+from app.core.config import settings
+from app.db.database import init_db
+from app.db.fulltext import rebuild_fulltext_index
+from app.repositories.message_repo import MessageRepository
+
+
+async def compress_all(repository: MessageRepository, batch_size: int = 1000) -> tuple[int, int]:
+    """
+    Returns:
+        tuple[int, int]: Number of scanned messages and of compressed contents
+    """
+    scanned = compressed = 0
+    after = None
+    while True:
+        after, batch_scanned, batch_compressed = await repository.compress_stored_contents(
+            after, batch_size
+        )
+        scanned += batch_scanned
+        compressed += batch_compressed
+        if after is None:
+            return scanned, compressed
+
+
+async def main(args: argparse.Namespace) -> None:
+    await init_db()
+    try:
+        repository = MessageRepository(args.threshold, args.level)
+        started = time.perf_counter()
+        scanned, compressed = await compress_all(repository, args.batch_size)
+        print(f"Scanned {scanned} messages, compressed {compressed} in {time.perf_counter() - started:.2f}s")
+
+        if args.vacuum:
+            connection = Tortoise.get_connection("default")
+            await connection.execute_script("VACUUM")
+            await rebuild_fulltext_index()
+            print("Database vacuumed and full-text index rebuilt")
+    finally:
+        await Tortoise.close_connections()
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Compress the contents of stored messages.")
+    parser.add_argument(
+        "--threshold", type=int, default=settings.CONTENT_COMPRESSION_THRESHOLD_BYTES,
+        help="minimum content size in bytes to compress",
+    )
+    parser.add_argument("--level", type=int, default=settings.CONTENT_COMPRESSION_LEVEL, help="zlib level")
+    parser.add_argument("--batch-size", type=int, default=1000, help="messages per transaction")
+    parser.add_argument("--vacuum", action="store_true", help="vacuum the SQLite database afterwards")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,227 @@
+"""
+Bulk import of chat messages from a JSONL file.
+
+Each line must be a MessageIn object. Lines are validated, moderated and
+enriched with the same logic as the API, and stored in large transactions.
+After every committed batch a checkpoint with the byte offset is written,
+so re-running the same command after a crash resumes where it stopped.
+Rejected lines are written to a JSONL report; the checkpoint also records
+its size, so the rejects of a batch that did not commit are dropped on
+resume instead of being reported twice. Before each commit the checkpoint
+marks where the batch ends, so when the process dies after a commit but
+before its checkpoint, the ids of that range found already stored on resume
+are counted as imported, not as duplicates.
+
+Usage:
+    python -m app.tools.import_jsonl messages.jsonl [--batch-size 5000]
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Optional
+
+import orjson
+from pydantic import ValidationError
+from tortoise import Tortoise
+
+from app.db.database import init_db
+from app.repositories.message_repo import MessageRepository
+from app.schemas.message import MessageIn
+from app.utils.message_utils import analyze_contents
+
+
+class ImportStats:
+    __slots__ = ("lines", "stored", "rejected", "resumed_at_line", "elapsed")
+
+    def __init__(self, lines: int = 0, stored: int = 0, rejected: int = 0):
+        self.lines = lines
+        self.stored = stored
+        self.rejected = rejected
+        self.resumed_at_line = lines
+        self.elapsed = 0.0
+
+    @property
+    def throughput(self) -> float:
+        processed = self.lines - self.resumed_at_line
+        return processed / self.elapsed if self.elapsed else 0.0
+
+
+def make_checkpoint(offset: int, stats: ImportStats, rejected_offset: int) -> dict:
+    return {
+        "offset": offset,
+        "lines": stats.lines,
+        "stored": stats.stored,
+        "rejected": stats.rejected,
+        "rejected_offset": rejected_offset,
+    }
+
+
+def read_checkpoint(path: str) -> dict:
+    try:
+        with open(path, encoding="utf-8") as checkpoint_file:
+            return json.load(checkpoint_file)
+    except FileNotFoundError:
+        return make_checkpoint(0, ImportStats(), 0)
+
+
+def write_checkpoint(path: str, checkpoint: dict) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as checkpoint_file:
+        json.dump(checkpoint, checkpoint_file)
+        checkpoint_file.flush()
+        os.fsync(checkpoint_file.fileno())
+    os.replace(tmp_path, path)
+
+
+async def import_file(
+    path: str,
+    repository: MessageRepository,
+    batch_size: int = 5000,
+    checkpoint_path: Optional[str] = None,
+    rejected_path: Optional[str] = None,
+) -> ImportStats:
+    checkpoint_path = checkpoint_path or f"{path}.checkpoint"
+    rejected_path = rejected_path or f"{path}.rejected.jsonl"
+
+    checkpoint = read_checkpoint(checkpoint_path)
+    offset = checkpoint["offset"]
+    # End of a batch that may have been committed without its checkpoint
+    pending_offset = checkpoint.get("pending_offset", 0)
+    stats = ImportStats(checkpoint["lines"], checkpoint["stored"], checkpoint["rejected"])
+    started = time.perf_counter()
+
+    with open(path, "rb") as source, open(rejected_path, "ab") as rejected:
+        source.seek(offset)
+        # Checkpoints written before the report size was recorded keep it whole
+        if "rejected_offset" in checkpoint:
+            rejected.truncate(checkpoint["rejected_offset"])
+        batch: list[tuple[int, bytes, MessageIn]] = []
+        batch_committed = offset < pending_offset
+
+        async def commit() -> None:
+            nonlocal checkpoint
+            write_checkpoint(checkpoint_path, {**checkpoint, "pending_offset": offset})
+            await _store_batch(batch, repository, rejected, stats, batch_committed)
+            rejected.flush()
+            checkpoint = make_checkpoint(offset, stats, rejected.tell())
+            write_checkpoint(checkpoint_path, checkpoint)
+
+        for raw in source:
+            offset += len(raw)
+            stats.lines += 1
+            line = raw.strip()
+            if not line:
+                continue
+            try:
+                batch.append((stats.lines, line, MessageIn.model_validate_json(line)))
+            except ValidationError as e:
+                _reject(rejected, stats, stats.lines, line, f"invalid: {e.errors()[0]['msg']}")
+
+            if len(batch) >= batch_size:
+                await commit()
+                batch = []
+                batch_committed = offset < pending_offset
+
+        if batch:
+            await commit()
+        rejected.flush()
+
+    stats.elapsed = time.perf_counter() - started
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return stats
+
+
+async def _store_batch(
+    batch: list[tuple[int, bytes, MessageIn]],
+    repository: MessageRepository,
+    rejected,
+    stats: ImportStats,
+    committed: bool = False,
+) -> None:
+    """
+    Stores a batch. With `committed`, the batch overlaps one that may have
+    been committed before a crash, so ids found already stored are counted
+    as imported.
+    """
+    existing_ids = await repository.get_existing_ids(
+        [payload.message_id for _, _, payload in batch], writer=True
+    )
+
+    candidates = []
+    for line_number, line, payload in batch:
+        if payload.message_id in existing_ids:
+            if committed:
+                stats.stored += 1
+            else:
+                _reject(rejected, stats, line_number, line, "duplicate message_id")
+            continue
+        existing_ids.add(payload.message_id)
+        candidates.append((line_number, line, payload))
+
+    analyses = analyze_contents([payload.content for _, _, payload in candidates])
+
+    accepted = []
+    for (line_number, line, payload), analysis in zip(candidates, analyses):
+        if analysis["prohibited"]:
+            _reject(rejected, stats, line_number, line, "inappropriate language")
+            continue
+        data = payload.model_dump()
+        data.update(analysis["metadata"])
+        accepted.append(data)
+
+    if accepted:
+        await repository.save_messages(accepted)
+    stats.stored += len(accepted)
+
+
+def _reject(rejected, stats: ImportStats, line_number: int, line: bytes, reason: str) -> None:
+    stats.rejected += 1
+    rejected.write(orjson.dumps({
+        "line": line_number,
+        "reason": reason,
+        "raw": line.decode("utf-8", errors="replace"),
+    }) + b"\n")
+
+
+async def main(args: argparse.Namespace) -> None:
+    checkpoint_path = args.checkpoint or f"{args.path}.checkpoint"
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    await init_db()
+    try:
+        stats = await import_file(
+            args.path,
+            MessageRepository(),
+            batch_size=args.batch_size,
+            checkpoint_path=checkpoint_path,
+            rejected_path=args.rejected,
+        )
+    finally:
+        await Tortoise.close_connections()
+
+    if stats.resumed_at_line:
+        print(f"Resumed at line {stats.resumed_at_line}")
+    print(
+        f"Processed {stats.lines} lines: {stats.stored} stored, {stats.rejected} rejected "
+        f"in {stats.elapsed:.2f}s ({stats.throughput:,.0f} lines/s)"
+    )
+    if stats.rejected:
+        print(f"Rejected lines written to {args.rejected or f'{args.path}.rejected.jsonl'}")
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Bulk import chat messages from a JSONL file.")
+    parser.add_argument("path", help="JSONL file with one MessageIn per line")
+    parser.add_argument("--batch-size", type=int, default=5000, help="messages per transaction")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: <path>.checkpoint)")
+    parser.add_argument("--rejected", help="rejected lines report (default: <path>.rejected.jsonl)")
+    parser.add_argument("--restart", action="store_true", help="ignore any existing checkpoint")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
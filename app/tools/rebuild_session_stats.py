@@ -0,0 +1,40 @@
+"""
+Recomputes the per-session aggregates from the `messages` table, e.g. for
+messages stored before the aggregates existed or after editing rows by hand.
+
+The rebuild runs in one transaction, so writes made meanwhile wait for it
+and are counted exactly once. Messages already moved to the archive are
+not counted afterwards.
+
+Usage:
+    python -m app.tools.rebuild_session_stats [--batch-size 1000]
+"""
+import argparse
+import asyncio
+import time
+from typing import Optional
+
+from tortoise import Tortoise
+
+from app.db.database import init_db
+from app.repositories.session_stats_repo import SessionStatsRepository
+
+
+async def main(args: argparse.Namespace) -> None:
+    await init_db()
+    try:
+        started = time.perf_counter()
+        sessions = await SessionStatsRepository().rebuild(args.batch_size)
+        print(f"Rebuilt the stats of {sessions} sessions in {time.perf_counter() - started:.2f}s")
+    finally:
+        await Tortoise.close_connections()
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Rebuild the per-session message aggregates.")
+    parser.add_argument("--batch-size", type=int, default=1000, help="sessions per insert")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,78 @@
+import hashlib
+import math
+
+
+class BloomFilter:
+    """
+    Compact probabilistic set of strings.
+
+    Membership tests never miss an added item and report an item that was
+    never added with probability close to `error_rate` once `capacity` items
+    are in the filter. Bit positions use double hashing over one blake2b
+    digest, so each operation hashes the item once.
+    """
+
+    __slots__ = ("capacity", "size", "hashes", "count", "_bits")
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        size = self.size
+        return ((first + i * second) % size for i in range(self.hashes))
+
+    def add(self, item: str) -> None:
+        bits = self._bits
+        for position in self._positions(item):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._bits)
+
+
+class RotatingBloomFilter:
+    """
+    Bloom filter over the most recently added items.
+
+    Items go into the current generation; once it holds `capacity` items it
+    becomes the previous generation and a fresh one starts, so memory stays
+    bounded and between `capacity` and `2 * capacity` recent items are
+    remembered.
+    """
+
+    __slots__ = ("capacity", "error_rate", "_current", "_previous")
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._current = BloomFilter(capacity, error_rate)
+        self._previous: BloomFilter | None = None
+
+    def add(self, item: str) -> None:
+        if self._current.count >= self.capacity:
+            self._previous = self._current
+            self._current = BloomFilter(self.capacity, self.error_rate)
+        self._current.add(item)
+
+    def __contains__(self, item: str) -> bool:
+        return item in self._current or (self._previous is not None and item in self._previous)
+
+    def stats(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "items": self._current.count + (self._previous.count if self._previous else 0),
+            "bytes": self._current.nbytes + (self._previous.nbytes if self._previous else 0),
+        }
@@ -0,0 +1,29 @@
+import zlib
+from typing import Optional
+
+
+def compress_content(content: str, threshold: int, level: int = 6) -> Optional[bytes]:
+    """
+    Compresses a message content when it is worth it.
+
+    Args:
+        content (str): Original text
+        threshold (int): Minimum UTF-8 size in bytes to try compressing
+        level (int): zlib compression level
+
+    Returns:
+        Optional[bytes]: zlib stream, or None when the content is below the
+        threshold or would not get smaller
+    """
+    raw = content.encode("utf-8")
+    if len(raw) < threshold:
+        return None
+    compressed = zlib.compress(raw, level)
+    return compressed if len(compressed) < len(raw) else None
+
+
+def decompress_content(data: Optional[bytes]) -> Optional[str]:
+    """Inverse of `compress_content`; None stays None."""
+    if data is None:
+        return None
+    return zlib.decompress(data).decode("utf-8")
@@ -1,9 +1,11 @@
 from datetime import datetime, timezone
-from app.core.constants import FORBIDDEN_WORDS
+from app.core.metrics import analysis_duration, timed
+from app.utils.moderation import join_tokens, moderation_engine, tokenize_words
 
 def contains_prohibited_words(content: str) -> bool:
     """
-    Checks if a message contains any forbidden words.
+    Checks if a message contains any forbidden word or phrase, ignoring case,
+    accents and surrounding punctuation.
 
     Args:
         content (str): The message to validate
@@ -11,8 +13,7 @@ def contains_prohibited_words(content: str) -> bool:
     Returns:
         bool: True if a forbidden word is found, otherwise False
     """
-    words = content.lower().split()
-    return any(word in FORBIDDEN_WORDS for word in words)
+    return moderation_engine.contains_prohibited(content)
 
 def generate_metadata(content: str) -> dict:
     """
@@ -29,3 +30,55 @@ def generate_metadata(content: str) -> dict:
         "character_count": len(content),
         "processed_at": datetime.now(timezone.utc),
     }
+
+
+@timed(analysis_duration, "analyze_content")
+def analyze_content(content: str) -> dict:
+    """
+    Moderates a message and generates its metadata from a single
+    tokenization pass.
+
+    Args:
+        content (str): The original message
+
+    Returns:
+        dict: `prohibited` flag and `metadata` (word count, character count
+        and processing timestamp)
+    """
+    return _analyze([content])[0]
+
+
+@timed(analysis_duration, "analyze_contents")
+def analyze_contents(contents: list[str]) -> list[dict]:
+    """
+    Batch version of `analyze_content`.
+
+    All contents are moderated with a single automaton scan and share one
+    processing timestamp.
+
+    Args:
+        contents (list[str]): The original messages
+
+    Returns:
+        list[dict]: One analysis per content, in the same order
+    """
+    return _analyze(contents)
+
+
+def _analyze(contents: list[str]) -> list[dict]:
+    # Each content is split once: the same pass gives the tokens the
+    # automaton scans and the whitespace word count.
+    processed_at = datetime.now(timezone.utc)
+    splits = [tokenize_words(content) for content in contents]
+    flags = moderation_engine.flag_normalized([join_tokens(tokens) for tokens, _ in splits])
+    return [
+        {
+            "prohibited": prohibited,
+            "metadata": {
+                "word_count": word_count,
+                "character_count": len(content),
+                "processed_at": processed_at,
+            },
+        }
+        for content, (_, word_count), prohibited in zip(contents, splits, flags)
+    ]
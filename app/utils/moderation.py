@@ -0,0 +1,243 @@
+import asyncio
+import os
+import re
+import unicodedata
+from bisect import bisect_right
+from collections import deque
+from itertools import accumulate
+from typing import Iterable, Iterator, Optional
+
+from app.core.constants import FORBIDDEN_WORDS
+from app.core.logging import get_logging
+
+log = get_logging(__name__)
+
+_COMBINING_MARKS = re.compile("[\u0300-\u036f\u1ab0-\u1aff\u1dc0-\u1dff\u20d0-\u20ff\ufe20-\ufe2f]")
+_SEPARATORS = re.compile(r"[\W_]+")
+
+# Transitions are kept in one flat dict keyed by (state << 21) | codepoint,
+# which is far more compact than one dict per trie node for large lists.
+_SHIFT = 21
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Splits text into the words moderation matches on.
+
+    Strips accents, case-folds and splits on every run of punctuation or
+    whitespace.
+
+    Args:
+        text (str): Raw text
+
+    Returns:
+        list[str]: Words, e.g. "¡Eres IDIÓTA!" -> ["eres", "idiota"]
+    """
+    text = _COMBINING_MARKS.sub("", unicodedata.normalize("NFKD", text)).casefold()
+    return [token for token in _SEPARATORS.split(text) if token]
+
+
+def tokenize_words(text: str) -> tuple[list[str], int]:
+    """
+    Tokenizes text for moderation and counts its words in the same pass.
+
+    Words are the whitespace-separated chunks of the original text, which
+    is how `word_count` has always been defined; the whitespace split also
+    feeds `tokenize`, which only splits them further.
+
+    Args:
+        text (str): Raw text
+
+    Returns:
+        tuple[list[str], int]: Moderation tokens and word count, e.g.
+        "it's well-known" -> (["it", "s", "well", "known"], 2)
+    """
+    words = text.split()
+    return tokenize(" ".join(words)), len(words)
+
+
+def join_tokens(tokens: list[str]) -> str:
+    """
+    Builds the normalized text of `tokenize`d words, padded with one space on
+    each side so that terms only match on word boundaries.
+    """
+    return f" {' '.join(tokens)} "
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalizes text for moderation matching.
+
+    Args:
+        text (str): Raw text
+
+    Returns:
+        str: Normalized text, e.g. "¡Eres IDIÓTA!" -> " eres idiota "
+    """
+    return join_tokens(tokenize(text))
+
+
+class TermMatcher:
+    """
+    Aho-Corasick automaton over normalized terms.
+
+    Scans a normalized text in a single pass whose cost does not depend on
+    the number of terms. Terms may be single words or multi-word phrases.
+    """
+
+    def __init__(self, terms: Iterable[str]):
+        self.terms: list[str] = []
+        self._goto: dict[int, int] = {}
+        self._fail: list[int] = [0]
+        # Index of the term ending at each state, or -1 when none.
+        self._output: list[int] = [-1]
+        # Nearest state in the fail chain (itself included) where a term
+        # ends, or 0 when none: follows every match in O(matches).
+        self._report: list[int] = [0]
+
+        seen = set()
+        for term in terms:
+            pattern = normalize_text(term)
+            if not pattern.strip() or pattern in seen:
+                continue
+            seen.add(pattern)
+            self._add(pattern, len(self.terms))
+            self.terms.append(term.strip())
+
+        self._build_links()
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def iter_matches(self, normalized: str) -> Iterator[tuple[int, str]]:
+        """
+        Yields (end_index, term) for every term found in a normalized text.
+        """
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        report = self._report
+        state = 0
+        for index, char in enumerate(normalized):
+            code = ord(char)
+            while True:
+                next_state = goto.get((state << _SHIFT) | code)
+                if next_state is not None:
+                    state = next_state
+                    break
+                if state == 0:
+                    break
+                state = fail[state]
+            match = report[state]
+            while match:
+                yield index, self.terms[output[match]]
+                match = report[fail[match]]
+
+    def search(self, normalized: str) -> Optional[str]:
+        for _, term in self.iter_matches(normalized):
+            return term
+        return None
+
+    def _add(self, pattern: str, term_index: int) -> None:
+        state = 0
+        for char in pattern:
+            key = (state << _SHIFT) | ord(char)
+            next_state = self._goto.get(key)
+            if next_state is None:
+                next_state = len(self._fail)
+                self._goto[key] = next_state
+                self._fail.append(0)
+                self._output.append(-1)
+                self._report.append(0)
+            state = next_state
+        self._output[state] = term_index
+
+    def _build_links(self) -> None:
+        children: dict[int, list[tuple[int, int]]] = {}
+        mask = (1 << _SHIFT) - 1
+        for key, child in self._goto.items():
+            children.setdefault(key >> _SHIFT, []).append((key & mask, child))
+
+        queue = deque(child for _, child in children.get(0, ()))
+        for state in queue:
+            self._report[state] = state if self._output[state] >= 0 else 0
+        while queue:
+            state = queue.popleft()
+            for code, child in children.get(state, ()):
+                queue.append(child)
+                fallback = self._fail[state]
+                while True:
+                    target = self._goto.get((fallback << _SHIFT) | code)
+                    if target is not None and target != child:
+                        self._fail[child] = target
+                        break
+                    if fallback == 0:
+                        break
+                    fallback = self._fail[fallback]
+                if self._output[child] >= 0:
+                    self._report[child] = child
+                else:
+                    self._report[child] = self._report[self._fail[child]]
+
+
+class ModerationEngine:
+    """
+    Holds the active TermMatcher and swaps it atomically on reload, so
+    in-flight checks keep using the previous list until they finish.
+    """
+
+    def __init__(self, terms: Iterable[str]):
+        self.matcher = TermMatcher(terms)
+        self.source: Optional[str] = None
+        self._mtime: Optional[float] = None
+
+    def contains_prohibited(self, content: str) -> bool:
+        return self.matcher.search(normalize_text(content)) is not None
+
+    def flag_normalized(self, normalized: list[str]) -> list[bool]:
+        """
+        Flags a list of already normalized texts with one automaton pass over
+        their concatenation. Each text is padded with spaces by
+        `normalize_text`, so no term can match across two texts.
+        """
+        flags = [False] * len(normalized)
+        starts = list(accumulate(map(len, normalized), initial=0))
+        for end, _ in self.matcher.iter_matches("".join(normalized)):
+            flags[bisect_right(starts, end) - 1] = True
+        return flags
+
+    def load_terms(self, terms: Iterable[str]) -> None:
+        self.matcher = TermMatcher(terms)
+
+    async def load_file(self, path: str) -> None:
+        """
+        Compiles a term list file (one term or phrase per line, `#` for
+        comments) off the event loop and activates it.
+        """
+        mtime = os.path.getmtime(path)
+        matcher = await asyncio.to_thread(_compile_file, path)
+        self.matcher = matcher
+        self.source = path
+        self._mtime = mtime
+        log.info(f"Loaded {len(matcher)} moderation terms from '{path}'")
+
+    async def watch(self, path: str, interval: float) -> None:
+        """Reloads the term list whenever the file changes."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if os.path.getmtime(path) != self._mtime:
+                    await self.load_file(path)
+            except Exception as e:
+                log.error(f"Could not reload moderation terms from '{path}': {e}")
+
+
+def _compile_file(path: str) -> TermMatcher:
+    with open(path, encoding="utf-8") as terms_file:
+        return TermMatcher(
+            line for line in (raw.strip() for raw in terms_file)
+            if line and not line.startswith("#")
+        )
+
+
+moderation_engine = ModerationEngine(FORBIDDEN_WORDS)
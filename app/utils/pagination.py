@@ -0,0 +1,42 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+Cursor = tuple[datetime, str]
+
+
+def encode_cursor(timestamp: datetime, message_id: str) -> str:
+    """
+    Builds an opaque pagination cursor pointing at a message.
+
+    Args:
+        timestamp (datetime): Timestamp of the message
+        message_id (str): Identifier of the message, used as tie-breaker
+
+    Returns:
+        str: URL-safe cursor
+    """
+    raw = json.dumps([timestamp.isoformat(), message_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """
+    Parses a cursor produced by `encode_cursor`.
+
+    Args:
+        cursor (str): Opaque cursor received from the client
+
+    Returns:
+        Cursor: (timestamp, message_id) of the referenced message
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, message_id = json.loads(raw)
+        return datetime.fromisoformat(timestamp), str(message_id)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise ValueError("Invalid pagination cursor")
@@ -0,0 +1,228 @@
+"""
+Measures throughput and latency of the HTTP API against a temporary SQLite
+database seeded with synthetic messages.
+
+The ASGI app runs in-process behind httpx's ASGI transport, with its
+lifespan, so the numbers cover routing, validation, services and the
+database but no network. The session page cache is disabled, so session
+reads measure the database path. Results can be stored as a baseline and
+later runs compared against it; the command exits with status 1 when any
+endpoint regresses past the threshold. benchmarks/baseline.json holds the
+default run on a development machine; absolute numbers depend on the host,
+so re-record it on the machine the comparison runs on.
+
+Usage:
+    python -m benchmarks.bench_http [--rows 10000] [--requests 2000] [--concurrency 32]
+    python -m benchmarks.bench_http --save-baseline benchmarks/baseline.json
+    python -m benchmarks.bench_http --baseline benchmarks/baseline.json --threshold 0.2
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+ENDPOINTS = ("create", "search", "session")
+WORDS = ("hola", "mundo", "mensaje", "sesion", "cliente", "soporte", "pedido", "factura", "envio", "gracias")
+SEED_CHUNK_SIZE = 5000
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # Nearest rank: the smallest value with at least `fraction` of the values at or below it
+    index = max(0, min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Compares results against a baseline.
+
+    Args:
+        results (dict): Summary per endpoint of the current run.
+        baseline (dict): Summary per endpoint of the baseline run.
+        threshold (float): Allowed relative regression, e.g. 0.2 for 20%.
+
+    Returns:
+        list[str]: One description per regression, empty when none.
+    """
+    regressions = []
+    for endpoint, current in results.items():
+        previous = baseline.get(endpoint)
+        if not previous:
+            continue
+        if current["rps"] < previous["rps"] * (1 - threshold):
+            regressions.append(f"{endpoint}: rps {current['rps']} < baseline {previous['rps']}")
+        for key in ("p95_ms", "p99_ms"):
+            if current[key] > previous[key] * (1 + threshold):
+                regressions.append(f"{endpoint}: {key} {current[key]} > baseline {previous[key]}")
+        if current["errors"] > previous.get("errors", 0):
+            regressions.append(f"{endpoint}: {current['errors']} errors")
+    return regressions
+
+
+async def seed(rows: int, sessions: int, rng: random.Random) -> None:
+    from app.repositories.message_repo import MessageRepository
+    from app.utils.message_utils import generate_metadata
+
+    repository = MessageRepository()
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    for offset in range(0, rows, SEED_CHUNK_SIZE):
+        batch = []
+        for i in range(offset, min(rows, offset + SEED_CHUNK_SIZE)):
+            content = " ".join(rng.choices(WORDS, k=rng.randint(3, 20)))
+            batch.append({
+                "message_id": f"seed-{i}",
+                "session_id": f"session-{i % sessions}",
+                "content": content,
+                "timestamp": start + timedelta(seconds=i),
+                "sender": "user" if i % 2 else "system",
+                **generate_metadata(content),
+            })
+        await repository.save_messages(batch)
+
+
+def request_factory(endpoint: str, sessions: int, api_key: str, rng: random.Random) -> Callable:
+    counter = iter(range(sys.maxsize))
+    headers = {"X-API-Key": api_key}
+
+    if endpoint == "create":
+        def make(client):
+            i = next(counter)
+            return client.post("/api/messages", headers=headers, json={
+                "message_id": f"bench-{i}",
+                "session_id": f"session-{i % sessions}",
+                "content": " ".join(rng.choices(WORDS, k=8)),
+                "timestamp": "2025-06-01T12:00:00Z",
+                "sender": "user",
+            })
+    elif endpoint == "search":
+        def make(client):
+            return client.get("/api/messages/search", headers=headers, params={"query": rng.choice(WORDS)})
+    else:
+        def make(client):
+            session_id = f"session-{rng.randrange(sessions)}"
+            return client.get(f"/api/messages/session/{session_id}", headers=headers, params={"limit": 50})
+    return make
+
+
+async def drive(client, make: Callable[..., Awaitable], requests: int, concurrency: int) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            response = await make(client)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+async def run(args: argparse.Namespace) -> dict:
+    from tortoise import Tortoise
+    from app.core.config import settings
+    from app.main import app
+
+    rng = random.Random(args.seed)
+    try:
+        async with app.router.lifespan_context(app):
+            print(f"Seeding {args.rows} messages across {args.sessions} sessions...")
+            started = time.perf_counter()
+            await seed(args.rows, args.sessions, rng)
+            print(f"Seeded in {time.perf_counter() - started:.1f}s")
+
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                results = {}
+                for endpoint in args.endpoints:
+                    make = request_factory(endpoint, args.sessions, settings.API_KEY, rng)
+                    await drive(client, make, min(args.warmup, args.requests), args.concurrency)
+                    results[endpoint] = await drive(client, make, args.requests, args.concurrency)
+    finally:
+        # The lifespan leaves the aiosqlite thread running, which would keep
+        # the interpreter alive after the run.
+        await Tortoise.close_connections()
+    return results
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="HTTP load and latency benchmark.")
+    parser.add_argument("--rows", type=int, default=10_000, help="messages to seed")
+    parser.add_argument("--sessions", type=int, default=100, help="sessions the rows are spread over")
+    parser.add_argument("--requests", type=int, default=2000, help="measured requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=100, help="unmeasured requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument("--seed", type=int, default=42, help="random seed for data and requests")
+    parser.add_argument("--baseline", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative regression")
+    parser.add_argument("--save-baseline", help="write the results as a baseline JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="chat-bench-") as directory:
+        # Settings are read at import time, so configure before importing the app
+        os.environ["DATABASE_URL"] = f"sqlite://{os.path.join(directory, 'bench.sqlite3')}"
+        os.environ["RATE_LIMIT_ENABLED"] = "false"
+        # The session scenario repeats page keys, which the cache would
+        # serve instead of the database query it is meant to measure
+        os.environ["SESSION_CACHE_ENABLED"] = "false"
+        results = asyncio.run(run(args))
+
+    print(f"\n{'endpoint':<10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for endpoint, summary in results.items():
+        print(
+            f"{endpoint:<10}{summary['rps']:>10}{summary['p50_ms']:>10}"
+            f"{summary['p95_ms']:>10}{summary['p99_ms']:>10}{summary['errors']:>8}"
+        )
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as output:
+            json.dump(results, output, indent=2)
+        print(f"\nBaseline written to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.threshold)
+        if regressions:
+            print(f"\nRegressions beyond {args.threshold:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print(f"\nNo regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
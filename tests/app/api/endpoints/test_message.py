@@ -93,7 +93,9 @@ class TestGetMessages:
     @pytest.mark.asyncio
     @patch("app.api.endpoints.message.message_repository.get_messages", new_callable=AsyncMock)
     async def test_get_messages_success(self, mock_get_messages):
-        mock_get_messages.return_value = [self.message]
+        mock_get_messages.return_value = {
+            "data": [self.message], "next_cursor": "abc", "prev_cursor": None
+        }
 
         async with AsyncClient(app=app, base_url="http://test") as ac:
             response = await ac.get(f"{BASE_URL}/session/session1", headers=AUTH_HEADER)
@@ -103,11 +105,13 @@ class TestGetMessages:
         assert data["status"] == "success"
         assert isinstance(data["data"], list)
         assert "metadata" in data["data"][0]
+        assert data["next_cursor"] == "abc"
+        assert data["prev_cursor"] is None
 
     @pytest.mark.asyncio
     @patch("app.api.endpoints.message.message_repository.get_messages", new_callable=AsyncMock)
     async def test_get_messages_empty(self, mock_get_messages):
-        mock_get_messages.return_value = []
+        mock_get_messages.return_value = {"data": [], "next_cursor": None, "prev_cursor": None}
 
         async with AsyncClient(app=app, base_url="http://test") as ac:
             response = await ac.get(f"{BASE_URL}/session/session1", headers=AUTH_HEADER)
@@ -127,6 +131,104 @@ class TestGetMessages:
 
         assert response.status_code == 500
 
+    @pytest.mark.asyncio
+    @patch("app.api.endpoints.message.message_repository.get_messages", new_callable=AsyncMock)
+    async def test_get_messages_invalid_cursor(self, mock_get_messages):
+        mock_get_messages.side_effect = ValueError("Invalid pagination cursor")
+
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            response = await ac.get(
+                f"{BASE_URL}/session/session1", params={"after": "???"}, headers=AUTH_HEADER
+            )
+
+        assert response.status_code == 400
+
+
+class TestExportMessages:
+    @pytest.mark.asyncio
+    @patch("app.api.endpoints.message.message_repository.export_messages")
+    async def test_export_streams_ndjson(self, mock_export):
+        async def chunks():
+            yield b'{"message_id":"msg1"}\n'
+            yield b'{"message_id":"msg2"}\n'
+        mock_export.return_value = chunks()
+
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            response = await ac.get(
+                f"{BASE_URL}/export",
+                params={"session_id": "session1", "since": "2025-01-01T00:00:00Z"},
+                headers=AUTH_HEADER,
+            )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert len(response.text.splitlines()) == 2
+        assert mock_export.call_args.args[:2] == ("ndjson", "session1")
+
+    @pytest.mark.asyncio
+    async def test_export_rejects_unknown_format(self):
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            response = await ac.get(f"{BASE_URL}/export", params={"format": "xml"}, headers=AUTH_HEADER)
+
+        assert response.status_code == 422
+
+
+class TestCacheStats:
+    @pytest.mark.asyncio
+    @patch("app.api.endpoints.message.message_repository.cache_stats")
+    async def test_cache_stats(self, mock_cache_stats):
+        mock_cache_stats.return_value = {"enabled": True, "hits": 3, "misses": 1}
+
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            response = await ac.get(f"{BASE_URL}/cache/stats", headers=AUTH_HEADER)
+
+        assert response.status_code == 200
+        assert response.json()["data"]["hits"] == 3
+
+
+class TestSessionStats:
+    @pytest.mark.asyncio
+    @patch("app.api.endpoints.message.message_repository.get_session_stats", new_callable=AsyncMock)
+    async def test_session_stats(self, mock_get_session_stats):
+        mock_get_session_stats.return_value = {
+            "session_id": "session1",
+            "message_count": 3,
+            "user_count": 2,
+            "system_count": 1,
+            "word_count": 6,
+            "character_count": 30,
+            "first_activity": datetime(2025, 1, 1),
+            "last_activity": datetime(2025, 1, 2),
+        }
+
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            response = await ac.get(f"{BASE_URL}/session/session1/stats", headers=AUTH_HEADER)
+
+        assert response.status_code == 200
+        assert response.json()["data"]["message_count"] == 3
+        mock_get_session_stats.assert_awaited_once_with("session1")
+
+    @pytest.mark.asyncio
+    @patch("app.api.endpoints.message.message_repository.get_session_stats", new_callable=AsyncMock)
+    async def test_session_stats_not_found(self, mock_get_session_stats):
+        mock_get_session_stats.return_value = None
+
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            response = await ac.get(f"{BASE_URL}/session/missing/stats", headers=AUTH_HEADER)
+
+        assert response.status_code == 404
+
+
+class TestConnectionStats:
+    @pytest.mark.asyncio
+    async def test_connection_stats(self):
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            response = await ac.get(f"{BASE_URL}/connections/stats", headers=AUTH_HEADER)
+
+        assert response.status_code == 200
+        assert response.json()["data"]["connections"] == 0
+        assert response.json()["data"]["max_connections"] == settings.WS_MAX_CONNECTIONS
+
 
 class TestReceiveMessage:
     payload = {
@@ -181,3 +283,58 @@ class TestReceiveMessage:
             response = await ac.post(BASE_URL, json=self.payload, headers=AUTH_HEADER)
 
         assert response.status_code == 500
+
+
+class TestReceiveMessageBatch:
+    payload = {
+        "messages": [
+            {
+                "message_id": "msg1",
+                "session_id": "session1",
+                "content": "hola mundo",
+                "timestamp": "2025-07-29T23:41:26.373Z",
+                "sender": "user"
+            },
+            {
+                "message_id": "msg2",
+                "session_id": "session1",
+                "content": "hola de nuevo",
+                "timestamp": "2025-07-29T23:41:27.373Z",
+                "sender": "system"
+            },
+        ]
+    }
+
+    @pytest.mark.asyncio
+    @patch("app.api.endpoints.message.message_repository.process_and_store_batch", new_callable=AsyncMock)
+    async def test_receive_batch_success(self, mock_process_batch):
+        mock_process_batch.return_value = [
+            {"message_id": "msg1", "status": "stored"},
+            {"message_id": "msg2", "status": "duplicate", "detail": "The message_id already exists"},
+        ]
+
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            response = await ac.post(f"{BASE_URL}/batch", json=self.payload, headers=AUTH_HEADER)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["status"] == "success"
+        assert [item["status"] for item in data["data"]] == ["stored", "duplicate"]
+        assert len(mock_process_batch.await_args.args[0]) == 2
+
+    @pytest.mark.asyncio
+    async def test_receive_batch_empty_is_invalid(self):
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            response = await ac.post(f"{BASE_URL}/batch", json={"messages": []}, headers=AUTH_HEADER)
+
+        assert response.status_code == 422
+
+    @pytest.mark.asyncio
+    @patch("app.api.endpoints.message.message_repository.process_and_store_batch", new_callable=AsyncMock)
+    async def test_receive_batch_bad_request(self, mock_process_batch):
+        mock_process_batch.side_effect = ValueError("Error saving messages")
+
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            response = await ac.post(f"{BASE_URL}/batch", json=self.payload, headers=AUTH_HEADER)
+
+        assert response.status_code == 400
@@ -1,7 +1,15 @@
+import json
 import pytest
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+from unittest.mock import AsyncMock, patch
 from app.api.ws.message_ws import router as ws_router
+from app.core.config import settings
+from app.core.limiter import limiter, parse_limit
+from app.core.rate_limit_backends import MemoryRateLimitBackend
+from app.schemas.enums import BatchItemStatus
+from app.services.broadcaster import broadcaster
 
 
 @pytest.fixture
@@ -11,11 +19,121 @@ def test_app():
     return app
 
 
+def _frame(message_id: str, session_id: str = "test123") -> str:
+    return json.dumps({
+        "message_id": message_id,
+        "session_id": session_id,
+        "content": "hola",
+        "timestamp": "2025-01-01T10:00:00Z",
+        "sender": "user",
+    })
+
+
 def test_websocket_connection_sync(test_app):
     client = TestClient(test_app)
     session_id = "test123"
 
-    with client.websocket_connect(f"/ws/{session_id}") as websocket:
-        message = "test message"
-        websocket.send_text(message)
-        assert websocket is not None  
+    with client.websocket_connect(f"/ws/{session_id}", headers={"X-API-Key": settings.API_KEY}) as websocket:
+        websocket.send_text("test message")
+        ack = websocket.receive_json()
+
+    assert ack["event"] == "ack"
+    assert ack["data"][0]["status"] == "rejected"
+
+
+def test_websocket_rejects_invalid_api_key(test_app):
+    client = TestClient(test_app)
+
+    with pytest.raises(WebSocketDisconnect) as exc:
+        with client.websocket_connect("/ws/test123?api_key=wrong"):
+            pass
+
+    assert exc.value.code == 1008
+
+
+def test_websocket_ingests_frames_and_acks(test_app):
+    # Given
+    client = TestClient(test_app)
+    stored = AsyncMock(return_value=[
+        {"message_id": "m1", "status": BatchItemStatus.stored},
+        {"message_id": "m2", "status": BatchItemStatus.duplicate, "detail": "The message_id already exists"},
+    ])
+
+    # When
+    with patch("app.api.ws.message_ws.message_repository.process_and_store_batch", stored), \
+            patch.object(settings, "WS_INGEST_FLUSH_INTERVAL_MS", 200):
+        with client.websocket_connect(f"/ws/test123?api_key={settings.API_KEY}") as websocket:
+            websocket.send_text(_frame("m1"))
+            websocket.send_text(_frame("m2"))
+            websocket.send_text(_frame("m3", session_id="other"))
+            ack = websocket.receive_json()
+
+    # Then
+    assert [payload.message_id for payload in stored.await_args.args[0]] == ["m1", "m2"]
+    assert ack == {"event": "ack", "data": [
+        {"message_id": "m1", "status": "stored", "detail": None},
+        {"message_id": "m2", "status": "duplicate", "detail": "The message_id already exists"},
+        {"message_id": "m3", "status": "rejected", "detail": "session_id does not match the connection"},
+    ]}
+
+
+def test_websocket_ingest_is_rate_limited_per_api_key(test_app):
+    # Given
+    client = TestClient(test_app)
+    stored = AsyncMock(side_effect=lambda payloads: [
+        {"message_id": payload.message_id, "status": BatchItemStatus.stored} for payload in payloads
+    ])
+    backend = MemoryRateLimitBackend()
+
+    # When
+    with patch("app.api.ws.message_ws.message_repository.process_and_store_batch", stored), \
+            patch.object(limiter, "backend", backend), patch.object(limiter, "enabled", True), \
+            patch.dict(limiter.limits, {"ws:ingest": parse_limit("2/minute")}):
+        with client.websocket_connect(f"/ws/test123?api_key={settings.API_KEY}") as websocket:
+            websocket.send_text(_frame("m1"))
+            first = websocket.receive_json()
+            websocket.send_text(_frame("m2"))
+            second = websocket.receive_json()
+            websocket.send_text(_frame("m3"))
+            third = websocket.receive_json()
+
+    # Then
+    assert [first["data"][0]["status"], second["data"][0]["status"]] == ["stored", "stored"]
+    assert third["data"] == [{"message_id": "m3", "status": "rejected", "detail": "rate_limited"}]
+    assert stored.await_count == 2
+
+
+def test_websocket_replays_missed_events_on_resume(test_app):
+    # Given
+    client = TestClient(test_app)
+    for seq in (1, 2, 3):
+        broadcaster.replay.append("resume1", seq, f'{{"seq":{seq},"event":"new_message"}}')
+
+    # When
+    with client.websocket_connect(f"/ws/resume1?last_seq=1&api_key={settings.API_KEY}") as websocket:
+        replayed = [websocket.receive_json(), websocket.receive_json()]
+
+    # Then
+    assert [event["seq"] for event in replayed] == [2, 3]
+
+
+def test_websocket_over_connection_cap_is_closed_with_try_again_later(test_app):
+    client = TestClient(test_app)
+
+    with patch.object(broadcaster.registry, "max_connections", 0):
+        with pytest.raises(WebSocketDisconnect) as exc:
+            with client.websocket_connect("/ws/test123", headers={"X-API-Key": settings.API_KEY}) as websocket:
+                websocket.receive_text()
+
+    assert exc.value.code == 1013
+
+
+def test_websocket_pong_frames_are_not_ingested(test_app):
+    client = TestClient(test_app)
+
+    with client.websocket_connect("/ws/test123", headers={"X-API-Key": settings.API_KEY}) as websocket:
+        websocket.send_text('{"event": "pong"}')
+        websocket.send_text("test message")
+        ack = websocket.receive_json()
+
+    assert [item["status"] for item in ack["data"]] == ["rejected"]
@@ -0,0 +1,79 @@
+import pytest
+from fastapi import Depends, FastAPI
+from starlette.testclient import TestClient
+from unittest.mock import AsyncMock
+from app.core.config import settings
+from app.core.error_handlers import rate_limit_exceeded_handler
+from app.core.limiter import RateLimiter, RateLimitExceeded, parse_limit
+from app.core.rate_limit_backends import MemoryRateLimitBackend
+
+
+def _app(limiter: RateLimiter) -> FastAPI:
+    app = FastAPI()
+    app.add_exception_handler(RateLimitExceeded, rate_limit_exceeded_handler)
+
+    @app.get("/limited", dependencies=[Depends(limiter.limit("limited"))])
+    async def limited():
+        return {"ok": True}
+
+    return app
+
+
+@pytest.mark.parametrize("limit, expected", [
+    ("5/minute", (5 / 60, 5.0)),
+    ("100/10 seconds", (10.0, 100.0)),
+    ("1000/day", (1000 / 86400, 1000.0)),
+])
+def test_parse_limit(limit, expected):
+    assert parse_limit(limit) == pytest.approx(expected)
+
+
+def test_parse_limit_invalid():
+    with pytest.raises(ValueError):
+        parse_limit("five per minute")
+
+
+def test_limit_requires_configured_route():
+    limiter = RateLimiter(MemoryRateLimitBackend(), {})
+
+    with pytest.raises(ValueError):
+        limiter.limit("unknown")
+
+
+def test_requests_over_limit_get_429_with_retry_after():
+    # Given
+    client = TestClient(_app(RateLimiter(MemoryRateLimitBackend(), {"limited": "2/minute"})))
+
+    # When
+    responses = [client.get("/limited", headers={"X-API-Key": "a"}) for _ in range(3)]
+
+    # Then
+    assert [r.status_code for r in responses] == [200, 200, 429]
+    assert responses[2].json() == {"detail": "Rate limit exceeded"}
+    assert responses[2].headers["Retry-After"] == "30"
+
+
+def test_buckets_are_per_valid_api_key_with_ip_fallback():
+    client = TestClient(_app(RateLimiter(MemoryRateLimitBackend(), {"limited": "1/minute"})))
+
+    assert client.get("/limited", headers={"X-API-Key": settings.API_KEY}).status_code == 200
+    assert client.get("/limited", headers={"X-API-Key": settings.API_KEY}).status_code == 429
+    assert client.get("/limited", headers={"X-API-Key": "a"}).status_code == 200
+    # Invalid keys share the IP bucket, so rotating them does not help
+    assert client.get("/limited", headers={"X-API-Key": "b"}).status_code == 429
+    assert client.get("/limited").status_code == 429
+
+
+@pytest.mark.parametrize("fail_open, status", [(True, 200), (False, 503)])
+def test_backend_failure_follows_fail_policy(fail_open, status):
+    backend = AsyncMock()
+    backend.acquire.side_effect = ConnectionError("redis is down")
+    client = TestClient(_app(RateLimiter(backend, {"limited": "1/minute"}, fail_open=fail_open)))
+
+    assert client.get("/limited").status_code == status
+
+
+def test_disabled_limiter_allows_everything():
+    client = TestClient(_app(RateLimiter(MemoryRateLimitBackend(), {"limited": "1/minute"}, enabled=False)))
+
+    assert [client.get("/limited").status_code for _ in range(3)] == [200, 200, 200]
@@ -0,0 +1,97 @@
+import io
+import json
+import logging
+import pytest
+from unittest.mock import patch
+from logging.handlers import QueueHandler
+from app.core import logging as app_logging
+from app.core.logging import JSONFormatter, LogRateLimiter, MyFormat, create_handler, get_logging
+
+
+def _record(msg="hola %s", args=("mundo",), level=logging.INFO, **extra):
+    record = logging.LogRecord("app.test", level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_get_logging_does_not_duplicate_handlers():
+    first = get_logging("app.tests.idempotent")
+    second = get_logging("app.tests.idempotent")
+
+    assert first is second
+    assert len(first.handlers) == 1
+
+
+def test_my_format_reuses_cached_formatters():
+    formatter = MyFormat()
+
+    with patch("app.core.logging.logging.Formatter") as formatter_class:
+        output = formatter.format(_record())
+
+    formatter_class.assert_not_called()
+    assert "hola mundo" in output
+
+
+def test_json_formatter_includes_extra_fields():
+    output = JSONFormatter().format(_record(session_id="s1"))
+
+    entry = json.loads(output)
+    assert entry["message"] == "hola mundo"
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "app.test"
+    assert entry["session_id"] == "s1"
+    assert entry["timestamp"].endswith("Z")
+
+
+def test_queue_handler_writes_from_background_listener():
+    # Given
+    stream = io.StringIO()
+    with patch.object(app_logging.settings, "LOG_QUEUE_ENABLED", True), \
+            patch.object(app_logging.settings, "LOG_FORMAT", "json"):
+        handler, listener = create_handler(stream)
+
+    # When
+    handler.handle(_record())
+    listener.stop()
+
+    # Then
+    assert isinstance(handler, QueueHandler)
+    assert json.loads(stream.getvalue())["message"] == "hola mundo"
+
+
+def test_records_logged_after_stop_logging_are_written():
+    # Given
+    stream = io.StringIO()
+    with patch.object(app_logging.settings, "LOG_QUEUE_ENABLED", True), \
+            patch.object(app_logging.settings, "LOG_FORMAT", "json"):
+        handler, listener = create_handler(stream)
+    with patch.object(app_logging, "_handler", handler), patch.object(app_logging, "_listener", listener):
+        log = get_logging("app.tests.after_stop")
+
+        # When
+        app_logging.stop_logging()
+        log.warning("late record")
+
+        # Then
+        assert log.handlers == [app_logging._handler]
+        assert not isinstance(log.handlers[0], QueueHandler)
+    assert json.loads(stream.getvalue())["message"] == "late record"
+    log.handlers.clear()
+
+
+def test_direct_handler_when_queue_disabled():
+    with patch.object(app_logging.settings, "LOG_QUEUE_ENABLED", False):
+        handler, listener = create_handler(io.StringIO())
+
+    assert listener is None
+    assert isinstance(handler.formatter, (MyFormat, JSONFormatter))
+
+
+def test_log_rate_limiter_allows_per_second_and_counts_suppressed():
+    limiter = LogRateLimiter(per_second=2)
+
+    with patch("app.core.logging.time.monotonic", side_effect=[10.1, 10.2, 10.3, 10.4, 11.0]):
+        results = [limiter.allow() for _ in range(5)]
+
+    assert results == [True, True, False, False, True]
+    assert limiter.suppressed == 2
@@ -0,0 +1,98 @@
+import pytest
+from fastapi import FastAPI
+from starlette.testclient import TestClient
+from app.core.metrics import Histogram, MetricsMiddleware, MetricsRegistry, timed
+from app.main import app
+
+
+def test_histogram_renders_cumulative_buckets():
+    # Given
+    registry = MetricsRegistry()
+    histogram = registry.histogram("op_seconds", "Op time.", ("op",), buckets=(0.1, 1.0))
+
+    # When
+    histogram.observe(0.05, "read")
+    histogram.observe(0.5, "read")
+    histogram.observe(5.0, "read")
+
+    # Then
+    output = registry.render()
+    assert "# TYPE op_seconds histogram" in output
+    assert 'op_seconds_bucket{op="read",le="0.1"} 1' in output
+    assert 'op_seconds_bucket{op="read",le="1.0"} 2' in output
+    assert 'op_seconds_bucket{op="read",le="+Inf"} 3' in output
+    assert 'op_seconds_count{op="read"} 3' in output
+    assert 'op_seconds_sum{op="read"} 5.55' in output
+
+
+def test_counter_and_gauge_render():
+    registry = MetricsRegistry()
+    counter = registry.counter("rejections_total", "Rejections.", ("route",))
+    registry.gauge("connections", "Connections.", lambda: 3)
+
+    counter.inc("create")
+    counter.inc("create")
+
+    output = registry.render()
+    assert 'rejections_total{route="create"} 2' in output
+    assert "connections 3" in output
+
+
+def test_histogram_reuses_children_per_label_set():
+    histogram = Histogram("h", "H.", ("route",))
+
+    assert histogram.labels("a") is histogram.labels("a")
+    assert histogram.labels("a") is not histogram.labels("b")
+
+
+@pytest.mark.asyncio
+async def test_timed_observes_coroutines_and_functions():
+    histogram = Histogram("h", "H.", ("op",))
+
+    @timed(histogram, "async")
+    async def async_op():
+        return "done"
+
+    @timed(histogram, "sync")
+    def sync_op():
+        raise ValueError("boom")
+
+    assert await async_op() == "done"
+    with pytest.raises(ValueError):
+        sync_op()
+    assert histogram.labels("async").count == 1
+    assert histogram.labels("sync").count == 1
+
+
+def test_middleware_labels_by_route_template():
+    # Given
+    histogram = Histogram("http", "HTTP.", ("method", "route", "status"))
+    test_app = FastAPI()
+    test_app.add_middleware(MetricsMiddleware, histogram=histogram)
+
+    @test_app.get("/items/{item_id}")
+    async def get_item(item_id: str):
+        return {"item_id": item_id}
+
+    client = TestClient(test_app)
+
+    # When
+    client.get("/items/1")
+    client.get("/items/2")
+    client.get("/missing")
+
+    # Then
+    assert histogram.labels("GET", "/items/{item_id}", 200).count == 2
+    assert histogram.labels("GET", "unmatched", 404).count == 1
+
+
+def test_metrics_endpoint_exposes_prometheus_text():
+    client = TestClient(app)
+    client.get("/")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'http_request_duration_seconds_count{method="GET",route="/",status="200"}' in response.text
+    assert "ws_active_connections" in response.text
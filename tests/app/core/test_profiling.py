@@ -0,0 +1,70 @@
+import asyncio
+import os
+import pstats
+import pytest
+from fastapi import FastAPI
+from starlette.testclient import TestClient
+from app.core.profiling import ProfilingMiddleware
+
+API_KEY = "secret"
+
+
+def busy_work():
+    return sum(i * i for i in range(200_000))
+
+
+def _client(tmp_path, **options) -> TestClient:
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware, api_key=API_KEY, output_dir=str(tmp_path), **options)
+
+    @app.get("/work")
+    async def work_endpoint():
+        await asyncio.sleep(0.02)
+        return {"total": busy_work()}
+
+    return TestClient(app)
+
+
+def test_header_with_valid_api_key_writes_collapsed_stacks(tmp_path):
+    # Given
+    client = _client(tmp_path)
+
+    # When
+    response = client.get("/work", headers={"X-Profile": "1", "X-API-Key": API_KEY})
+
+    # Then
+    path = response.headers["X-Profile-Path"]
+    assert path.endswith(".collapsed")
+    lines = open(path, encoding="utf-8").read().splitlines()
+    assert lines
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any("work_endpoint" in line and "busy_work" in line for line in lines)
+    assert any("work_endpoint" in line and "sleep" in line for line in lines)
+
+
+@pytest.mark.parametrize("headers", [{}, {"X-Profile": "1"}, {"X-Profile": "1", "X-API-Key": "wrong"}])
+def test_requests_without_valid_admin_header_are_not_profiled(tmp_path, headers):
+    client = _client(tmp_path)
+
+    response = client.get("/work", headers=headers)
+
+    assert response.status_code == 200
+    assert "X-Profile-Path" not in response.headers
+    assert os.listdir(tmp_path) == []
+
+
+def test_sample_rate_profiles_without_header(tmp_path):
+    client = _client(tmp_path, sample_rate=1.0)
+
+    response = client.get("/work")
+
+    assert os.path.exists(response.headers["X-Profile-Path"])
+
+
+def test_cprofile_mode_writes_stats(tmp_path):
+    client = _client(tmp_path, mode="cprofile")
+
+    response = client.get("/work", headers={"X-Profile": "1", "X-API-Key": API_KEY})
+
+    stats = pstats.Stats(response.headers["X-Profile-Path"])
+    assert any(function == "busy_work" for _, _, function in stats.stats)
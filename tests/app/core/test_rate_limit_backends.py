@@ -0,0 +1,90 @@
+import uuid
+import pytest
+from unittest.mock import patch
+from app.core.rate_limit_backends import (
+    MemoryRateLimitBackend,
+    RedisRateLimitBackend,
+    SharedMemoryRateLimitBackend,
+)
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_memory_backend_allows_burst_then_reports_retry_after():
+    backend = MemoryRateLimitBackend()
+
+    with patch("app.core.rate_limit_backends.time.monotonic", return_value=100.0):
+        results = [await backend.acquire("k", rate=1.0, capacity=3) for _ in range(4)]
+
+    assert results[:3] == [0.0, 0.0, 0.0]
+    assert results[3] == pytest.approx(1.0)
+
+
+async def test_memory_backend_refills_over_time():
+    backend = MemoryRateLimitBackend()
+
+    with patch("app.core.rate_limit_backends.time.monotonic", side_effect=[100.0, 100.0, 102.5]):
+        assert await backend.acquire("k", rate=0.5, capacity=1) == 0.0
+        assert await backend.acquire("k", rate=0.5, capacity=1) == pytest.approx(2.0)
+        assert await backend.acquire("k", rate=0.5, capacity=1) == 0.0
+
+
+async def test_memory_backend_evicts_refilled_and_excess_buckets():
+    backend = MemoryRateLimitBackend(max_keys=2)
+
+    with patch("app.core.rate_limit_backends.time.monotonic", side_effect=[100.0, 100.5, 101.0, 110.0]):
+        await backend.acquire("a", rate=1.0, capacity=1)
+        await backend.acquire("b", rate=1.0, capacity=1)
+        # Over max_keys: the least recently used bucket is dropped
+        await backend.acquire("c", rate=1.0, capacity=1)
+        assert len(backend) == 2
+        # Every other bucket has refilled by now
+        await backend.acquire("d", rate=1.0, capacity=1)
+
+    assert len(backend) == 1
+
+
+async def test_shared_memory_backend_shares_buckets_between_workers(tmp_path):
+    # Given
+    name = f"chat-test-{uuid.uuid4().hex[:8]}"
+    lock_path = str(tmp_path / "rate.lock")
+    worker_a = SharedMemoryRateLimitBackend(name, slots=64, lock_path=lock_path)
+    worker_b = SharedMemoryRateLimitBackend(name, slots=64, lock_path=lock_path)
+    try:
+        # When
+        allowed_a = await worker_a.acquire("client", rate=0.01, capacity=2)
+        allowed_b = await worker_b.acquire("client", rate=0.01, capacity=2)
+        limited_a = await worker_a.acquire("client", rate=0.01, capacity=2)
+        other_key = await worker_b.acquire("other", rate=0.01, capacity=2)
+
+        # Then
+        assert (allowed_a, allowed_b, other_key) == (0.0, 0.0, 0.0)
+        assert limited_a > 0
+    finally:
+        await worker_b.close()
+        await worker_a.close(unlink=True)
+
+
+async def test_shared_memory_backend_recycles_slots_when_full(tmp_path):
+    name = f"chat-test-{uuid.uuid4().hex[:8]}"
+    backend = SharedMemoryRateLimitBackend(name, slots=4, lock_path=str(tmp_path / "rate.lock"))
+    try:
+        results = [await backend.acquire(f"client-{i}", rate=1.0, capacity=1) for i in range(20)]
+
+        assert results == [0.0] * 20
+    finally:
+        await backend.close(unlink=True)
+
+
+async def test_redis_backend_enforces_bucket_across_clients():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    server = fakeredis.FakeServer()
+    worker_a = RedisRateLimitBackend("redis://fake", client=fakeredis.FakeAsyncRedis(server=server))
+    worker_b = RedisRateLimitBackend("redis://fake", client=fakeredis.FakeAsyncRedis(server=server))
+
+    assert await worker_a.acquire("client", rate=0.01, capacity=1) == 0.0
+    assert await worker_b.acquire("client", rate=0.01, capacity=1) > 0
+
+    await worker_a.close()
+    await worker_b.close()
@@ -0,0 +1,27 @@
+import json
+from datetime import datetime, timezone
+from app.core.responses import FastJSONResponse
+from app.schemas.enums import SenderEnum
+from app.schemas.message import MessageOut
+
+
+def test_renders_like_pydantic_json():
+    message = {
+        "message_id": "msg1",
+        "session_id": "session1",
+        "content": "hola mundo",
+        "timestamp": datetime(2025, 7, 29, 23, 41, 26, 373000, tzinfo=timezone.utc),
+        "sender": SenderEnum.user,
+        "metadata": {
+            "word_count": 2,
+            "character_count": 10,
+            "processed_at": datetime(2025, 7, 29, 23, 41, 27, tzinfo=timezone.utc),
+        },
+        "seq": 7,
+    }
+
+    response = FastJSONResponse({"status": "success", "data": [message]})
+
+    assert response.media_type == "application/json"
+    body = json.loads(response.body)
+    assert body["data"][0] == json.loads(MessageOut(**message).model_dump_json())
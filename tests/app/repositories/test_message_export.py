@@ -0,0 +1,67 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from tortoise import Tortoise
+from app.db.fulltext import setup_fulltext_index
+from app.repositories.message_repo import MessageRepository
+
+pytestmark = pytest.mark.asyncio
+
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+async def _repository_with_messages(count: int) -> MessageRepository:
+    await Tortoise.init(db_url="sqlite://:memory:", modules={"models": ["app.models.message"]})
+    await Tortoise.generate_schemas()
+    await setup_fulltext_index()
+    repository = MessageRepository()
+    await repository.save_messages([
+        {
+            "message_id": f"m{i:03d}",
+            "session_id": "s1" if i % 2 else "s2",
+            "content": "hola mundo" if i % 3 else "adios",
+            "timestamp": START + timedelta(minutes=i // 2),
+            "sender": "user",
+        }
+        for i in range(count)
+    ])
+    return repository
+
+
+async def _collect(chunks) -> list[list[str]]:
+    return [[row["message_id"] for row in chunk] async for chunk in chunks]
+
+
+async def test_iterates_in_fixed_size_chunks():
+    repository = await _repository_with_messages(25)
+    try:
+        chunks = await _collect(repository.iter_messages(chunk_size=10))
+
+        assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+        assert [mid for chunk in chunks for mid in chunk] == [f"m{i:03d}" for i in range(25)]
+    finally:
+        await Tortoise.close_connections()
+
+
+async def test_filters_by_session_and_time_range():
+    repository = await _repository_with_messages(25)
+    try:
+        chunks = await _collect(repository.iter_messages(
+            session_id="s1",
+            since=START + timedelta(minutes=2),
+            until=START + timedelta(minutes=5),
+            chunk_size=2,
+        ))
+
+        assert [mid for chunk in chunks for mid in chunk] == ["m005", "m007", "m009"]
+    finally:
+        await Tortoise.close_connections()
+
+
+async def test_exports_full_text_matches():
+    repository = await _repository_with_messages(25)
+    try:
+        chunks = await _collect(repository.iter_messages(query="adios", session_id="s2", chunk_size=2))
+
+        assert [mid for chunk in chunks for mid in chunk] == ["m000", "m006", "m012", "m018", "m024"]
+    finally:
+        await Tortoise.close_connections()
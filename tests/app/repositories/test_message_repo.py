@@ -1,87 +1,171 @@
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
-from app.repositories.message_repo import MessageRepository
+from app.repositories.message_repo import MESSAGE_COLUMNS, MessageRepository
+from app.utils.compression import decompress_content
 
 pytestmark = pytest.mark.asyncio
 
 class TestMessageRepository:
 
+    @patch("app.repositories.message_repo.in_transaction")
     @patch("app.repositories.message_repo.Message", autospec=True)
-    async def test_save_message_success(self, mock_message_class):
-        repo = MessageRepository()
-        fake_data = {"message_id": "msg1", "content": "hello world"}
+    async def test_save_message_success(self, mock_message_class, mock_in_transaction):
+        stats = AsyncMock()
+        stats.record.return_value = {"s1": 7}
+        repo = MessageRepository(session_stats=stats)
+        fake_data = {"message_id": "msg1", "session_id": "s1", "content": "hello world"}
+        connection = MagicMock()
+        mock_in_transaction.return_value.__aenter__ = AsyncMock(return_value=connection)
+        mock_in_transaction.return_value.__aexit__ = AsyncMock(return_value=False)
 
         mock_instance = MagicMock()
         mock_message_class.create = AsyncMock(return_value=mock_instance)
 
         result = await repo.save_message(fake_data)
 
-        mock_message_class.create.assert_awaited_once_with(**fake_data)
+        mock_message_class.create.assert_awaited_once_with(**fake_data, using_db=connection)
+        stats.record.assert_awaited_once_with([fake_data], connection)
+        assert fake_data["seq"] == 7
         assert result == mock_instance
 
+    @patch("app.repositories.message_repo.in_transaction")
     @patch("app.repositories.message_repo.Message", autospec=True)
-    async def test_save_message_exception(self, mock_message_class):
-        repo = MessageRepository()
-        fake_data = {"message_id": "msg1", "content": "hello world"}
+    async def test_save_message_exception(self, mock_message_class, mock_in_transaction):
+        stats = AsyncMock()
+        stats.record.return_value = {"s1": 1}
+        repo = MessageRepository(session_stats=stats)
+        mock_in_transaction.return_value.__aenter__ = AsyncMock(return_value=MagicMock())
+        mock_in_transaction.return_value.__aexit__ = AsyncMock(return_value=False)
+        fake_data = {"message_id": "msg1", "session_id": "s1", "content": "hello world"}
 
         mock_message_class.create = AsyncMock(side_effect=Exception("DB error"))
 
         with pytest.raises(Exception, match="DB error"):
             await repo.save_message(fake_data)
 
+    @patch("app.repositories.message_repo._reader")
     @patch("app.repositories.message_repo.Message", autospec=True)
-    async def test_get_messages_by_session_without_sender(self, mock_message_class):
+    async def test_get_messages_by_session_without_sender(self, mock_message_class, mock_reader):
         repo = MessageRepository()
 
         mock_query = MagicMock()
         mock_message_class.filter.return_value = mock_query
+        mock_query.using_db.return_value = mock_query
+        mock_query.order_by.return_value = mock_query
         mock_query.offset.return_value = mock_query
         mock_query.limit.return_value = mock_query
-        mock_query.all = AsyncMock(return_value=["msg1", "msg2"])
+        mock_query.values = AsyncMock(return_value=[{"message_id": "msg1"}, {"message_id": "msg2"}])
 
         result = await repo.get_messages_by_session("session1", limit=5, offset=0)
 
         mock_message_class.filter.assert_called_once_with(session_id="session1")
+        mock_query.using_db.assert_called_once_with(mock_reader.return_value)
+        mock_query.order_by.assert_called_once_with("timestamp", "message_id")
         mock_query.offset.assert_called_once_with(0)
         mock_query.limit.assert_called_once_with(5)
-        mock_query.all.assert_awaited_once()
-        assert result == ["msg1", "msg2"]
+        mock_query.values.assert_awaited_once_with(*MESSAGE_COLUMNS)
+        assert result == [{"message_id": "msg1"}, {"message_id": "msg2"}]
 
+    @patch("app.repositories.message_repo._reader")
     @patch("app.repositories.message_repo.Message", autospec=True)
-    async def test_get_messages_by_session_with_sender(self, mock_message_class):
+    async def test_get_messages_by_session_with_sender(self, mock_message_class, _):
         repo = MessageRepository()
 
         mock_query = MagicMock()
         mock_message_class.filter.return_value = mock_query
+        mock_query.using_db.return_value = mock_query
         mock_query.filter.return_value = mock_query
+        mock_query.order_by.return_value = mock_query
         mock_query.offset.return_value = mock_query
         mock_query.limit.return_value = mock_query
-        mock_query.all = AsyncMock(return_value=["msg_user"])
+        mock_query.values = AsyncMock(return_value=[{"message_id": "msg_user"}])
 
         result = await repo.get_messages_by_session("session1", sender="user")
 
         mock_message_class.filter.assert_called_once_with(session_id="session1")
         mock_query.filter.assert_called_once_with(sender="user")
-        mock_query.all.assert_awaited_once()
-        assert result == ["msg_user"]
+        mock_query.values.assert_awaited_once()
+        assert result == [{"message_id": "msg_user"}]
 
-    @patch("app.repositories.message_repo.Message", autospec=True)
-    async def test_search_messages_success(self, mock_message_class):
+    @patch("app.repositories.message_repo.supports_fulltext", return_value=False)
+    @patch("app.repositories.message_repo.Message")
+    async def test_search_messages_without_fulltext_support(self, mock_message_class, _):
         #Given
         repo = MessageRepository()
 
         mock_query = MagicMock()
         mock_message_class.filter.return_value = mock_query
+        mock_query.using_db.return_value = mock_query
         mock_query.limit.return_value = mock_query
-        mock_query.all = AsyncMock(return_value=["found1", "found2"])
+        mock_query.values = AsyncMock(return_value=[{"message_id": "found1"}, {"message_id": "found2"}])
 
         #When
-        mock_message_class.filter.return_value.limit.return_value.all = AsyncMock(return_value=["found1", "found2"])
-
         result = await repo.search_messages("hola", limit=5)
 
         #Then
         mock_message_class.filter.assert_called_once_with(content__icontains="hola")
-        mock_message_class.filter.return_value.limit.assert_called_once_with(5)
-        mock_message_class.filter.return_value.limit.return_value.all.assert_awaited_once()
-        assert result == ["found1", "found2"]
\ No newline at end of file
+        mock_query.limit.assert_called_once_with(5)
+        mock_query.values.assert_awaited_once()
+        assert result == [{"message_id": "found1"}, {"message_id": "found2"}]
+
+    @patch("app.repositories.message_repo.in_transaction")
+    @patch("app.repositories.message_repo.Message")
+    async def test_save_messages_bulk_creates_in_transaction(self, mock_message_class, mock_in_transaction):
+        stats = AsyncMock()
+        stats.record.return_value = {"s1": 4}
+        repo = MessageRepository(session_stats=stats)
+        items = [{"message_id": "msg1", "session_id": "s1"}, {"message_id": "msg2", "session_id": "s1"}]
+        connection = MagicMock()
+        mock_in_transaction.return_value.__aenter__ = AsyncMock(return_value=connection)
+        mock_in_transaction.return_value.__aexit__ = AsyncMock(return_value=False)
+        mock_message_class.bulk_create = AsyncMock()
+
+        result = await repo.save_messages(items)
+
+        mock_message_class.bulk_create.assert_awaited_once()
+        assert mock_message_class.bulk_create.await_args.kwargs["using_db"] is connection
+        stats.record.assert_awaited_once_with(items, connection)
+        assert [call.kwargs["seq"] for call in mock_message_class.call_args_list] == [4, 5]
+        assert len(result) == 2
+
+    @patch("app.repositories.message_repo.in_transaction")
+    @patch("app.repositories.message_repo.Message")
+    async def test_save_messages_exception(self, mock_message_class, mock_in_transaction):
+        repo = MessageRepository(session_stats=AsyncMock())
+        mock_in_transaction.return_value.__aenter__ = AsyncMock(return_value=MagicMock())
+        mock_in_transaction.return_value.__aexit__ = AsyncMock(return_value=False)
+        mock_message_class.bulk_create = AsyncMock(side_effect=Exception("UNIQUE constraint failed"))
+
+        with pytest.raises(ValueError, match="Error saving messages"):
+            await repo.save_messages([{"message_id": "msg1"}])
+
+    @patch("app.repositories.message_repo._reader")
+    @patch("app.repositories.message_repo.Message", autospec=True)
+    async def test_get_existing_ids(self, mock_message_class, _):
+        repo = MessageRepository()
+        mock_message_class.filter.return_value.using_db.return_value.values_list = AsyncMock(return_value=["msg1"])
+
+        result = await repo.get_existing_ids(["msg1", "msg2"])
+
+        mock_message_class.filter.assert_called_once_with(message_id__in=["msg1", "msg2"])
+        assert result == {"msg1"}
+
+    @patch("app.repositories.message_repo.in_transaction")
+    @patch("app.repositories.message_repo.Message", autospec=True)
+    async def test_save_message_compresses_large_content(self, mock_message_class, mock_in_transaction):
+        stats = AsyncMock()
+        stats.record.return_value = {"s1": 1}
+        repo = MessageRepository(compression_threshold=100, session_stats=stats)
+        mock_in_transaction.return_value.__aenter__ = AsyncMock(return_value=MagicMock())
+        mock_in_transaction.return_value.__aexit__ = AsyncMock(return_value=False)
+        content = "transcripción " * 100
+        fake_data = {"message_id": "msg1", "session_id": "s1", "content": content}
+        mock_message_class.create = AsyncMock(return_value=MagicMock())
+
+        result = await repo.save_message(fake_data)
+
+        stored = mock_message_class.create.await_args.kwargs
+        assert stored["content"] == ""
+        assert decompress_content(stored["content_zlib"]) == content
+        assert result.content == content
+        assert fake_data == {"message_id": "msg1", "session_id": "s1", "content": content, "seq": 1}
@@ -0,0 +1,137 @@
+import pytest
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from tortoise import Tortoise
+from app.db.fulltext import build_match_query, setup_fulltext_index
+from app.models.message import Message
+from app.repositories.message_repo import MessageRepository
+
+
+@asynccontextmanager
+async def seeded_repository():
+    await Tortoise.init(db_url="sqlite://:memory:", modules={"models": ["app.models.message"]})
+    await Tortoise.generate_schemas()
+    await setup_fulltext_index()
+
+    repository = MessageRepository()
+    now = datetime.now(timezone.utc)
+    rows = [
+        ("m1", "s1", "user", "Buenos días, ¿cómo estás?"),
+        ("m2", "s1", "system", "Hola mundo, hola de nuevo"),
+        ("m3", "s2", "user", "El mundo es grande"),
+        ("m4", "s2", "user", "mundial de fútbol"),
+        ("m5", "s2", "system", "días buenos"),
+    ]
+    await repository.save_messages([
+        {
+            "message_id": message_id,
+            "session_id": session_id,
+            "sender": sender,
+            "content": content,
+            "timestamp": now,
+        }
+        for message_id, session_id, sender, content in rows
+    ])
+    try:
+        yield repository
+    finally:
+        await Tortoise.close_connections()
+
+
+class TestBuildMatchQuery:
+    def test_quotes_terms_and_keeps_phrases_and_prefixes(self):
+        assert build_match_query('"buenos dias" mund*') == '"buenos dias" "mund"*'
+
+    def test_escapes_fts_syntax(self):
+        assert build_match_query('hola OR NEAR( "x"y') == '"hola" "OR" "NEAR(" "x" "y"'
+
+    def test_empty_query(self):
+        assert build_match_query(' "" * ') is None
+
+
+@pytest.mark.asyncio
+class TestFulltextSearch:
+    async def test_ranks_matches(self):
+        async with seeded_repository() as repo:
+            result = await repo.search_messages("hola")
+
+            assert [m["message_id"] for m in result] == ["m2"]
+
+    async def test_ignores_accents_and_case(self):
+        async with seeded_repository() as repo:
+            result = await repo.search_messages("DIAS")
+
+            assert {m["message_id"] for m in result} == {"m1", "m5"}
+
+    async def test_phrase_query(self):
+        async with seeded_repository() as repo:
+            result = await repo.search_messages('"buenos dias"')
+
+            assert [m["message_id"] for m in result] == ["m1"]
+
+    async def test_prefix_query(self):
+        async with seeded_repository() as repo:
+            result = await repo.search_messages("mund*")
+
+            assert {m["message_id"] for m in result} == {"m2", "m3", "m4"}
+
+    async def test_filters_by_session_and_sender(self):
+        async with seeded_repository() as repo:
+            result = await repo.search_messages("mund*", session_id="s2", sender="user")
+
+            assert {m["message_id"] for m in result} == {"m3", "m4"}
+
+    async def test_index_follows_deletes(self):
+        async with seeded_repository() as repo:
+            await Message.filter(message_id="m3").delete()
+
+            result = await repo.search_messages("mundo")
+
+            assert [m["message_id"] for m in result] == ["m2"]
+
+
+@pytest.mark.asyncio
+async def test_get_message_and_recent_ids():
+    async with seeded_repository() as repository:
+        # When
+        stored = await repository.get_message("m2")
+        missing = await repository.get_message("missing")
+        chunks = [chunk async for chunk in repository.iter_recent_message_ids(limit=3, chunk_size=2)]
+
+        # Then
+        assert stored["content"] == "Hola mundo, hola de nuevo"
+        assert missing is None
+        assert chunks == [["m5", "m4"], ["m3"]]
+
+
+@pytest.mark.asyncio
+async def test_compressed_contents_are_indexed_and_read_as_text():
+    async with seeded_repository() as repository:
+        # Given
+        compressing = MessageRepository(compression_threshold=100)
+        transcript = "transcripción de la llamada con el cliente " * 20
+        await compressing.save_messages([{
+            "message_id": "m6",
+            "session_id": "s3",
+            "sender": "system",
+            "content": transcript,
+            "timestamp": datetime.now(timezone.utc),
+            "word_count": 140,
+            "character_count": len(transcript),
+        }])
+
+        # When
+        found = await repository.search_messages("llamada")
+        page = await repository.get_messages_by_session("s3")
+        stored = await Message.get(message_id="m6")
+
+        # Then
+        assert [m["message_id"] for m in found] == ["m6"]
+        assert found[0]["content"] == transcript
+        assert page[0]["content"] == transcript
+        assert "content_zlib" not in page[0]
+        assert stored.content == "" and stored.content_zlib is not None
+        assert stored.character_count == len(transcript)
+
+        await Message.filter(message_id="m6").delete()
+        assert await repository.search_messages("llamada") == []
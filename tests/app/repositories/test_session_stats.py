@@ -0,0 +1,202 @@
+import asyncio
+import multiprocessing
+import pytest
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, patch
+from tortoise import Tortoise
+from tortoise.exceptions import IntegrityError
+from app.db.database import build_tortoise_config
+from app.models.message import Message
+from app.repositories.message_repo import DuplicateMessageError, MessageRepository
+
+pytestmark = pytest.mark.asyncio
+
+
+def _message(message_id: str, day: int, sender: str = "user", session_id: str = "s1") -> dict:
+    return {
+        "message_id": message_id,
+        "session_id": session_id,
+        "content": "hola mundo",
+        "timestamp": datetime(2025, 1, day, tzinfo=timezone.utc),
+        "sender": sender,
+        "word_count": 2,
+        "character_count": 10,
+    }
+
+
+async def test_stats_follow_single_and_batch_writes():
+    await Tortoise.init(db_url="sqlite://:memory:", modules={"models": ["app.models.message"]})
+    await Tortoise.generate_schemas()
+    try:
+        repository = MessageRepository()
+
+        # When
+        await repository.save_message(_message("m1", 5))
+        await repository.save_messages([
+            _message("m2", 3, sender="system"),
+            # Naive timestamps are stored as UTC
+            {**_message("m3", 9), "timestamp": datetime(2025, 1, 9)},
+            _message("x1", 1, session_id="s2"),
+        ])
+        with pytest.raises(DuplicateMessageError):
+            await repository.save_message(_message("m1", 1))
+
+        # Then
+        stats = await repository.get_session_stats("s1")
+        assert {key: stats[key] for key in ("message_count", "user_count", "system_count")} == {
+            "message_count": 3, "user_count": 2, "system_count": 1,
+        }
+        assert (stats["word_count"], stats["character_count"]) == (6, 30)
+        assert stats["first_activity"] == datetime(2025, 1, 3, tzinfo=timezone.utc)
+        assert stats["last_activity"] == datetime(2025, 1, 9, tzinfo=timezone.utc)
+        assert (await repository.get_session_stats("s2"))["message_count"] == 1
+        assert await repository.get_session_stats("missing") is None
+    finally:
+        await Tortoise.close_connections()
+
+
+async def test_failed_batch_does_not_change_stats():
+    await Tortoise.init(db_url="sqlite://:memory:", modules={"models": ["app.models.message"]})
+    await Tortoise.generate_schemas()
+    try:
+        repository = MessageRepository()
+        await repository.save_message(_message("m1", 1))
+
+        with pytest.raises(ValueError):
+            await repository.save_messages([_message("m2", 2), _message("m1", 3)])
+
+        stats = await repository.get_session_stats("s1")
+        assert stats["message_count"] == 1
+        assert stats["last_activity"] == datetime(2025, 1, 1, tzinfo=timezone.utc)
+    finally:
+        await Tortoise.close_connections()
+
+
+async def test_only_message_id_conflicts_are_duplicates():
+    await Tortoise.init(db_url="sqlite://:memory:", modules={"models": ["app.models.message"]})
+    await Tortoise.generate_schemas()
+    try:
+        stats = AsyncMock()
+        stats.record.side_effect = IntegrityError("UNIQUE constraint failed: session_stats.session_id")
+        repository = MessageRepository(session_stats=stats)
+
+        with pytest.raises(ValueError) as error:
+            await repository.save_message(_message("m1", 1))
+
+        assert not isinstance(error.value, DuplicateMessageError)
+    finally:
+        await Tortoise.close_connections()
+
+
+async def test_stats_of_many_sessions_are_upserted_in_one_batch():
+    await Tortoise.init(db_url="sqlite://:memory:", modules={"models": ["app.models.message"]})
+    await Tortoise.generate_schemas()
+    try:
+        repository = MessageRepository()
+        await repository.save_messages([_message(f"a{i}", 2, session_id=f"s{i}") for i in range(3)])
+        await repository.save_messages([_message(f"b{i}", 1, session_id=f"s{i}") for i in range(3)])
+
+        for i in range(3):
+            stats = await repository.get_session_stats(f"s{i}")
+            assert stats["message_count"] == 2
+            assert stats["first_activity"] == datetime(2025, 1, 1, tzinfo=timezone.utc)
+            assert stats["last_activity"] == datetime(2025, 1, 2, tzinfo=timezone.utc)
+    finally:
+        await Tortoise.close_connections()
+
+
+async def test_seqs_continue_from_stored_messages_and_survive_rebuild():
+    await Tortoise.init(db_url="sqlite://:memory:", modules={"models": ["app.models.message"]})
+    await Tortoise.generate_schemas()
+    try:
+        repository = MessageRepository()
+        # Stored before the session had aggregates
+        await Message.create(**_message("old", 1), seq=5)
+
+        first = _message("m1", 2)
+        await repository.save_message(first)
+        batch = [_message("m2", 3), _message("x1", 3, session_id="s2"), _message("m3", 4)]
+        await repository.save_messages(batch)
+        await repository.session_stats.rebuild()
+        await Message.filter(message_id="m3").delete()
+        await repository.session_stats.rebuild()
+        last = _message("m4", 5)
+        await repository.save_message(last)
+
+        assert first["seq"] == 6
+        assert [data["seq"] for data in batch] == [7, 1, 8]
+        assert last["seq"] == 9
+        with pytest.raises(IntegrityError):
+            await Message.create(**_message("dup", 6), seq=9)
+    finally:
+        await Tortoise.close_connections()
+
+
+@pytest.mark.parametrize("upsert", [True, False], ids=["upsert", "row-lock"])
+async def test_one_batch_allocates_seqs_for_each_of_its_sessions(upsert):
+    await Tortoise.init(db_url="sqlite://:memory:", modules={"models": ["app.models.message"]})
+    await Tortoise.generate_schemas()
+    try:
+        repository = MessageRepository()
+        with patch("app.repositories.session_stats_repo.supports_upsert", return_value=upsert):
+            # Stored before the session had aggregates
+            await Message.create(**_message("old", 1, session_id="s2"), seq=3)
+            first = [_message("a1", 2), _message("b1", 2, session_id="s2"), _message("a2", 3)]
+            await repository.save_messages(first)
+            with pytest.raises(ValueError):
+                await repository.save_messages([_message("a3", 4), _message("a1", 4)])
+            second = [_message("b2", 1, session_id="s2"), _message("a3", 5)]
+            await repository.save_messages(second)
+
+            s1 = await repository.get_session_stats("s1")
+            s2 = await repository.get_session_stats("s2")
+
+        assert [data["seq"] for data in first] == [1, 4, 2]
+        assert [data["seq"] for data in second] == [5, 3]
+        stored = await Message.all().order_by("session_id", "seq").values_list("session_id", "seq")
+        assert stored == [("s1", 1), ("s1", 2), ("s1", 3), ("s2", 3), ("s2", 4), ("s2", 5)]
+        assert (s1["message_count"], s1["last_activity"]) == (3, datetime(2025, 1, 5, tzinfo=timezone.utc))
+        assert (s2["message_count"], s2["first_activity"]) == (2, datetime(2025, 1, 1, tzinfo=timezone.utc))
+    finally:
+        await Tortoise.close_connections()
+
+
+async def _store_from_worker(db_url: str, worker: int, rounds: int) -> None:
+    await Tortoise.init(config=build_tortoise_config(db_url))
+    try:
+        repository = MessageRepository()
+        for i in range(rounds):
+            await repository.save_message(_message(f"w{worker}-{i}", 1))
+            await repository.save_messages([_message(f"w{worker}-{i}-{j}", 1) for j in range(3)])
+    finally:
+        await Tortoise.close_connections()
+
+
+def _worker(db_url: str, worker: int, rounds: int) -> None:
+    asyncio.run(_store_from_worker(db_url, worker, rounds))
+
+
+async def test_two_workers_on_one_database_never_share_a_seq(tmp_path):
+    # Given
+    db_url = f"sqlite://{tmp_path / 'chat.sqlite3'}"
+    await Tortoise.init(config=build_tortoise_config(db_url))
+    await Tortoise.generate_schemas()
+    await Tortoise.close_connections()
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=_worker, args=(db_url, worker, 25)) for worker in range(2)]
+
+    # When
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join(60)
+
+    # Then
+    assert [process.exitcode for process in workers] == [0, 0]
+    await Tortoise.init(config=build_tortoise_config(db_url))
+    try:
+        seqs = await Message.filter(session_id="s1").order_by("seq").values_list("seq", flat=True)
+        assert seqs == list(range(1, 201))
+        assert (await MessageRepository().get_session_stats("s1"))["message_count"] == 200
+    finally:
+        await Tortoise.close_connections()
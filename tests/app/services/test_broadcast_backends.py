@@ -0,0 +1,45 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from app.services.broadcaster import Broadcaster
+from app.services.broadcast_backends import MemoryBroadcastBackend, RedisBroadcastBackend
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_memory_backend_delivers_to_attached_handler():
+    backend = MemoryBroadcastBackend()
+    handler = MagicMock()
+    backend.attach(handler)
+
+    await backend.publish("s1", '{"event":"new_message"}')
+
+    handler.assert_called_once_with("s1", '{"event":"new_message"}')
+
+
+async def test_redis_backend_fans_out_across_workers():
+    # Given
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    worker_a = Broadcaster(backend=RedisBroadcastBackend(
+        "redis://fake", client=fakeredis.FakeAsyncRedis(server=server)
+    ))
+    worker_b = Broadcaster(backend=RedisBroadcastBackend(
+        "redis://fake", client=fakeredis.FakeAsyncRedis(server=server)
+    ))
+    await worker_a.start()
+    await worker_b.start()
+    websocket = AsyncMock()
+    worker_b.connect("s1", websocket)
+
+    # When
+    await worker_a.publish("s1", {"event": "new_message"})
+    for _ in range(50):
+        if websocket.send_text.await_count:
+            break
+        await asyncio.sleep(0.01)
+
+    # Then
+    websocket.send_text.assert_awaited_once_with('{"event":"new_message"}')
+    await worker_a.close()
+    await worker_b.close()
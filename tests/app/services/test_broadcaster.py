@@ -0,0 +1,211 @@
+import asyncio
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from app.services.broadcaster import (
+    IDLE_CLOSE_CODE,
+    PING_EVENT,
+    SLOW_CONSUMER_CLOSE_CODE,
+    Broadcaster,
+    ReplayBuffer,
+    is_pong,
+)
+from app.services.connections import ConnectionLimitExceeded, ConnectionRegistry
+
+pytestmark = pytest.mark.asyncio
+
+
+class BlockedWebSocket:
+    """WebSocket double whose sends never complete, like a stalled client."""
+
+    def __init__(self):
+        self.close = AsyncMock()
+
+    async def send_text(self, text):
+        await asyncio.Event().wait()
+
+
+async def test_publish_encodes_once_and_delivers_to_every_subscriber():
+    # Given
+    broadcaster = Broadcaster()
+    first, second = AsyncMock(), AsyncMock()
+    broadcaster.connect("s1", first)
+    broadcaster.connect("s1", second)
+
+    # When
+    await broadcaster.publish("s1", {"event": "new_message", "data": {"id": 1}})
+    await asyncio.sleep(0)
+
+    # Then
+    first.send_text.assert_awaited_once()
+    sent = first.send_text.await_args.args[0]
+    assert sent is second.send_text.await_args.args[0]
+    assert json.loads(sent) == {"event": "new_message", "data": {"id": 1}}
+    await broadcaster.close()
+
+
+async def test_publish_without_subscribers():
+    broadcaster = Broadcaster()
+
+    assert broadcaster.deliver("missing", '{"event":"new_message"}') == 0
+
+
+async def test_slow_consumer_does_not_block_others_and_drops_oldest():
+    # Given
+    broadcaster = Broadcaster(queue_size=2, policy="drop_oldest")
+    slow = broadcaster.connect("s1", BlockedWebSocket())
+    fast = AsyncMock()
+    broadcaster.connect("s1", fast)
+    await asyncio.sleep(0)
+
+    # When
+    for i in range(5):
+        await broadcaster.publish("s1", {"n": i})
+        await asyncio.sleep(0)
+
+    # Then
+    assert fast.send_text.await_count == 5
+    assert slow.dropped > 0
+    assert [json.loads(t)["n"] for t in slow.queue._queue] == [3, 4]
+    await broadcaster.close()
+
+
+async def test_slow_consumer_disconnect_policy():
+    # Given
+    broadcaster = Broadcaster(queue_size=1, policy="disconnect")
+    websocket = BlockedWebSocket()
+    broadcaster.connect("s1", websocket)
+    await asyncio.sleep(0)
+
+    # When
+    await broadcaster.publish("s1", {"n": 1})
+    await asyncio.sleep(0)
+    await broadcaster.publish("s1", {"n": 2})
+    await broadcaster.publish("s1", {"n": 3})
+    await asyncio.sleep(0)
+
+    # Then
+    assert "s1" not in broadcaster.connections
+    websocket.close.assert_awaited_once_with(code=SLOW_CONSUMER_CLOSE_CODE)
+    await broadcaster.close()
+
+
+async def test_dead_socket_is_removed():
+    # Given
+    broadcaster = Broadcaster()
+    websocket = MagicMock()
+    websocket.send_text = AsyncMock(side_effect=RuntimeError("socket closed"))
+    broadcaster.connect("s1", websocket)
+
+    # When
+    await broadcaster.publish("s1", {"event": "new_message"})
+    await asyncio.sleep(0)
+
+    # Then
+    assert "s1" not in broadcaster.connections
+
+
+async def test_sequenced_events_are_buffered_and_replayed_on_resume():
+    # Given
+    broadcaster = Broadcaster(replay=ReplayBuffer(size=3))
+    for seq in range(1, 6):
+        await broadcaster.publish("s1", {"event": "new_message", "data": {"n": seq}}, seq=seq)
+
+    # When
+    websocket = AsyncMock()
+    subscriber = broadcaster.connect("s1", websocket, hold=True)
+    missed = broadcaster.replay.since("s1", 3)
+    await broadcaster.publish("s1", {"event": "new_message", "data": {"n": 6}}, seq=6)
+    await broadcaster.resume(subscriber, missed)
+    await asyncio.sleep(0)
+
+    # Then
+    sent = [json.loads(call.args[0]) for call in websocket.send_text.await_args_list]
+    assert [event["seq"] for event in sent] == [4, 5, 6]
+    assert broadcaster.replay.since("s1", 1) is None
+    assert broadcaster.replay.since("s1", 6) == []
+    await broadcaster.close()
+
+
+async def test_resume_skips_held_events_already_replayed():
+    broadcaster = Broadcaster()
+    websocket = AsyncMock()
+    subscriber = broadcaster.connect("s1", websocket, hold=True)
+    await broadcaster.publish("s1", {"event": "new_message"}, seq=8)
+
+    await broadcaster.resume(subscriber, [(7, '{"seq":7}'), (8, '{"seq":8}')])
+    await asyncio.sleep(0)
+
+    assert [call.args[0] for call in websocket.send_text.await_args_list] == ['{"seq":7}', '{"seq":8}']
+    await broadcaster.close()
+
+
+async def test_replay_buffer_keeps_most_recent_sessions():
+    replay = ReplayBuffer(size=2, max_sessions=2)
+    replay.append("s1", 1, "a")
+    replay.append("s2", 1, "b")
+    replay.append("s1", 2, "c")
+    replay.append("s3", 1, "d")
+
+    assert replay.since("s2", 0) is None
+    assert replay.since("s1", 1) == [(2, "c")]
+    assert len(replay) == 3
+
+
+async def test_sweep_pings_silent_connections_and_closes_idle_ones():
+    # Given
+    broadcaster = Broadcaster(heartbeat_interval=20, idle_timeout=60)
+    active, silent, idle = AsyncMock(), AsyncMock(), AsyncMock()
+    broadcaster.connect("s1", active)
+    broadcaster.connect("s1", silent).last_seen -= 30
+    reaped = broadcaster.connect("s2", idle)
+    reaped.last_seen -= 90
+    reaped.stop = MagicMock()
+
+    # When
+    closed = await broadcaster.sweep()
+    await asyncio.sleep(0)
+
+    # Then
+    assert closed == 1
+    assert "s2" not in broadcaster.connections
+    assert len(broadcaster.registry) == 2
+    reaped.stop.assert_called_once()
+    idle.close.assert_awaited_once_with(code=IDLE_CLOSE_CODE)
+    silent.send_text.assert_awaited_once_with(PING_EVENT)
+    active.send_text.assert_not_awaited()
+    await broadcaster.close()
+
+
+async def test_idle_reaping_is_opt_in():
+    listen_only = Broadcaster()
+    reaping = Broadcaster(heartbeat_interval=20, idle_timeout=60)
+
+    await listen_only.start()
+    await reaping.start()
+
+    assert listen_only._heartbeat_task is None
+    assert reaping._heartbeat_task is not None
+    await listen_only.close()
+    await reaping.close()
+
+
+async def test_connect_enforces_connection_caps():
+    broadcaster = Broadcaster(registry=ConnectionRegistry(max_connections=3, max_per_session=2))
+    broadcaster.connect("s1", AsyncMock())
+    broadcaster.connect("s1", AsyncMock())
+
+    with pytest.raises(ConnectionLimitExceeded):
+        broadcaster.connect("s1", AsyncMock())
+    broadcaster.connect("s2", AsyncMock())
+    with pytest.raises(ConnectionLimitExceeded):
+        broadcaster.connect("s3", AsyncMock())
+
+    assert len(broadcaster.registry) == 3
+    await broadcaster.close()
+    assert len(broadcaster.registry) == 0
+
+
+async def test_is_pong():
+    assert is_pong('{"event": "pong"}')
+    assert not is_pong('{"event":"new_message"}')
@@ -0,0 +1,73 @@
+import pytest
+from unittest.mock import patch
+from app.services.cache import SessionPageCache, session_cache_enabled
+
+
+class TestSessionPageCache:
+    def test_hit_and_miss_counters(self):
+        cache = SessionPageCache(max_bytes=1000, ttl=60)
+
+        assert cache.get(("s1", 1)) is None
+        cache.set(("s1", 1), "page", 10, cache.snapshot())
+
+        assert cache.get(("s1", 1)) == "page"
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["bytes"] == 10
+
+    def test_evicts_least_recently_used_by_size(self):
+        cache = SessionPageCache(max_bytes=25, ttl=60)
+        cache.set(("s1", 1), "a", 10, cache.snapshot())
+        cache.set(("s2", 1), "b", 10, cache.snapshot())
+        cache.get(("s1", 1))
+
+        cache.set(("s3", 1), "c", 10, cache.snapshot())
+
+        assert cache.get(("s2", 1)) is None
+        assert cache.get(("s1", 1)) == "a"
+        assert cache.stats()["evictions"] == 1
+        assert cache.current_bytes == 20
+
+    def test_expires_entries_after_ttl(self):
+        cache = SessionPageCache(max_bytes=100, ttl=5)
+        with patch("app.services.cache.time.monotonic", return_value=100.0):
+            cache.set(("s1", 1), "page", 10, cache.snapshot())
+
+        with patch("app.services.cache.time.monotonic", return_value=106.0):
+            assert cache.get(("s1", 1)) is None
+        assert cache.current_bytes == 0
+
+    def test_invalidate_drops_every_page_of_the_session(self):
+        cache = SessionPageCache(max_bytes=100, ttl=60)
+        cache.set(("s1", 1), "a", 10, cache.snapshot())
+        cache.set(("s1", 2), "b", 10, cache.snapshot())
+        cache.set(("s2", 1), "c", 10, cache.snapshot())
+
+        cache.invalidate_sessions(["s1"])
+
+        assert cache.get(("s1", 1)) is None
+        assert cache.get(("s1", 2)) is None
+        assert cache.get(("s2", 1)) == "c"
+        assert cache.current_bytes == 10
+
+    def test_rejects_pages_read_before_an_invalidation(self):
+        cache = SessionPageCache(max_bytes=100, ttl=60)
+        snapshot = cache.snapshot()
+
+        cache.invalidate_sessions(["s1"])
+        cache.set(("s1", 1), "stale", 10, snapshot)
+        cache.set(("s2", 1), "fresh", 10, snapshot)
+
+        assert cache.get(("s1", 1)) is None
+        assert cache.get(("s2", 1)) == "fresh"
+
+
+@pytest.mark.parametrize("enabled, backend, expected", [
+    (None, "memory", True),
+    (None, "redis", False),
+    (True, "redis", True),
+    (False, "memory", False),
+])
+def test_session_cache_is_off_by_default_with_the_redis_broadcast(enabled, backend, expected):
+    assert session_cache_enabled(enabled, backend) is expected
@@ -0,0 +1,57 @@
+import pytest
+from unittest.mock import MagicMock
+from app.services.connections import ConnectionLimitExceeded, ConnectionRegistry, Subscriber
+
+pytestmark = pytest.mark.asyncio
+
+
+def _subscriber(session_id: str) -> Subscriber:
+    return Subscriber(session_id, MagicMock(), queue_size=4)
+
+
+async def test_add_and_remove_track_counts_per_session():
+    registry = ConnectionRegistry()
+    first, second = _subscriber("s1"), _subscriber("s1")
+    registry.add(first)
+    registry.add(second)
+    registry.add(_subscriber("s2"))
+
+    assert registry.remove(first)
+    assert not registry.remove(first)
+
+    assert len(registry) == 2
+    assert registry.sessions["s1"] == {second}
+    registry.remove(second)
+    assert "s1" not in registry.sessions
+
+
+async def test_caps_are_enforced():
+    registry = ConnectionRegistry(max_connections=2, max_per_session=1)
+    registry.add(_subscriber("s1"))
+
+    with pytest.raises(ConnectionLimitExceeded) as session_cap:
+        registry.add(_subscriber("s1"))
+    registry.add(_subscriber("s2"))
+    with pytest.raises(ConnectionLimitExceeded) as global_cap:
+        registry.add(_subscriber("s3"))
+
+    assert session_cap.value.scope == "session"
+    assert global_cap.value.scope == "global"
+    assert len(registry) == 2
+
+
+async def test_stats_report_memory_per_connection():
+    registry = ConnectionRegistry()
+    assert registry.stats()["bytes"] == 0
+
+    for i in range(3):
+        registry.add(_subscriber(f"s{i}"))
+    empty = registry.memory_per_connection()
+    next(iter(registry)).queue.put_nowait("x" * 1000)
+
+    stats = registry.stats()
+    assert stats["connections"] == 3
+    assert stats["sessions"] == 3
+    assert empty > 0
+    assert stats["bytes_per_connection"] > empty
+    assert stats["bytes"] == stats["bytes_per_connection"] * 3
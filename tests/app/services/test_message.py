@@ -1,8 +1,13 @@
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 from datetime import datetime
+from tortoise import Tortoise
+from app.models.message import Message
+from app.schemas.enums import BatchItemStatus
 from app.services.message import MessageService
 from app.schemas.message import MessageIn, MessageOut, Metadata
+from app.repositories.message_repo import DuplicateMessageError, MessageRepository
+from app.utils.bloom import RotatingBloomFilter
 
 
 @pytest.fixture
@@ -26,6 +31,24 @@ def example_payload():
     )
 
 
+@pytest.mark.asyncio
+async def test_publish_failure_does_not_fail_stored_message(service, example_payload):
+    # Given
+    service.repository.save_message.return_value = example_payload
+    service.repository.get_existing_ids.return_value = set()
+
+    # When
+    with patch("app.services.message.broadcaster", new_callable=AsyncMock) as mock_broadcaster:
+        mock_broadcaster.publish.side_effect = ConnectionError("redis is down")
+        result = await service.process_and_store_message(example_payload)
+        batch = await service.process_and_store_batch([example_payload.model_copy(update={"message_id": "msg2"})])
+
+    # Then
+    assert result.message_id == "msg1"
+    assert batch[0]["status"] == "stored"
+    assert mock_broadcaster.publish.await_count == 2
+
+
 @pytest.mark.asyncio
 async def test_process_and_store_message_success(service, example_payload):
     # Given
@@ -42,8 +65,7 @@ async def test_process_and_store_message_success(service, example_payload):
     service.repository.save_message.return_value = fake_saved
 
     # When
-    with patch("app.services.message.active_connections", {}):
-       
+    with patch("app.services.message.broadcaster", new_callable=AsyncMock) as mock_broadcaster:
         result = await service.process_and_store_message(example_payload)
 
     # Then
@@ -55,6 +77,9 @@ async def test_process_and_store_message_success(service, example_payload):
     assert isinstance(result.metadata, Metadata)
     assert result.metadata.word_count == 2
     assert result.metadata.character_count == 11
+    event = mock_broadcaster.publish.call_args.args[1]
+    assert event["event"] == "new_message"
+    assert event["data"]["message_id"] == "msg123"
 
 
 @pytest.mark.asyncio
@@ -62,7 +87,8 @@ async def test_process_and_store_message_with_prohibited_words(service, example_
     # Given
     example_payload.content = "forbidden_word"
     # When and Then
-    with patch("app.services.message.contains_prohibited_words", return_value=True):
+    analysis = {"prohibited": True, "metadata": {}}
+    with patch("app.services.message.analyze_content", return_value=analysis):
         with pytest.raises(ValueError, match="Message contains inappropriate language"):
             await service.process_and_store_message(example_payload)
 
@@ -70,40 +96,60 @@ async def test_process_and_store_message_with_prohibited_words(service, example_
 @pytest.mark.asyncio
 async def test_get_messages(service):
     # Given
-    fake_msg = MagicMock()
-    fake_msg.message_id = "msg1"
-    fake_msg.session_id = "abc123"
-    fake_msg.content = "Hola de nuevo"
-    fake_msg.timestamp = datetime.now()
-    fake_msg.sender = "user"
-    fake_msg.word_count = 3
-    fake_msg.character_count = 13
-    fake_msg.processed_at = datetime.now()
+    fake_msg = {
+        "message_id": "msg1",
+        "session_id": "abc123",
+        "content": "Hola de nuevo",
+        "timestamp": datetime.now(),
+        "sender": "user",
+        "word_count": 3,
+        "character_count": 13,
+        "processed_at": datetime.now(),
+    }
 
     service.repository.get_messages_by_session.return_value = [fake_msg]
 
     # When
-    result = await service.get_messages(session_id="abc123")
+    page = await service.get_messages(session_id="abc123")
 
     # Then
+    result = page["data"]
     assert len(result) == 1
-    assert isinstance(result[0], MessageOut)
-    assert result[0].session_id == "abc123"
-    assert result[0].metadata.word_count == 3
+    MessageOut.model_validate(result[0])
+    assert result[0]["session_id"] == "abc123"
+    assert result[0]["metadata"]["word_count"] == 3
+    assert page["next_cursor"] is None
+    assert page["prev_cursor"] is None
+    service.repository.get_messages_by_session.assert_awaited_once_with(
+        "abc123", 11, 0, None, None, None
+    )
+
+
+@pytest.mark.asyncio
+async def test_get_messages_rejects_both_cursors(service):
+    with pytest.raises(ValueError):
+        await service.get_messages(session_id="abc123", after="a", before="b")
+
+
+@pytest.mark.asyncio
+async def test_get_messages_rejects_invalid_cursor(service):
+    with pytest.raises(ValueError, match="Invalid pagination cursor"):
+        await service.get_messages(session_id="abc123", after="not-a-cursor")
 
 
 @pytest.mark.asyncio
 async def test_search_messages(service):
     # Given
-    fake_msg = MagicMock()
-    fake_msg.message_id = "msg1"
-    fake_msg.session_id = "abc123"
-    fake_msg.content = "Buscando esto"
-    fake_msg.timestamp = datetime.now()
-    fake_msg.sender = "user"  
-    fake_msg.word_count = 2
-    fake_msg.character_count = 14
-    fake_msg.processed_at = datetime.now()
+    fake_msg = {
+        "message_id": "msg1",
+        "session_id": "abc123",
+        "content": "Buscando esto",
+        "timestamp": datetime.now(),
+        "sender": "user",
+        "word_count": 2,
+        "character_count": 14,
+        "processed_at": datetime.now(),
+    }
 
     service.repository.search_messages.return_value = [fake_msg]
 
@@ -112,7 +158,301 @@ async def test_search_messages(service):
 
     # Then
     assert len(result) == 1
-    assert isinstance(result[0], MessageOut)
-    assert result[0].sender == "user"
-    assert result[0].metadata.word_count == 2
-    assert result[0].metadata.character_count == 14
\ No newline at end of file
+    MessageOut.model_validate(result[0])
+    assert result[0]["sender"] == "user"
+    assert result[0]["metadata"]["word_count"] == 2
+    assert result[0]["metadata"]["character_count"] == 14
+
+@pytest.mark.asyncio
+async def test_process_and_store_batch_classifies_items(service):
+    # Given
+    now = datetime.now()
+    payloads = [
+        MessageIn(message_id="new1", session_id="s1", content="hola", sender="user", timestamp=now),
+        MessageIn(message_id="old1", session_id="s1", content="hola", sender="user", timestamp=now),
+        MessageIn(message_id="new1", session_id="s1", content="otra", sender="user", timestamp=now),
+        MessageIn(message_id="bad1", session_id="s2", content="eres idiota", sender="user", timestamp=now),
+        MessageIn(message_id="new2", session_id="s2", content="adios", sender="system", timestamp=now),
+    ]
+    service.repository.get_existing_ids.return_value = {"old1"}
+    # When
+    with patch("app.services.message.broadcaster", new_callable=AsyncMock) as mock_broadcaster:
+        results = await service.process_and_store_batch(payloads)
+
+    # Then
+    assert [r["status"] for r in results] == [
+        "stored", "duplicate", "duplicate", "rejected", "stored"
+    ]
+    saved = service.repository.save_messages.await_args.args[0]
+    assert [item["message_id"] for item in saved] == ["new1", "new2"]
+    assert saved[0]["word_count"] == 1
+    assert mock_broadcaster.publish.call_count == 2
+    sessions = [call.args[0] for call in mock_broadcaster.publish.call_args_list]
+    events = [call.args[1] for call in mock_broadcaster.publish.call_args_list]
+    assert sessions == ["s1", "s2"]
+    assert all(event["event"] == "new_messages" for event in events)
+
+
+@pytest.mark.asyncio
+async def test_process_and_store_batch_without_accepted_items(service):
+    # Given
+    payload = MessageIn(
+        message_id="old1", session_id="s1", content="hola", sender="user", timestamp=datetime.now()
+    )
+    service.repository.get_existing_ids.return_value = {"old1"}
+
+    # When
+    results = await service.process_and_store_batch([payload])
+
+    # Then
+    assert results[0]["status"] == "duplicate"
+    service.repository.save_messages.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_process_and_store_message_with_write_behind(fake_repository, example_payload):
+    # Given
+    writer = MagicMock()
+    writer.running = True
+    writer.submit = AsyncMock()
+    service = MessageService(fake_repository, writer)
+
+    # When
+    with patch("app.services.message.broadcaster", new_callable=AsyncMock):
+        result = await service.process_and_store_message(example_payload)
+
+    # Then
+    writer.submit.assert_awaited_once()
+    fake_repository.save_message.assert_not_awaited()
+    assert result.message_id == example_payload.message_id
+    assert result.metadata.word_count == 2
+
+
+@pytest.mark.asyncio
+async def test_get_messages_uses_cache_until_session_is_written(fake_repository, example_payload):
+    # Given
+    from app.services.cache import SessionPageCache
+    service = MessageService(fake_repository, cache=SessionPageCache(max_bytes=10_000, ttl=60))
+    fake_repository.get_messages_by_session.return_value = []
+    fake_repository.save_message.return_value = example_payload
+
+    # When
+    first = await service.get_messages(session_id="abc123")
+    second = await service.get_messages(session_id="abc123")
+    with patch("app.services.message.broadcaster", new_callable=AsyncMock):
+        await service.process_and_store_message(example_payload)
+    await service.get_messages(session_id="abc123")
+
+    # Then
+    assert first is second
+    assert fake_repository.get_messages_by_session.await_count == 2
+    stats = service.cache_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+
+
+def _chunks(*chunks):
+    async def iterate(*args, **kwargs):
+        for chunk in chunks:
+            yield chunk
+    return iterate
+
+
+@pytest.mark.asyncio
+async def test_export_messages_as_ndjson(service):
+    # Given
+    row = {
+        "message_id": "msg1",
+        "session_id": "abc123",
+        "content": "hola",
+        "timestamp": datetime(2025, 1, 1),
+        "sender": "user",
+        "word_count": 1,
+        "character_count": 4,
+        "processed_at": datetime(2025, 1, 1),
+    }
+    service.repository.iter_messages = _chunks([row, {**row, "message_id": "msg2"}], [row])
+
+    # When
+    chunks = [chunk async for chunk in service.export_messages("ndjson", session_id="abc123")]
+
+    # Then
+    assert len(chunks) == 2
+    lines = b"".join(chunks).splitlines()
+    assert len(lines) == 3
+    MessageOut.model_validate_json(lines[0])
+
+
+@pytest.mark.asyncio
+async def test_export_messages_as_csv(service):
+    # Given
+    row = {
+        "message_id": "msg1",
+        "session_id": "abc123",
+        "content": 'hola, "mundo"',
+        "timestamp": datetime(2025, 1, 1),
+        "sender": "user",
+        "word_count": 2,
+        "character_count": 14,
+        "processed_at": None,
+    }
+    service.repository.iter_messages = _chunks([row])
+
+    # When
+    body = b"".join([chunk async for chunk in service.export_messages("csv")]).decode()
+
+    # Then
+    header, line = body.splitlines()
+    assert header.startswith("message_id,session_id,sender,timestamp,content")
+    assert line == 'msg1,abc123,user,2025-01-01T00:00:00,"hola, ""mundo""",2,14,'
+
+
+def _stored_row(payload: MessageIn) -> dict:
+    return {
+        "message_id": payload.message_id,
+        "session_id": payload.session_id,
+        "content": payload.content,
+        "timestamp": payload.timestamp,
+        "sender": payload.sender,
+        "word_count": 2,
+        "character_count": 11,
+        "processed_at": datetime.now(),
+    }
+
+
+@pytest.mark.asyncio
+async def test_process_and_store_message_returns_stored_message_for_known_duplicate(fake_repository, example_payload):
+    # Given
+    seen_ids = RotatingBloomFilter(100)
+    seen_ids.add(example_payload.message_id)
+    service = MessageService(fake_repository, seen_ids=seen_ids)
+    fake_repository.get_message.return_value = _stored_row(example_payload)
+
+    # When
+    with patch("app.services.message.analyze_content") as mock_analyze, \
+            patch("app.services.message.broadcaster", new_callable=AsyncMock) as mock_broadcaster:
+        result = await service.process_and_store_message(example_payload)
+
+    # Then
+    assert result.message_id == example_payload.message_id
+    assert result.metadata.word_count == 2
+    mock_analyze.assert_not_called()
+    fake_repository.save_message.assert_not_awaited()
+    mock_broadcaster.publish.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_process_and_store_message_skips_lookup_for_unseen_ids(fake_repository, example_payload):
+    service = MessageService(fake_repository, seen_ids=RotatingBloomFilter(100))
+    fake_repository.save_message.return_value = example_payload
+
+    with patch("app.services.message.broadcaster", new_callable=AsyncMock):
+        await service.process_and_store_message(example_payload)
+
+    fake_repository.get_message.assert_not_awaited()
+    assert example_payload.message_id in service.seen_ids
+
+
+@pytest.mark.asyncio
+async def test_process_and_store_message_resolves_insert_race_idempotently(fake_repository, example_payload):
+    # Given
+    service = MessageService(fake_repository, seen_ids=RotatingBloomFilter(100))
+    fake_repository.save_message.side_effect = DuplicateMessageError("UNIQUE constraint failed")
+    fake_repository.get_message.return_value = _stored_row(example_payload)
+
+    # When
+    with patch("app.services.message.broadcaster", new_callable=AsyncMock) as mock_broadcaster:
+        result = await service.process_and_store_message(example_payload)
+
+    # Then
+    assert result.message_id == example_payload.message_id
+    assert example_payload.message_id in service.seen_ids
+    mock_broadcaster.publish.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_warm_seen_ids_loads_recent_ids(fake_repository):
+    async def recent_ids(limit):
+        yield ["m3", "m2"]
+        yield ["m1"]
+
+    fake_repository.iter_recent_message_ids = MagicMock(side_effect=recent_ids)
+    service = MessageService(fake_repository, seen_ids=RotatingBloomFilter(100))
+
+    loaded = await service.warm_seen_ids()
+
+    assert loaded == 3
+    assert all(message_id in service.seen_ids for message_id in ("m1", "m2", "m3"))
+    fake_repository.iter_recent_message_ids.assert_called_once_with(100)
+
+
+@pytest.mark.asyncio
+async def test_process_and_store_batch_reports_sequences_allocated_by_the_repository(fake_repository):
+    # Given
+    service = MessageService(fake_repository)
+    fake_repository.get_existing_ids.return_value = set()
+
+    async def save_messages(items):
+        next_seqs = {"s1": 1, "s2": 1}
+        for item in items:
+            item["seq"] = next_seqs[item["session_id"]]
+            next_seqs[item["session_id"]] += 1
+
+    fake_repository.save_messages.side_effect = save_messages
+    now = datetime.now()
+    payloads = [
+        MessageIn(message_id="a", session_id="s1", content="hola", sender="user", timestamp=now),
+        MessageIn(message_id="b", session_id="s2", content="hola", sender="user", timestamp=now),
+        MessageIn(message_id="c", session_id="s1", content="hola", sender="user", timestamp=now),
+    ]
+
+    # When
+    with patch("app.services.message.broadcaster", new_callable=AsyncMock) as mock_broadcaster:
+        results = await service.process_and_store_batch(payloads)
+
+    # Then
+    saved = fake_repository.save_messages.await_args.args[0]
+    assert [(item["message_id"], item["seq"]) for item in saved] == [("a", 1), ("b", 1), ("c", 2)]
+    assert [r["data"].seq for r in results] == [1, 1, 2]
+    assert [call.args[2] for call in mock_broadcaster.publish.call_args_list] == [2, 1]
+
+
+@pytest.mark.asyncio
+async def test_batch_marks_ids_stored_concurrently_as_duplicates():
+    # Given a batch whose duplicate check ran on a reader that had not yet
+    # seen "b", stored meanwhile by another request
+    await Tortoise.init(db_url="sqlite://:memory:", modules={"models": ["app.models.message"]})
+    await Tortoise.generate_schemas()
+    try:
+        repository = MessageRepository()
+        service = MessageService(repository)
+        now = datetime.now()
+        await repository.save_message(
+            MessageIn(message_id="b", session_id="s1", content="antes", sender="user", timestamp=now).model_dump()
+        )
+        original = repository.get_existing_ids
+
+        async def stale_reader(message_ids, writer=False):
+            return await original(message_ids, writer) if writer else set()
+
+        payloads = [
+            MessageIn(message_id=message_id, session_id="s1", content="hola", sender="user", timestamp=now)
+            for message_id in ("a", "b", "c")
+        ]
+
+        # When
+        with patch.object(repository, "get_existing_ids", side_effect=stale_reader), \
+                patch("app.services.message.broadcaster", new_callable=AsyncMock) as mock_broadcaster:
+            results = await service.process_and_store_batch(payloads)
+
+        # Then
+        assert [r["status"] for r in results] == [
+            BatchItemStatus.stored, BatchItemStatus.duplicate, BatchItemStatus.stored,
+        ]
+        assert [r["data"].seq for r in (results[0], results[2])] == [2, 3]
+        assert await Message.filter(message_id="b").values_list("content", flat=True) == ["antes"]
+        assert await Message.all().count() == 3
+        event = mock_broadcaster.publish.call_args.args[1]
+        assert [message["message_id"] for message in event["data"]] == ["a", "c"]
+    finally:
+        await Tortoise.close_connections()
@@ -0,0 +1,97 @@
+import json
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, patch
+from tortoise import Tortoise
+from app.repositories.message_repo import MessageRepository
+from app.schemas.message import MessageIn
+from app.services.message import MessageService
+
+pytestmark = pytest.mark.asyncio
+
+
+async def _service_with_messages(count: int) -> MessageService:
+    await Tortoise.init(db_url="sqlite://:memory:", modules={"models": ["app.models.message"]})
+    await Tortoise.generate_schemas()
+    repository = MessageRepository()
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    await repository.save_messages([
+        {
+            "message_id": f"m{i:02d}",
+            "session_id": "s1",
+            "content": "hola",
+            # Pairs of messages share a timestamp to exercise the tie-breaker
+            "timestamp": start + timedelta(seconds=i // 2),
+            "sender": "user" if i % 3 else "system",
+            "word_count": 1,
+            "character_count": 4,
+            "processed_at": start,
+        }
+        for i in range(count)
+    ])
+    return MessageService(repository)
+
+
+async def test_walks_forward_and_backward_with_cursors():
+    service = await _service_with_messages(7)
+    try:
+        # Forward
+        seen = []
+        page = await service.get_messages("s1", limit=3)
+        seen += [m["message_id"] for m in page["data"]]
+        assert page["prev_cursor"] is None
+        while page["next_cursor"]:
+            page = await service.get_messages("s1", limit=3, after=page["next_cursor"])
+            seen += [m["message_id"] for m in page["data"]]
+        assert seen == [f"m{i:02d}" for i in range(7)]
+
+        # Backward from the last page
+        assert [m["message_id"] for m in page["data"]] == ["m06"]
+        page = await service.get_messages("s1", limit=3, before=page["prev_cursor"])
+        assert [m["message_id"] for m in page["data"]] == ["m03", "m04", "m05"]
+        page = await service.get_messages("s1", limit=3, before=page["prev_cursor"])
+        assert [m["message_id"] for m in page["data"]] == ["m00", "m01", "m02"]
+        assert page["prev_cursor"] is None
+    finally:
+        await Tortoise.close_connections()
+
+
+async def test_cursor_pagination_with_sender_filter():
+    service = await _service_with_messages(7)
+    try:
+        page = await service.get_messages("s1", limit=2, sender="user")
+        assert [m["message_id"] for m in page["data"]] == ["m01", "m02"]
+
+        page = await service.get_messages("s1", limit=2, sender="user", after=page["next_cursor"])
+        assert [m["message_id"] for m in page["data"]] == ["m04", "m05"]
+    finally:
+        await Tortoise.close_connections()
+
+
+async def test_missed_events_are_rebuilt_from_the_database():
+    await Tortoise.init(db_url="sqlite://:memory:", modules={"models": ["app.models.message"]})
+    await Tortoise.generate_schemas()
+    try:
+        repository = MessageRepository()
+        service = MessageService(repository)
+        with patch("app.services.message.broadcaster", new_callable=AsyncMock):
+            for i in range(4):
+                await service.process_and_store_message(MessageIn(
+                    message_id=f"m{i}", session_id="s1", content="hola", sender="user",
+                    timestamp=datetime(2025, 1, 1, tzinfo=timezone.utc),
+                ))
+
+        # When
+        missed = await service.missed_events("s1", 2)
+        with patch("app.services.message.settings.WS_REPLAY_DB_LIMIT", 1):
+            truncated = await service.missed_events("s1", 0)
+        ahead = await service.missed_events("s1", 10)
+
+        # Then
+        assert await repository.get_last_seq("s1") == 4
+        assert [seq for seq, _ in missed] == [3, 4]
+        assert [json.loads(text)["data"]["message_id"] for _, text in missed] == ["m2", "m3"]
+        assert [json.loads(text)["event"] for _, text in truncated] == ["new_message", "resync"]
+        assert [json.loads(text) for _, text in ahead] == [{"event": "resync", "data": {"last_seq": 4}}]
+    finally:
+        await Tortoise.close_connections()
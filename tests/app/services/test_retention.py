@@ -0,0 +1,138 @@
+import gzip
+import os
+import pytest
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from tortoise import Tortoise
+from app.models.archive import ArchivedPartition
+from app.models.message import Message
+from app.repositories.message_repo import MessageRepository
+from app.services.message import MessageService
+from app.services.retention import MessageArchive, RetentionWorker
+
+NOW = datetime(2025, 6, 1, tzinfo=timezone.utc)
+
+
+@asynccontextmanager
+async def retention_setup(directory, count=10):
+    await Tortoise.init(
+        db_url="sqlite://:memory:",
+        modules={"models": ["app.models.message", "app.models.archive"]},
+    )
+    await Tortoise.generate_schemas()
+    repository = MessageRepository()
+    start = NOW - timedelta(days=100)
+    # Messages every 10 days, the oldest one 100 days old
+    await repository.save_messages([
+        {
+            "message_id": f"m{i:02d}",
+            "session_id": "s1" if i % 2 == 0 else "s2",
+            "content": f"mensaje {i}",
+            "timestamp": start + timedelta(days=10 * i),
+            "sender": "user" if i % 3 else "system",
+            "word_count": 2,
+            "character_count": 9,
+            "processed_at": start,
+        }
+        for i in range(count)
+    ])
+    archive = MessageArchive(str(directory))
+    try:
+        yield repository, archive
+    finally:
+        await Tortoise.close_connections()
+
+
+@pytest.mark.asyncio
+async def test_run_once_moves_expired_messages_to_archive(tmp_path):
+    async with retention_setup(tmp_path) as (repository, archive):
+        invalidated = []
+        worker = RetentionWorker(
+            repository, archive, retention_days=85, batch_size=3, pause=0,
+            on_archive=invalidated.append,
+        )
+
+        # When
+        archived = await worker.run_once(NOW)
+
+        # Then
+        assert archived == 2
+        assert await Message.all().count() == 8
+        assert await Message.filter(message_id__in=["m00", "m01"]).count() == 0
+        assert [row["message_id"] for row in await archive.read_session("s1")] == ["m00"]
+        assert [row["message_id"] for row in await archive.read_session("s2")] == ["m01"]
+        assert invalidated == [{"s1", "s2"}]
+        partitions = await ArchivedPartition.all().values("session_id", "partition", "message_count")
+        assert sorted(p["session_id"] for p in partitions) == ["s1", "s2"]
+        assert all(p["message_count"] == 1 for p in partitions)
+        assert await worker.run_once(NOW) == 0
+
+
+@pytest.mark.asyncio
+async def test_run_once_archives_in_batches(tmp_path):
+    async with retention_setup(tmp_path) as (repository, archive):
+        worker = RetentionWorker(repository, archive, retention_days=30, batch_size=2, pause=0)
+
+        # When
+        archived = await worker.run_once(NOW)
+
+        # Then: messages from day 0 to day 60 of 100 are expired
+        assert archived == 7
+        assert await Message.all().count() == 3
+        files = [name for _, _, names in os.walk(tmp_path) for name in names]
+        assert all(name.endswith(".jsonl.gz") for name in files)
+
+
+def test_archive_reads_duplicate_writes_once(tmp_path):
+    # Given a batch written twice, as after a crash before the delete
+    archive = MessageArchive(str(tmp_path))
+    row = {
+        "message_id": "m1",
+        "session_id": "s1",
+        "content": "hola",
+        "timestamp": datetime(2025, 1, 2, 3, 4, tzinfo=timezone.utc),
+        "sender": "user",
+        "word_count": 1,
+        "character_count": 4,
+        "processed_at": None,
+    }
+    counts = archive.write([row])
+    archive.write([row])
+
+    # When
+    rows = archive.read("s1", ["2025-01-02"])
+
+    # Then
+    assert counts == {("s1", "2025-01-02"): 1}
+    assert rows == [row]
+    with gzip.open(archive.partition_path("2025-01-02"), "rb") as archive_file:
+        assert len(archive_file.readlines()) == 2
+
+
+@pytest.mark.asyncio
+async def test_session_pages_include_archived_messages(tmp_path):
+    async with retention_setup(tmp_path) as (repository, archive):
+        await RetentionWorker(repository, archive, retention_days=50, pause=0).run_once(NOW)
+        service = MessageService(repository, archive=archive)
+
+        # Forward through archived and hot messages
+        seen = []
+        page = await service.get_messages("s1", limit=2)
+        seen += [m["message_id"] for m in page["data"]]
+        while page["next_cursor"]:
+            page = await service.get_messages("s1", limit=2, after=page["next_cursor"])
+            seen += [m["message_id"] for m in page["data"]]
+        assert seen == ["m00", "m02", "m04", "m06", "m08"]
+
+        # Backward from the last page
+        page = await service.get_messages("s1", limit=2, before=page["prev_cursor"])
+        assert [m["message_id"] for m in page["data"]] == ["m04", "m06"]
+        page = await service.get_messages("s1", limit=2, before=page["prev_cursor"])
+        assert [m["message_id"] for m in page["data"]] == ["m00", "m02"]
+        assert page["prev_cursor"] is None
+
+        # Offsets and sender filters cover archived rows too
+        page = await service.get_messages("s1", limit=2, offset=1)
+        assert [m["message_id"] for m in page["data"]] == ["m02", "m04"]
+        page = await service.get_messages("s1", limit=5, sender="system")
+        assert [m["message_id"] for m in page["data"]] == ["m00", "m06"]
@@ -0,0 +1,101 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock
+from app.services.write_behind import WriteBehindWriter
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def fake_repository():
+    return AsyncMock()
+
+
+async def test_submit_requires_running_writer(fake_repository):
+    writer = WriteBehindWriter(fake_repository)
+
+    with pytest.raises(RuntimeError):
+        await writer.submit({"message_id": "msg1"})
+
+
+async def test_group_commit_on_batch_size(fake_repository):
+    # Given
+    writer = WriteBehindWriter(fake_repository, batch_size=3, flush_interval=10)
+    await writer.start()
+
+    # When
+    await asyncio.gather(*[
+        writer.submit({"message_id": f"msg{i}"}) for i in range(3)
+    ])
+    await writer.stop()
+
+    # Then
+    fake_repository.save_messages.assert_awaited_once()
+    assert len(fake_repository.save_messages.await_args.args[0]) == 3
+
+
+async def test_group_commit_on_flush_interval(fake_repository):
+    writer = WriteBehindWriter(fake_repository, batch_size=100, flush_interval=0.01)
+    await writer.start()
+
+    await writer.submit({"message_id": "msg1"})
+
+    fake_repository.save_messages.assert_awaited_once_with([{"message_id": "msg1"}])
+    await writer.stop()
+
+
+async def test_stop_drains_enqueued_messages(fake_repository):
+    # Given
+    writer = WriteBehindWriter(fake_repository, batch_size=2, flush_interval=10)
+    await writer.start()
+
+    # When
+    for i in range(5):
+        await writer.submit({"message_id": f"msg{i}"}, wait_for_commit=False)
+    await writer.stop()
+
+    # Then
+    stored = [
+        item["message_id"]
+        for call in fake_repository.save_messages.await_args_list
+        for item in call.args[0]
+    ]
+    assert stored == [f"msg{i}" for i in range(5)]
+    assert not writer.running
+
+
+async def test_failed_group_falls_back_to_single_inserts(fake_repository):
+    # Given
+    fake_repository.save_messages.side_effect = ValueError("UNIQUE constraint failed")
+    fake_repository.save_message.side_effect = [None, ValueError("UNIQUE constraint failed")]
+    writer = WriteBehindWriter(fake_repository, batch_size=2, flush_interval=10)
+    await writer.start()
+
+    # When
+    results = await asyncio.gather(
+        writer.submit({"message_id": "msg1"}),
+        writer.submit({"message_id": "msg1"}),
+        return_exceptions=True,
+    )
+    await writer.stop()
+
+    # Then
+    assert results[0] is None
+    assert isinstance(results[1], ValueError)
+    assert fake_repository.save_message.await_count == 2
+
+
+async def test_on_commit_runs_before_submitters_are_released(fake_repository):
+    # Given
+    committed = []
+    writer = WriteBehindWriter(
+        fake_repository, batch_size=1, flush_interval=10, on_commit=committed.extend
+    )
+    await writer.start()
+
+    # When
+    await writer.submit({"message_id": "msg1", "session_id": "s1"})
+
+    # Then
+    assert committed == [{"message_id": "msg1", "session_id": "s1"}]
+    await writer.stop()
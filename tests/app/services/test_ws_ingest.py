@@ -0,0 +1,146 @@
+import asyncio
+import json
+import pytest
+from unittest.mock import AsyncMock
+from starlette.websockets import WebSocketDisconnect
+from app.schemas.enums import BatchItemStatus
+from app.services.ws_ingest import IngestChannel
+
+
+def _frame(message_id: str, session_id: str = "s1") -> str:
+    return json.dumps({
+        "message_id": message_id,
+        "session_id": session_id,
+        "content": "hola",
+        "timestamp": "2025-01-01T10:00:00Z",
+        "sender": "user",
+    })
+
+
+def _stored(payloads):
+    return [{"message_id": p.message_id, "status": BatchItemStatus.stored} for p in payloads]
+
+
+class FakeSocket:
+    """Feeds frames, then blocks until `close` is called and disconnects."""
+
+    def __init__(self, frames: list[str]):
+        self.frames: asyncio.Queue = asyncio.Queue()
+        for frame in frames:
+            self.frames.put_nowait(frame)
+        self.sent: list[dict] = []
+
+    async def receive(self) -> str:
+        frame = await self.frames.get()
+        if frame is None:
+            raise WebSocketDisconnect(1000)
+        return frame
+
+    async def send(self, text: str) -> None:
+        self.sent.append(json.loads(text))
+
+    def close(self) -> None:
+        self.frames.put_nowait(None)
+
+
+@pytest.mark.asyncio
+async def test_groups_frames_into_batches_and_acks_each():
+    # Given
+    service = AsyncMock()
+    service.process_and_store_batch.side_effect = _stored
+    socket = FakeSocket([_frame(f"m{i}") for i in range(5)])
+    channel = IngestChannel(service, "s1", batch_size=2, flush_interval=0.05)
+
+    # When
+    task = asyncio.create_task(channel.run(socket.receive, socket.send))
+    while len(socket.sent) < 3:
+        await asyncio.sleep(0.01)
+    socket.close()
+    await asyncio.wait_for(task, 1)
+
+    # Then
+    batches = [[p.message_id for p in call.args[0]] for call in service.process_and_store_batch.await_args_list]
+    assert batches == [["m0", "m1"], ["m2", "m3"], ["m4"]]
+    assert [[ack["message_id"] for ack in frame["data"]] for frame in socket.sent] == batches
+    assert all(frame["event"] == "ack" for frame in socket.sent)
+
+
+@pytest.mark.asyncio
+async def test_process_rejects_invalid_frames_in_order():
+    service = AsyncMock()
+    service.process_and_store_batch.side_effect = _stored
+    channel = IngestChannel(service, "s1")
+
+    acks = await channel.process([
+        "not json",
+        _frame("m1"),
+        json.dumps({"message_id": "m2", "session_id": "s1"}),
+        _frame("m3", session_id="s2"),
+    ])
+
+    assert [(ack["message_id"], ack["status"]) for ack in acks] == [
+        (None, BatchItemStatus.rejected),
+        ("m1", BatchItemStatus.stored),
+        ("m2", BatchItemStatus.rejected),
+        ("m3", BatchItemStatus.rejected),
+    ]
+    assert acks[2]["detail"].startswith("Invalid message")
+
+
+@pytest.mark.asyncio
+async def test_process_marks_messages_failed_when_the_batch_cannot_be_stored():
+    service = AsyncMock()
+    service.process_and_store_batch.side_effect = ValueError("Error saving messages: disk I/O error")
+    channel = IngestChannel(service, "s1")
+
+    acks = await channel.process([_frame("m1"), _frame("m2")])
+
+    assert [ack["status"] for ack in acks] == [BatchItemStatus.failed, BatchItemStatus.failed]
+
+
+@pytest.mark.asyncio
+async def test_process_charges_the_quota_per_message_and_rejects_batches_over_it():
+    # Given
+    service = AsyncMock()
+    service.process_and_store_batch.side_effect = _stored
+    quota = AsyncMock(side_effect=[0.0, 1.5])
+    channel = IngestChannel(service, "s1", quota=quota)
+
+    # When
+    first = await channel.process([_frame("m1"), "not json", _frame("m2")])
+    second = await channel.process([_frame("m3")])
+
+    # Then
+    assert [call.args for call in quota.await_args_list] == [(2,), (1,)]
+    assert [ack["status"] for ack in first] == [
+        BatchItemStatus.stored, BatchItemStatus.rejected, BatchItemStatus.stored,
+    ]
+    assert second == [{"message_id": "m3", "status": BatchItemStatus.rejected, "detail": "rate_limited"}]
+    service.process_and_store_batch.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_frames_received_before_disconnect_are_stored():
+    service = AsyncMock()
+    service.process_and_store_batch.side_effect = _stored
+    socket = FakeSocket([_frame("m1"), None])
+    channel = IngestChannel(service, "s1", batch_size=10, flush_interval=1)
+
+    await asyncio.wait_for(channel.run(socket.receive, socket.send), 1)
+
+    service.process_and_store_batch.assert_awaited_once()
+    assert socket.sent == []
+
+
+@pytest.mark.asyncio
+async def test_close_ends_run_of_a_silent_client():
+    service = AsyncMock()
+    socket = FakeSocket([])
+    channel = IngestChannel(service, "s1", batch_size=10, flush_interval=1)
+    run = asyncio.create_task(channel.run(socket.receive, socket.send))
+    await asyncio.sleep(0)
+
+    channel.close()
+
+    await asyncio.wait_for(run, 1)
+    service.process_and_store_batch.assert_not_awaited()
@@ -0,0 +1,51 @@
+import pytest
+from datetime import datetime, timezone
+from tortoise import Tortoise
+from app.db.fulltext import setup_fulltext_index
+from app.models.message import Message
+from app.repositories.message_repo import MessageRepository
+from app.tools.compress_contents import compress_all, parse_args
+
+
+@pytest.mark.asyncio
+async def test_compresses_existing_large_contents():
+    # Given messages stored before compression was enabled
+    await Tortoise.init(db_url="sqlite://:memory:", modules={"models": ["app.models.message"]})
+    await Tortoise.generate_schemas()
+    await setup_fulltext_index()
+    try:
+        plain = MessageRepository(compression_threshold=None)
+        long_content = "salida de la herramienta " * 50
+        await plain.save_messages([
+            {
+                "message_id": f"m{i}",
+                "session_id": "s1",
+                "sender": "system",
+                "content": long_content if i % 2 else "hola",
+                "timestamp": datetime(2025, 1, 1, tzinfo=timezone.utc),
+            }
+            for i in range(5)
+        ])
+
+        # When
+        repository = MessageRepository(compression_threshold=100)
+        scanned, compressed = await compress_all(repository, batch_size=2)
+        again = await compress_all(repository, batch_size=2)
+
+        # Then
+        assert (scanned, compressed) == (5, 2)
+        assert again == (3, 0)
+        assert await Message.filter(content_zlib__isnull=False).count() == 2
+        rows = await repository.get_messages_by_session("s1")
+        assert [row["content"] for row in rows] == ["hola", long_content, "hola", long_content, "hola"]
+        assert {m["message_id"] for m in await repository.search_messages("herramienta")} == {"m1", "m3"}
+    finally:
+        await Tortoise.close_connections()
+
+
+def test_parse_args_defaults():
+    args = parse_args([])
+
+    assert args.threshold == 4096
+    assert args.batch_size == 1000
+    assert args.vacuum is False
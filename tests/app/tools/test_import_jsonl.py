@@ -0,0 +1,146 @@
+import json
+import pytest
+from unittest.mock import patch
+from tortoise import Tortoise
+from app.models.message import Message
+from app.repositories.message_repo import MessageRepository
+from app.tools import import_jsonl
+from app.tools.import_jsonl import import_file, parse_args
+
+
+def _line(index: int, content: str = "hola mundo") -> str:
+    return json.dumps({
+        "message_id": f"m{index:03d}",
+        "session_id": "s1",
+        "content": content,
+        "timestamp": "2025-01-01T10:00:00Z",
+        "sender": "user",
+    })
+
+
+def _write(path, lines: list[str]) -> str:
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return str(path)
+
+
+async def _init_db():
+    await Tortoise.init(db_url="sqlite://:memory:", modules={"models": ["app.models.message"]})
+    await Tortoise.generate_schemas()
+
+
+@pytest.mark.asyncio
+async def test_imports_valid_lines_and_reports_rejected(tmp_path):
+    # Given
+    path = _write(tmp_path / "messages.jsonl", [
+        _line(1),
+        "not json",
+        _line(2, "eres un idiota"),
+        _line(1),
+        _line(3),
+    ])
+    await _init_db()
+    try:
+        # When
+        stats = await import_file(path, MessageRepository(), batch_size=2)
+
+        # Then
+        assert (stats.lines, stats.stored, stats.rejected) == (5, 2, 3)
+        stored = await Message.all().order_by("message_id").values_list("message_id", "word_count")
+        assert stored == [("m001", 2), ("m003", 2)]
+    finally:
+        await Tortoise.close_connections()
+
+    report = [json.loads(line) for line in (tmp_path / "messages.jsonl.rejected.jsonl").read_text().splitlines()]
+    assert [(entry["line"], entry["reason"].split(":")[0]) for entry in report] == [
+        (2, "invalid"), (3, "inappropriate language"), (4, "duplicate message_id"),
+    ]
+    assert not (tmp_path / "messages.jsonl.checkpoint").exists()
+
+
+@pytest.mark.asyncio
+async def test_resumes_from_checkpoint_after_failure(tmp_path):
+    # Given
+    lines = [_line(i) for i in range(10)]
+    # The failing batch (lines 7-9) has a rejected line
+    lines[7] = "not json"
+    path = _write(tmp_path / "messages.jsonl", lines)
+    repository = MessageRepository()
+    original_save = repository.save_messages
+    calls = 0
+
+    async def failing_save(items):
+        nonlocal calls
+        calls += 1
+        if calls == 3:
+            raise ValueError("Error saving messages: disk full")
+        return await original_save(items)
+
+    await _init_db()
+    try:
+        # When
+        with patch.object(repository, "save_messages", side_effect=failing_save):
+            with pytest.raises(ValueError):
+                await import_file(path, repository, batch_size=3)
+        checkpoint = json.loads((tmp_path / "messages.jsonl.checkpoint").read_text())
+
+        stats = await import_file(path, MessageRepository(), batch_size=3)
+
+        # Then
+        assert checkpoint["lines"] == 6
+        assert stats.resumed_at_line == 6
+        assert (stats.lines, stats.stored, stats.rejected) == (10, 9, 1)
+        assert await Message.all().count() == 9
+    finally:
+        await Tortoise.close_connections()
+
+    report = (tmp_path / "messages.jsonl.rejected.jsonl").read_text().splitlines()
+    assert [json.loads(line)["line"] for line in report] == [8]
+
+
+@pytest.mark.asyncio
+async def test_resume_after_crash_between_commit_and_checkpoint_counts_the_batch_as_imported(tmp_path):
+    # Given
+    lines = [_line(i) for i in range(9)]
+    lines[4] = "not json"
+    path = _write(tmp_path / "messages.jsonl", lines)
+    checkpoint_path = tmp_path / "messages.jsonl.checkpoint"
+    original_write = import_jsonl.write_checkpoint
+    writes = 0
+
+    def crashing_write(target, checkpoint):
+        nonlocal writes
+        writes += 1
+        # Pending and committed checkpoints alternate; die after the second commit
+        if writes == 4:
+            raise OSError("killed")
+        original_write(target, checkpoint)
+
+    await _init_db()
+    try:
+        # When
+        with patch.object(import_jsonl, "write_checkpoint", side_effect=crashing_write):
+            with pytest.raises(OSError):
+                await import_file(path, MessageRepository(), batch_size=3)
+        committed = await Message.all().count()
+
+        stats = await import_file(path, MessageRepository(), batch_size=3)
+
+        # Then
+        assert committed == 6
+        assert (stats.lines, stats.stored, stats.rejected) == (9, 8, 1)
+        assert await Message.all().count() == 8
+    finally:
+        await Tortoise.close_connections()
+
+    report = (tmp_path / "messages.jsonl.rejected.jsonl").read_text().splitlines()
+    assert [json.loads(line)["line"] for line in report] == [5]
+    assert not checkpoint_path.exists()
+
+
+def test_parse_args_defaults():
+    args = parse_args(["messages.jsonl"])
+
+    assert args.path == "messages.jsonl"
+    assert args.batch_size == 5000
+    assert args.checkpoint is None
+    assert args.restart is False
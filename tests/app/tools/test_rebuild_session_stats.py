@@ -0,0 +1,55 @@
+import pytest
+from datetime import datetime, timezone
+from tortoise import Tortoise
+from app.models.message import Message, SessionStats
+from app.repositories.message_repo import MessageRepository
+from app.repositories.session_stats_repo import SessionStatsRepository
+from app.tools.rebuild_session_stats import parse_args
+
+
+@pytest.mark.asyncio
+async def test_rebuild_recomputes_stats_from_messages():
+    # Given stats out of sync with the messages table
+    await Tortoise.init(db_url="sqlite://:memory:", modules={"models": ["app.models.message"]})
+    await Tortoise.generate_schemas()
+    try:
+        repository = MessageRepository()
+        await repository.save_messages([
+            {
+                "message_id": f"m{i}",
+                "session_id": f"s{i % 2}",
+                "sender": "system" if i % 3 == 0 else "user",
+                "content": "hola",
+                "timestamp": datetime(2025, 1, i + 1, tzinfo=timezone.utc),
+                "word_count": 1 if i else None,
+                "character_count": 4 if i else None,
+            }
+            for i in range(5)
+        ])
+        expected = {
+            session_id: await repository.get_session_stats(session_id) for session_id in ("s0", "s1")
+        }
+        await Message.filter(message_id="m4").delete()
+        await SessionStats.create(
+            session_id="gone", message_count=1,
+            first_activity=datetime(2025, 1, 1, tzinfo=timezone.utc),
+            last_activity=datetime(2025, 1, 1, tzinfo=timezone.utc),
+        )
+
+        # When
+        sessions = await SessionStatsRepository().rebuild(batch_size=1)
+
+        # Then
+        assert sessions == 2
+        assert await repository.get_session_stats("gone") is None
+        assert await repository.get_session_stats("s1") == expected["s1"]
+        s0 = await repository.get_session_stats("s0")
+        assert (s0["message_count"], s0["user_count"], s0["system_count"]) == (2, 1, 1)
+        assert (s0["word_count"], s0["character_count"]) == (1, 4)
+        assert s0["last_activity"] == datetime(2025, 1, 3, tzinfo=timezone.utc)
+    finally:
+        await Tortoise.close_connections()
+
+
+def test_parse_args_defaults():
+    assert parse_args([]).batch_size == 1000
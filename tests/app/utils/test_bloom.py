@@ -0,0 +1,42 @@
+from app.utils.bloom import BloomFilter, RotatingBloomFilter
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    items = [f"msg-{i}" for i in range(1000)]
+
+    for item in items:
+        bloom.add(item)
+
+    assert all(item in bloom for item in items)
+    assert bloom.count == 1000
+
+
+def test_bloom_filter_false_positive_rate_is_near_target():
+    bloom = BloomFilter(capacity=5000, error_rate=0.01)
+    for i in range(5000):
+        bloom.add(f"msg-{i}")
+
+    false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+
+    assert false_positives / 10000 < 0.02
+
+
+def test_bloom_filter_is_compact():
+    bloom = BloomFilter(capacity=1_000_000, error_rate=0.01)
+
+    assert bloom.nbytes < 1_300_000
+
+
+def test_rotating_filter_keeps_recent_generations():
+    # Given
+    seen = RotatingBloomFilter(capacity=10)
+
+    # When
+    for i in range(25):
+        seen.add(f"msg-{i}")
+
+    # Then
+    assert all(f"msg-{i}" in seen for i in range(20, 25))
+    assert all(f"msg-{i}" in seen for i in range(10, 20))
+    assert seen.stats()["items"] == 15
@@ -1,6 +1,9 @@
 import pytest
 from datetime import datetime
+from unittest.mock import patch
+from app.core.metrics import analysis_duration
 from app.utils import message_utils
+from app.utils.moderation import TermMatcher
 from app.core.constants import FORBIDDEN_WORDS
 
 
@@ -44,4 +47,68 @@ class TestGenerateMetadata:
         metadata = message_utils.generate_metadata(content)
 
         assert metadata["word_count"] == 0
-        assert metadata["character_count"] == 0
\ No newline at end of file
+        assert metadata["character_count"] == 0
+
+class TestContainsProhibitedWordsNormalization:
+    def test_detects_word_with_punctuation_and_accents(self):
+        assert message_utils.contains_prohibited_words("¡Eres un idiota!") is True
+        assert message_utils.contains_prohibited_words("eres un IMBECIL.") is True
+
+
+class TestAnalyzeContent:
+    def test_returns_verdict_and_metadata_together(self):
+        analysis = message_utils.analyze_content("hola mundo")
+
+        assert analysis["prohibited"] is False
+        assert analysis["metadata"]["word_count"] == 2
+        assert analysis["metadata"]["character_count"] == 10
+        assert analysis["metadata"]["processed_at"].tzinfo is not None
+
+    @pytest.mark.parametrize("content, expected", [
+        ("¡hola , mundo!", 3),
+        ("it's a well-known fact", 4),
+        ("see https://example.com/a/b", 2),
+        ("👍 👍", 2),
+        ("hello_world", 1),
+        ("  hola\u00a0mundo\n", 2),
+    ])
+    def test_word_count_counts_whitespace_separated_words(self, content, expected):
+        analysis = message_utils.analyze_content(content)
+
+        assert analysis["metadata"]["word_count"] == expected
+        assert message_utils.generate_metadata(content)["word_count"] == expected
+        assert len(content.split()) == expected
+
+    def test_single_analysis_is_timed_once(self):
+        before = {
+            op: analysis_duration.labels(op).count for op in ("analyze_content", "analyze_contents")
+        }
+
+        message_utils.analyze_content("hola mundo")
+
+        assert analysis_duration.labels("analyze_content").count == before["analyze_content"] + 1
+        assert analysis_duration.labels("analyze_contents").count == before["analyze_contents"]
+
+    def test_flags_forbidden_content(self):
+        forbidden_example = next(iter(FORBIDDEN_WORDS))
+
+        assert message_utils.analyze_content(f"eres {forbidden_example}!")["prohibited"] is True
+
+    def test_batch_flags_each_content_independently(self):
+        forbidden_example = next(iter(FORBIDDEN_WORDS))
+        contents = ["hola", f"{forbidden_example}", "", "todo bien", f"ok {forbidden_example}"]
+
+        analyses = message_utils.analyze_contents(contents)
+
+        assert [a["prohibited"] for a in analyses] == [False, True, False, False, True]
+        assert [a["metadata"]["word_count"] for a in analyses] == [1, 1, 0, 2, 2]
+        assert len({a["metadata"]["processed_at"] for a in analyses}) == 1
+
+    def test_batch_does_not_match_across_contents(self):
+        with patch.object(message_utils.moderation_engine, "matcher", TermMatcher(["cara de papa"])):
+            analyses = message_utils.analyze_contents(["cara de", "papa"])
+
+        assert [a["prohibited"] for a in analyses] == [False, False]
+
+    def test_empty_batch(self):
+        assert message_utils.analyze_contents([]) == []
@@ -0,0 +1,89 @@
+import asyncio
+import os
+import pytest
+from app.utils.moderation import ModerationEngine, TermMatcher, normalize_text, tokenize, tokenize_words
+
+
+class TestNormalizeText:
+    def test_strips_accents_case_and_punctuation(self):
+        assert normalize_text("¡Eres un IDIÓTA!!") == " eres un idiota "
+
+    def test_empty_text(self):
+        assert normalize_text("") == "  "
+
+    def test_tokenize_returns_the_normalized_words(self):
+        assert tokenize("¡Eres un IDIÓTA!!") == ["eres", "un", "idiota"]
+        assert tokenize(" ... ") == []
+
+    def test_tokenize_words_counts_the_original_words(self):
+        assert tokenize_words("¡Eres un IDIÓTA!! 👍") == (["eres", "un", "idiota"], 4)
+        assert tokenize_words("") == ([], 0)
+
+
+class TestTermMatcher:
+    matcher = TermMatcher(["idiota", "imbécil", "cara de papa", "tonto"])
+
+    @pytest.mark.parametrize("content", [
+        "idiota!",
+        "Eres un IMBECIL.",
+        "tú, cara-de-papa",
+        "¿tonto?",
+    ])
+    def test_finds_terms_next_to_punctuation_and_accents(self, content):
+        assert self.matcher.search(normalize_text(content)) is not None
+
+    @pytest.mark.parametrize("content", [
+        "idiotas no es lo mismo",
+        "la cara de nadie",
+        "tontorrón",
+        "",
+    ])
+    def test_only_matches_whole_words(self, content):
+        assert self.matcher.search(normalize_text(content)) is None
+
+    def test_reports_every_match_with_its_position(self):
+        text = normalize_text("tonto y cara de papa")
+
+        matches = list(self.matcher.iter_matches(text))
+
+        assert [term for _, term in matches] == ["tonto", "cara de papa"]
+        assert matches[0][0] == len(" tonto ") - 1
+
+    def test_overlapping_terms(self):
+        matcher = TermMatcher(["de papa", "cara de papa frita", "papa"])
+
+        found = {term for _, term in matcher.iter_matches(normalize_text("cara de papa"))}
+
+        assert found == {"de papa", "papa"}
+
+    def test_large_term_list(self):
+        matcher = TermMatcher([f"palabra{i}" for i in range(50_000)])
+
+        assert len(matcher) == 50_000
+        assert matcher.search(normalize_text("una palabra49999, otra")) == "palabra49999"
+        assert matcher.search(normalize_text("palabra50000")) is None
+
+
+@pytest.mark.asyncio
+async def test_engine_hot_reloads_term_file(tmp_path):
+    # Given
+    terms_file = tmp_path / "terms.txt"
+    terms_file.write_text("# comment\nmalo\n\n", encoding="utf-8")
+    engine = ModerationEngine(["idiota"])
+    await engine.load_file(str(terms_file))
+    assert engine.contains_prohibited("muy malo")
+    assert not engine.contains_prohibited("idiota")
+
+    # When
+    watcher = asyncio.create_task(engine.watch(str(terms_file), interval=0.01))
+    terms_file.write_text("feo\n", encoding="utf-8")
+    os.utime(terms_file, (1, 1))
+    for _ in range(100):
+        if engine.contains_prohibited("feo"):
+            break
+        await asyncio.sleep(0.01)
+    watcher.cancel()
+
+    # Then
+    assert engine.contains_prohibited("muy feo")
+    assert not engine.contains_prohibited("muy malo")
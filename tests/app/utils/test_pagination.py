@@ -0,0 +1,18 @@
+import pytest
+from datetime import datetime, timezone
+from app.utils.pagination import decode_cursor, encode_cursor
+
+
+class TestCursor:
+    def test_round_trip(self):
+        timestamp = datetime(2025, 7, 29, 23, 41, 26, 373000, tzinfo=timezone.utc)
+
+        cursor = encode_cursor(timestamp, "msg/1?")
+
+        assert "=" not in cursor
+        assert decode_cursor(cursor) == (timestamp, "msg/1?")
+
+    @pytest.mark.parametrize("cursor", ["", "???", "bm90LWpzb24", "WzFd"])
+    def test_invalid_cursor_raises_value_error(self, cursor):
+        with pytest.raises(ValueError, match="Invalid pagination cursor"):
+            decode_cursor(cursor)
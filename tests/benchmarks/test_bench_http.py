@@ -0,0 +1,53 @@
+import json
+from pathlib import Path
+import pytest
+from benchmarks.bench_http import ENDPOINTS, compare, percentile, summarize
+
+BASELINE = Path(__file__).resolve().parents[2] / "benchmarks" / "baseline.json"
+
+
+def _summary(rps=100.0, p95_ms=10.0, p99_ms=20.0, errors=0) -> dict:
+    return {"requests": 100, "errors": errors, "rps": rps, "p50_ms": 5.0, "p95_ms": p95_ms, "p99_ms": p99_ms}
+
+
+@pytest.mark.parametrize("fraction, expected", [(0.0, 1), (0.5, 5), (0.95, 10), (0.99, 10), (1.0, 10)])
+def test_percentile_uses_nearest_rank(fraction, expected):
+    assert percentile([float(i) for i in range(1, 11)], fraction) == expected
+
+
+def test_percentile_of_no_values():
+    assert percentile([], 0.5) == 0.0
+
+
+def test_summarize_reports_milliseconds_and_rps():
+    summary = summarize([0.002, 0.001, 0.003, 0.004], errors=1, elapsed=2.0)
+
+    assert summary["rps"] == 2.0
+    assert summary["p50_ms"] == 2.0
+    assert summary["p99_ms"] == 4.0
+    assert summary["errors"] == 1
+
+
+def test_compare_allows_changes_within_threshold():
+    results = {"create": _summary(rps=81.0, p95_ms=11.9, p99_ms=23.9)}
+
+    assert compare(results, {"create": _summary()}, threshold=0.2) == []
+
+
+def test_compare_reports_each_regression():
+    results = {
+        "create": _summary(rps=79.0, p95_ms=12.1, p99_ms=20.0, errors=2),
+        "search": _summary(rps=1.0),
+    }
+
+    regressions = compare(results, {"create": _summary()}, threshold=0.2)
+
+    assert len(regressions) == 3
+    assert [r.split(":")[0] for r in regressions] == ["create"] * 3
+
+
+def test_committed_baseline_covers_every_endpoint():
+    baseline = json.loads(BASELINE.read_text())
+
+    assert set(baseline) == set(ENDPOINTS)
+    assert all(summary["requests"] > 0 and summary["errors"] == 0 for summary in baseline.values())
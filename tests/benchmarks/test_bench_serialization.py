@@ -0,0 +1,8 @@
+import json
+from benchmarks.bench_serialization import fast_path, make_rows, previous_path
+
+
+def test_both_paths_encode_the_same_page():
+    rows = make_rows(3)
+
+    assert json.loads(fast_path(rows)) == json.loads(previous_path(rows))